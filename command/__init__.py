@@ -1,21 +1,42 @@
-from .machine import MachineCommand
-from .challenge import ChallengeCommand
-from .base import InsufficientPermissions
-from .vpn import VpnCommand
-from .respect import RespectCommand
-from .prolabs import ProlabsCommand
-from .season import SeasonCommand
-from .pwnbox import PwnBoxCommand
-from .vhostcommand import VhostCommand
-from .sherlock import SherlockCommand
-from .certificate import CertificateCommand
-from .info import InfoCommand
-from .api_key import ApiKey
-from .init import InitCommand
-from .proxy import ProxyCommand
-from .config import ConfigCommand
-from .version import VersionCommand
-from .badge import BadgeCommand
+import importlib
 
+# Command class -> module. The modules are imported on first access (PEP 562), so that starting the CLI only imports
+# the command being run.
+_COMMAND_MODULES = {
+    "MachineCommand": ".machine",
+    "ChallengeCommand": ".challenge",
+    "InsufficientPermissions": ".base",
+    "VpnCommand": ".vpn",
+    "RespectCommand": ".respect",
+    "ProlabsCommand": ".prolabs",
+    "SeasonCommand": ".season",
+    "PwnBoxCommand": ".pwnbox",
+    "VhostCommand": ".vhostcommand",
+    "SherlockCommand": ".sherlock",
+    "CertificateCommand": ".certificate",
+    "InfoCommand": ".info",
+    "ApiKey": ".api_key",
+    "InitCommand": ".init",
+    "ProxyCommand": ".proxy",
+    "ConfigCommand": ".config",
+    "VersionCommand": ".version",
+    "BadgeCommand": ".badge",
+    "CompletionCommand": ".completion",
+    "ShellCommand": ".shell",
+    "DaemonCommand": ".daemon",
+}
 
+__all__ = list(_COMMAND_MODULES.keys())
 
+
+def __getattr__(name: str):
+    if name not in _COMMAND_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_COMMAND_MODULES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
@@ -2,17 +2,21 @@ import argparse
 import hashlib
 import os
 import threading
-from libarchive import file_reader
+from libarchive import ArchiveError
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 from colorama import Fore, Style
+from tqdm import tqdm
 
 from command.base import BaseCommand
+from command.extractor import ArchiveExtractor, ExtractionResult
 from console import create_challenge_info_panel, create_table_challenge_list
 from htbapi import ChallengeInfo, RequestException, UnknownDirectoryException, ChallengeList, Category
+from htbapi.concurrency import map_concurrently
 
 DEFAULT_HTB_DOWNLOAD_PASSWORD = "hackthebox"
+DEFAULT_BULK_DOWNLOAD_WORKERS = 4
 
 class ChallengeCommand(BaseCommand):
     challenge_command: Optional[str]
@@ -70,6 +74,12 @@ class ChallengeCommand(BaseCommand):
         return None
 
 
+    @staticmethod
+    def _extract(filepath: str) -> ExtractionResult:
+        """Extracts the downloaded challenge file into its directory"""
+        extractor = ArchiveExtractor(passphrase=DEFAULT_HTB_DOWNLOAD_PASSWORD)
+        return extractor.extract(path=filepath, target_dir=os.path.dirname(os.path.abspath(filepath)))
+
     def download(self):
         """Download the challenge"""
         if self.challenge_id is None and self.challenge_name is None:
@@ -90,7 +100,8 @@ class ChallengeCommand(BaseCommand):
                                             args=("Downloading...", challenge_download_info.name))
         animation_thread.start()
         try:
-            filepath = challenge_download_info.download(path=self.args.path)
+            filepath = challenge_download_info.download(path=self.args.path,
+                                                        segments=max(1, self.args.segments if hasattr(self.args, "segments") else 1))
         except RequestException as e:
             self.logger.error(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
             return None
@@ -108,8 +119,8 @@ class ChallengeCommand(BaseCommand):
 
         # See @https://github.com/user0x1337/htb-operator/issues/43 -> Hash value is not always provided by the HTB API.
         if challenge_download_info.download_sha256 is not None and len(challenge_download_info.download_sha256) > 0:
-            with open(filepath, "rb") as f:
-                file_hash = hashlib.sha256(f.read()).hexdigest()
+            # The hash is computed while the file is streamed to disk
+            file_hash = challenge_download_info.download_file_sha256
 
             self.logger.info(
                 f'{Fore.CYAN}Challenge "{challenge_download_info.name}": HTB hash = {challenge_download_info.download_sha256} | File hash = {file_hash}{Style.RESET_ALL}')
@@ -124,22 +135,11 @@ class ChallengeCommand(BaseCommand):
             print(f'\r{Fore.CYAN}[+] Integrity check skipped for challenge "{challenge_download_info.name}". No hash value is provided by the HTB API.{Style.RESET_ALL}')
 
         if self.args.unzip:
-            base_dir = os.path.dirname(os.path.abspath(filepath))
-            with file_reader(path=filepath, passphrase=DEFAULT_HTB_DOWNLOAD_PASSWORD) as entries:
-                for entry in entries:
-                   path = Path(entry.pathname)
-                   target_path = Path(base_dir) / path
-
-                   if entry.isdir:
-                       target_path.mkdir(parents=True, exist_ok=True)
-                       continue
-
-                   target_path.parent.mkdir(parents=True, exist_ok=True)
-
-                   with open(target_path, "wb") as f:
-                       for block in entry.get_blocks():
-                           f.write(block)
-            self.logger.info(f'{Fore.GREEN}Zip file extracted to {os.path.dirname(filepath)}{Style.RESET_ALL}')
+            result = self._extract(filepath)
+            self.logger.info(f'{Fore.GREEN}Zip file extracted to {os.path.dirname(filepath)}: {result.files} files, '
+                             f'{result.bytes / 1024 / 1024:.1f} MB in {result.seconds:.2f}s ({result.throughput / 1024 / 1024:.1f} MB/s){Style.RESET_ALL}')
+            if result.skipped > 0:
+                self.logger.warning(f'{Fore.LIGHTYELLOW_EX}{result.skipped} entries skipped (links or paths outside of the target directory).{Style.RESET_ALL}')
             if self.args.clear:
                 os.remove(filepath)
                 self.logger.info(f'{Fore.LIGHTYELLOW_EX}Zip file "{Path(filepath).name}" deleted.{Style.RESET_ALL}')
@@ -183,21 +183,15 @@ class ChallengeCommand(BaseCommand):
                 cat_filter_list.append(filter_category_id)
         return cat_filter_list
 
-    def list_challenges(self):
-        """List all challenges"""
+    def _get_challenge_list(self, cat_filter_list: Optional[List[int]]) -> List[ChallengeList]:
+        """Requests the challenges matching the filter arguments (--all/--retired, --solved/--unsolved, --todo,
+        --difficulty)"""
         unsolved = None
         if self.args.unsolved:
             unsolved = self.args.unsolved
         elif self.args.solved:
             unsolved = not self.args.solved
 
-        # Mapping between category-id and category_name. Challenge returns only the id.
-        categories: List[Category] = self.client.get_challenge_categories_list()
-        category_dict = {x.id: x.name for x in categories}
-
-        filter_category_id = None
-        cat_filter_list = self._get_filter_category_list(category_dict)
-
         # Handle --all, --active, --retired flags
         if hasattr(self.args, 'all') and self.args.all:
             # Fetch both active and retired challenges
@@ -215,10 +209,10 @@ class ChallengeCommand(BaseCommand):
                 filter_category_list=cat_filter_list,
                 filter_difficulty=self.args.difficulty,
             )
-            challenge_list = active_challenges + retired_challenges
+            return active_challenges + retired_challenges
         elif hasattr(self.args, 'retired') and self.args.retired:
             # Fetch only retired challenges
-            challenge_list: List[ChallengeList] = self.client.get_challenge_list(
+            return self.client.get_challenge_list(
                 retired=True,
                 unsolved=unsolved,
                 filter_todo=self.args.todo,
@@ -228,7 +222,7 @@ class ChallengeCommand(BaseCommand):
         else:
             # Default behavior (backwards compatible): fetch active challenges
             # This covers both explicit --active and no flag at all
-            challenge_list: List[ChallengeList] = self.client.get_challenge_list(
+            return self.client.get_challenge_list(
                 retired=False,
                 unsolved=unsolved,
                 filter_todo=self.args.todo,
@@ -236,8 +230,78 @@ class ChallengeCommand(BaseCommand):
                 filter_difficulty=self.args.difficulty,
             )
 
+    def list_challenges(self):
+        """List all challenges"""
+        # Mapping between category-id and category_name. Challenge returns only the id.
+        categories: List[Category] = self.client.get_challenge_categories_list()
+        category_dict = {x.id: x.name for x in categories}
+
+        cat_filter_list = self._get_filter_category_list(category_dict)
+        challenge_list = self._get_challenge_list(cat_filter_list)
+
         self.console.print((create_table_challenge_list(challenge_list=sorted([x.to_dict() for x in challenge_list], key=lambda x: x["difficulty_num"]), category_dict=category_dict)))
 
+    def _download_challenge(self, challenge: ChallengeInfo, directory: str, unzip: bool) -> Tuple[str, int]:
+        """Downloads (and extracts) a challenge of the bulk download. Returns the status ("downloaded", "skipped") and
+        the number of downloaded bytes."""
+        filepath = challenge.get_download_path(directory)
+        if challenge.download_sha256 and os.path.isfile(filepath):
+            with open(filepath, "rb") as f:
+                if hashlib.file_digest(f, "sha256").hexdigest() == challenge.download_sha256.lower():
+                    return "skipped", 0
+
+        filepath = challenge.download(path=directory)
+        if unzip:
+            self._extract(filepath)
+
+        return "downloaded", os.path.getsize(filepath)
+
+    def bulk_download(self):
+        """Download the files of all challenges matching the filters concurrently"""
+        categories: List[Category] = self.client.get_challenge_categories_list()
+        category_dict = {x.id: x.name for x in categories}
+
+        cat_filter_list = self._get_filter_category_list(category_dict)
+        if cat_filter_list is None:
+            return None
+
+        challenge_list = [x for x in self._get_challenge_list(cat_filter_list) if x.downloadable]
+        if len(challenge_list) == 0:
+            self.logger.warning(f"{Fore.LIGHTYELLOW_EX}No downloadable challenges found.{Style.RESET_ALL}")
+            return None
+
+        # The download hash is only part of the challenge info
+        self.logger.info(f"{Fore.CYAN}Resolving {len(challenge_list)} challenges...{Style.RESET_ALL}")
+        challenges: List[ChallengeInfo] = list(self.client.get_challenge_infos([x.id for x in challenge_list]).values())
+
+        base_dir = self.args.path if self.args.path is not None else os.getcwd()
+        workers = max(1, self.args.workers if hasattr(self.args, "workers") else DEFAULT_BULK_DOWNLOAD_WORKERS)
+        results: dict[str, Tuple[str, int]] = {}
+        failed: dict[str, str] = {}
+
+        with tqdm(total=len(challenges), unit="challenge", desc="Downloading") as pbar:
+            def download(challenge: ChallengeInfo) -> None:
+                directory = os.path.join(base_dir, challenge.name.strip().replace(" ", "_"))
+                try:
+                    results[challenge.name] = self._download_challenge(challenge=challenge,
+                                                                       directory=directory,
+                                                                       unzip=self.args.unzip)
+                except (RequestException, UnknownDirectoryException, OSError, ArchiveError) as e:
+                    failed[challenge.name] = str(e)
+
+                pbar.update(1)
+                pbar.set_postfix(MB=f"{sum(size for _, size in results.values()) / 1024 / 1024:.1f}", failed=len(failed))
+
+            map_concurrently(download, challenges, max_workers=workers)
+
+        downloaded = [name for name, (status, _) in results.items() if status == "downloaded"]
+        skipped = [name for name, (status, _) in results.items() if status == "skipped"]
+        self.logger.info(f"{Fore.GREEN}[+] Downloaded: {len(downloaded)} | Skipped (already present): {len(skipped)} | Failed: {len(failed)}{Style.RESET_ALL}")
+        for name, error in failed.items():
+            self.logger.error(f'{Fore.RED}Challenge "{name}": {error}{Style.RESET_ALL}')
+
+        return None
+
 
     def start_instance(self, challenge: ChallengeInfo) -> None:
         """Start an instance"""
@@ -333,7 +397,8 @@ class ChallengeCommand(BaseCommand):
             return None
 
         self.logger.info(f'{Fore.GREEN}Writeup is downloading...{Style.RESET_ALL}')
-        target_path = challenge.download_writeup(path=self.args.path)
+        target_path = challenge.download_writeup(path=self.args.path,
+                                                 segments=max(1, self.args.segments if hasattr(self.args, "segments") else 1))
         if target_path is None:
             return None
 
@@ -393,6 +458,8 @@ class ChallengeCommand(BaseCommand):
             self.handle_instance()
         elif self.challenge_command == "download_writeup":
             self.download_writeup()
+        elif self.challenge_command == "bulk_download":
+            self.bulk_download()
         elif self.challenge_command == "search":
             self.search()
         else:
@@ -0,0 +1,54 @@
+import argparse
+from typing import Optional, List, Tuple, Dict
+
+from colorama import Fore, Style
+
+import htb_completion
+from command.base import BaseCommand
+from console import create_arg_parser
+
+
+class CompletionCommand(BaseCommand):
+    shell: Optional[str]
+    refresh_index: bool
+
+    # noinspection PyUnresolvedReferences
+    def __init__(self, htb_cli: "HtbCLI", args: argparse.Namespace):
+        super().__init__(htb_cli, args)
+        self.shell = args.shell if hasattr(args, "shell") else None
+        self.refresh_index = args.refresh_index if hasattr(args, "refresh_index") else False
+
+    def _get_index_dir(self) -> str:
+        return htb_completion.get_index_dir(self.htb_cli.get_base_store_dir())
+
+    def _write_tree(self) -> None:
+        htb_completion.write_index(self._get_index_dir(), tree=htb_completion.parser_to_tree(create_arg_parser(self.htb_cli)))
+
+    def _collect_names(self) -> Dict[str, List[Tuple[int, str]]]:
+        """Requests the names of all machines, challenges, Sherlocks, Pro Labs and VPN servers. The lists are answered
+        by the local catalog if it is up-to-date."""
+        challenges = self.client.get_challenge_list(retired=False) + self.client.get_challenge_list(retired=True)
+        return {"machine": [(x.id, x.name) for x in self.client.get_machine_list(state="")],
+                "challenge": [(x.id, x.name) for x in challenges],
+                "sherlock": [(x.id, x.name) for x in self.client.get_sherlocks()],
+                "prolab": [(x.id, x.name) for x in self.client.get_prolabs()],
+                "vpn": [(x.id, x.name) for x in self.client.get_all_vpn_server().values()]}
+
+    def update_index(self) -> None:
+        if self.client is None:
+            self.logger.error(f"{Fore.RED}HTB-Operator needs to be initialized. Use the \"init\" command.{Style.RESET_ALL}")
+            return None
+
+        self._write_tree()
+        htb_completion.write_index(self._get_index_dir(), names=self._collect_names())
+        self.logger.info(f"{Fore.GREEN}Completion index updated.{Style.RESET_ALL}")
+
+    def execute(self):
+        if self.refresh_index:
+            self.update_index()
+        elif self.shell is not None:
+            # The names are indexed in the background on the first completion
+            self._write_tree()
+            print(htb_completion.get_script(self.shell), end="")
+        else:
+            self.logger.error(f"{Fore.RED}Specify a shell (bash, zsh, fish) or --refresh-index{Style.RESET_ALL}")
@@ -1,5 +1,7 @@
 import argparse
 
+from colorama import Fore, Style
+
 from command.base import BaseCommand
 
 
@@ -8,6 +10,22 @@ class ConfigCommand(BaseCommand):
     # noinspection PyUnresolvedReferences
     def __init__(self, htb_cli: "HtbCLI", args: argparse.Namespace):
         super().__init__(htb_cli=htb_cli, args=args)
+        self.cache_stats = args.cache_stats if hasattr(args, "cache_stats") else False
+
+    def print_cache_stats(self):
+        """Prints the hit/revalidation/miss ratio of the local HTTP cache."""
+        http_cache = getattr(self.htb_cli, "http_cache", None)
+        if http_cache is None:
+            self.logger.warning(f"{Fore.YELLOW}HTTP cache is not initialized. Run the init command first.{Style.RESET_ALL}")
+            return
+
+        stats = http_cache.get_stats()
+        total = stats["hits"] + stats["revalidations"] + stats["misses"]
+        ratio = 0 if total == 0 else (stats["hits"] + stats["revalidations"]) * 100 / total
+        self.logger.info(f"HTTP cache: {Fore.GREEN}{stats['hits']}{Style.RESET_ALL} hits, "
+                         f"{Fore.CYAN}{stats['revalidations']}{Style.RESET_ALL} revalidated (304), "
+                         f"{Fore.YELLOW}{stats['misses']}{Style.RESET_ALL} misses "
+                         f"({ratio:.1f}% served from cache, {stats['saved_bytes'] / 1024 / 1024:.2f} MB not transferred)")
 
     def execute(self):
         if self.args.no_verify_ssl:
@@ -18,3 +36,5 @@ class ConfigCommand(BaseCommand):
             self.htb_cli.config["HTB"]["verify_ssl"] = str(True)
             self.htb_cli.save_config_file()
             self.logger.info("SSL certificate verification enabled")
+        elif self.cache_stats:
+            self.print_cache_stats()
@@ -0,0 +1,343 @@
+import argparse
+import io
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from typing import Optional, List
+
+from colorama import Fore, Style
+
+from command.base import BaseCommand
+
+SOCKET_NAME = "daemon.sock"
+DEFAULT_POLL_INTERVAL = 30
+# Maximum size of a request line. Requests only contain a command line.
+MAX_REQUEST_SIZE = 64 * 1024
+CLIENT_TIMEOUT = 5 * 60
+# Commands which are forwarded to a running daemon: (command, subcommand). They must neither read from stdin nor
+# need root (e.g. starting a VPN), since they run inside the daemon process.
+FORWARDED_COMMANDS = {("info", None),
+                      ("machine", "status"), ("machine", "list"), ("machine", "info"),
+                      ("challenge", "list"), ("challenge", "info"), ("challenge", "search"),
+                      ("sherlock", "list"),
+                      ("prolabs", "list"), ("prolabs", "info"), ("prolabs", "progress"),
+                      ("seasons", "list"), ("seasons", "machine"), ("seasons", "info"),
+                      ("badge", "list"),
+                      ("vpn", "status"), ("vpn", "list")}
+GLOBAL_OPTIONS = {"--debug", "--no-cache", "--refresh"}
+
+
+def get_socket_path(store_dir: str) -> str:
+    return os.path.join(store_dir, SOCKET_NAME)
+
+
+def is_forwarded(argv: List[str]) -> bool:
+    """True if the command line (without program name) is answered by the daemon"""
+    words = [x for x in argv if x not in GLOBAL_OPTIONS]
+    if len(words) == 0:
+        return False
+    subcommand = words[1] if len(words) > 1 and not words[1].startswith("-") else None
+    return (words[0], subcommand) in FORWARDED_COMMANDS
+
+
+def request(store_dir: str, payload: dict, timeout: float = CLIENT_TIMEOUT) -> Optional[dict]:
+    """Sends the request to the daemon and returns the response. None if no daemon is running."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+
+    path = get_socket_path(store_dir)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps(payload).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+    except OSError:
+        # Stale socket (daemon has been killed) or no permission
+        return None
+
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def forward_command(store_dir: str, argv: List[str]) -> bool:
+    """Runs the command line in the daemon, if it is running and the command can be forwarded. Prints the output of
+    the command and returns True. Returns False if the command has to be executed in this process."""
+    if not is_forwarded(argv):
+        return False
+
+    try:
+        columns = os.get_terminal_size().columns
+    except OSError:
+        columns = None
+
+    response = request(store_dir, {"type": "command", "argv": argv, "columns": columns, "is_terminal": sys.stdout.isatty()})
+    if response is None or "error" in response:
+        return False
+
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    sys.stdout.flush()
+    return True
+
+
+def _get_peer_uid(sock: socket.socket) -> Optional[int]:
+    """UID of the connected process (Linux). None if the platform does not provide it."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    _, uid, _ = struct.unpack("3i", sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")))
+    return uid
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    # noinspection PyUnresolvedReferences
+    server: "_DaemonServer"
+
+    def handle(self) -> None:
+        peer_uid = _get_peer_uid(self.request)
+        if peer_uid is not None and peer_uid != os.getuid():
+            # The socket is only accessible by the owner anyway (0600). Never serve another user (e.g. root via sudo).
+            self._respond({"error": "permission denied"})
+            return None
+
+        line = self.rfile.readline(MAX_REQUEST_SIZE)
+        try:
+            payload = json.loads(line)
+        except ValueError:
+            self._respond({"error": "invalid request"})
+            return None
+
+        self._respond(self.server.daemon_command.handle_request(payload))
+
+    def _respond(self, response: dict) -> None:
+        try:
+            self.wfile.write(json.dumps(response, default=str).encode() + b"\n")
+        except OSError:
+            # Client is gone
+            pass
+
+
+class _DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer if hasattr(socket, "AF_UNIX") else socketserver.TCPServer):
+    daemon_threads = True
+    # noinspection PyUnresolvedReferences
+    daemon_command: "DaemonCommand"
+
+
+class _OutputRouter:
+    """Replaces sys.stdout/sys.stderr (and the streams of the logging handlers) while the daemon is running. Output is
+    written to the capture of the command being executed. Threads of the daemon itself (e.g. the poller) are excluded
+    and always write to the original stream, so their messages never end up in the output of a client."""
+    original: io.TextIOBase
+    capture: Optional[io.StringIO]
+    _local: threading.local
+
+    def __init__(self, original: io.TextIOBase):
+        self.original = original
+        self.capture = None
+        self._local = threading.local()
+
+    def exclude_current_thread(self) -> None:
+        self._local.excluded = True
+
+    def _get_target(self):
+        if self.capture is None or getattr(self._local, "excluded", False):
+            return self.original
+        return self.capture
+
+    def write(self, s: str) -> int:
+        return self._get_target().write(s)
+
+    def flush(self) -> None:
+        self._get_target().flush()
+
+    def isatty(self) -> bool:
+        return self._get_target().isatty()
+
+    def __getattr__(self, name: str):
+        return getattr(self._get_target(), name)
+
+
+class DaemonCommand(BaseCommand):
+    """Background process which owns the API client (connection, caches, rate limiter) and answers the commands of
+    other `htb-operator` processes over a UNIX socket. The active machine and the VPN connections are polled, so that
+    status queries are answered without a request."""
+    daemon_command: Optional[str]
+    poll_interval: int
+    query: Optional[str]
+    _command_lock: threading.Lock
+    _state: dict
+    _stop: threading.Event
+    _server: Optional[_DaemonServer]
+    _stdout: Optional[_OutputRouter]
+    _stderr: Optional[_OutputRouter]
+
+    # noinspection PyUnresolvedReferences
+    def __init__(self, htb_cli: "HtbCLI", args: argparse.Namespace):
+        super().__init__(htb_cli, args)
+        self.daemon_command = args.daemon if hasattr(args, "daemon") else None
+        self.poll_interval = args.poll_interval if hasattr(args, "poll_interval") and args.poll_interval else DEFAULT_POLL_INTERVAL
+        self.query = args.query if hasattr(args, "query") else None
+        self._command_lock = threading.Lock()
+        self._state = {"active_machine": None, "vpn_connections": [], "updated_at": None}
+        self._stop = threading.Event()
+        self._server = None
+        self._stdout = None
+        self._stderr = None
+
+    def _get_socket_path(self) -> str:
+        return get_socket_path(self.htb_cli.get_base_store_dir())
+
+    def handle_request(self, payload: dict) -> dict:
+        if payload.get("type") == "query":
+            return self._handle_query(payload.get("name"))
+        if payload.get("type") == "command":
+            return self._handle_command(argv=payload.get("argv", []),
+                                        columns=payload.get("columns"),
+                                        is_terminal=payload.get("is_terminal", False))
+        if payload.get("type") == "stop":
+            self._stop.set()
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            return {"status": "stopping"}
+        return {"error": "unknown request"}
+
+    def _handle_query(self, name: Optional[str]) -> dict:
+        state = self._state
+        if name == "status":
+            return dict(state)
+        if name == "active_machine":
+            return {"active_machine": state["active_machine"], "updated_at": state["updated_at"]}
+        if name == "active_machine_ip":
+            machine = state["active_machine"]
+            return {"ip": machine["ip"] if machine is not None else None, "updated_at": state["updated_at"]}
+        if name == "vpn_status":
+            return {"vpn_connections": state["vpn_connections"], "updated_at": state["updated_at"]}
+        return {"error": f"unknown query: {name}"}
+
+    def _handle_command(self, argv: List[str], columns: Optional[int], is_terminal: bool) -> dict:
+        if not isinstance(argv, list) or not is_forwarded(argv):
+            return {"error": "command is not supported by the daemon"}
+
+        from rich.console import Console
+        from console import create_arg_parser
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        # Commands write to sys.stdout, the console and the logger, which are shared. One command at a time is executed.
+        with self._command_lock:
+            original_console = self.htb_cli.console
+            self._stdout.capture, self._stderr.capture = stdout, stderr
+            # Tables are rendered for the terminal of the client
+            self.htb_cli.console = Console(file=stdout, force_terminal=is_terminal, width=columns)
+            try:
+                parser = create_arg_parser(self.htb_cli)
+                self.htb_cli.dispatch(parser=parser, args=parser.parse_args(argv), interactive=False)
+            except SystemExit:
+                pass
+            except Exception as e:
+                stderr.write(f"{Fore.RED}Error: {e}{Style.RESET_ALL}\n")
+            finally:
+                self._stdout.capture, self._stderr.capture = None, None
+                self.htb_cli.console = original_console
+
+        return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+    def _poll(self) -> None:
+        """Keeps the status of the active machine and the VPN connections up-to-date"""
+        self._stdout.exclude_current_thread()
+        self._stderr.exclude_current_thread()
+        while not self._stop.is_set():
+            try:
+                active_machine = self.client.get_active_machine()
+                connections = self.client.get_active_connections()
+                self._state = {"active_machine": active_machine.to_dict() if active_machine is not None else None,
+                               "vpn_connections": [x.to_dict() for x in connections],
+                               "updated_at": time.time()}
+            except Exception as e:
+                self.logger.warning(f"{Fore.YELLOW}Polling the status failed: {e}{Style.RESET_ALL}")
+            self._stop.wait(self.poll_interval)
+
+    def _prepare_socket(self, path: str) -> bool:
+        """Removes a stale socket. Returns False if another daemon is running."""
+        if not os.path.exists(path):
+            return True
+        if request(os.path.dirname(path), {"type": "query", "name": "status"}, timeout=2) is not None:
+            return False
+        os.remove(path)
+        return True
+
+    def _install_output_routers(self) -> None:
+        self._stdout, self._stderr = _OutputRouter(sys.stdout), _OutputRouter(sys.stderr)
+        for router in (self._stdout, self._stderr):
+            router.exclude_current_thread()
+        for handler in getattr(self.logger, "handlers", []):
+            if getattr(handler, "stream", None) is sys.stdout:
+                handler.stream = self._stdout
+            elif getattr(handler, "stream", None) is sys.stderr:
+                handler.stream = self._stderr
+        sys.stdout, sys.stderr = self._stdout, self._stderr
+
+    def _restore_output(self) -> None:
+        for handler in getattr(self.logger, "handlers", []):
+            if getattr(handler, "stream", None) in (self._stdout, self._stderr):
+                handler.stream = handler.stream.original
+        sys.stdout, sys.stderr = self._stdout.original, self._stderr.original
+
+    def serve(self) -> None:
+        if not hasattr(socket, "AF_UNIX"):
+            self.logger.error(f"{Fore.RED}The daemon needs UNIX sockets, which are not supported on this platform.{Style.RESET_ALL}")
+            return None
+
+        path = self._get_socket_path()
+        if not self._prepare_socket(path):
+            self.logger.error(f"{Fore.RED}The daemon is already running ({path}).{Style.RESET_ALL}")
+            return None
+
+        # The socket is created with 0600 (no window in which another user could connect)
+        old_umask = os.umask(0o177)
+        try:
+            self._server = _DaemonServer(path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        os.chmod(path, 0o600)
+        self._server.daemon_command = self
+        self._install_output_routers()
+
+        threading.Thread(target=self._poll, daemon=True).start()
+        self.logger.info(f"{Fore.GREEN}Daemon is listening on {path}. Stop it with Ctrl-C or \"daemon stop\".{Style.RESET_ALL}")
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._stop.set()
+            self._server.server_close()
+            if os.path.exists(path):
+                os.remove(path)
+            self._restore_output()
+            self.logger.info("Daemon stopped.")
+
+    def execute(self):
+        store_dir = self.htb_cli.get_base_store_dir()
+        if self.daemon_command == "stop":
+            if request(store_dir, {"type": "stop"}) is None:
+                self.logger.warning(f"{Fore.YELLOW}The daemon is not running.{Style.RESET_ALL}")
+            else:
+                self.logger.info("Daemon is stopping.")
+        elif self.daemon_command == "status":
+            response = request(store_dir, {"type": "query", "name": self.query if self.query else "status"})
+            if response is None:
+                self.logger.warning(f"{Fore.YELLOW}The daemon is not running.{Style.RESET_ALL}")
+            else:
+                print(json.dumps(response, indent=2, default=str))
+        else:
+            self.serve()
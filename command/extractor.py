@@ -0,0 +1,145 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import Optional, Deque, Dict
+
+from libarchive import file_reader
+
+DEFAULT_EXTRACT_WORKERS = 4
+# Files up to this size are read into memory and written by the worker pool. Larger files are streamed to disk by the
+# reading thread, so that multi-GB files (e.g. disk images) are never held in memory.
+SMALL_FILE_SIZE = 4 * 1024 * 1024
+# Number of buffered files waiting for a worker, per worker. Bounds the memory used for buffering.
+PENDING_WRITES_PER_WORKER = 4
+
+
+class ExtractionResult:
+    """Statistics of an extraction"""
+    files: int
+    directories: int
+    skipped: int
+    bytes: int
+    seconds: float
+
+    def __init__(self):
+        self.files = 0
+        self.directories = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Written bytes per second"""
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self):
+        return f"<ExtractionResult {self.files} files, {self.bytes} bytes, {self.seconds:.2f}s>"
+
+
+class ArchiveExtractor:
+    """Extracts an archive (e.g. the ZIP file of a challenge) with libarchive.
+
+    The archive is read sequentially by one thread. All directories are created in one pass before any file is
+    written. Small files are buffered and written by a pool of workers, which pays off for archives with thousands of
+    small files. Large files are streamed to disk by the reading thread and preallocated if their size is known.
+    Entries that would be extracted outside the target directory (e.g. `../`) and non-regular files are skipped.
+    """
+    max_workers: int
+    passphrase: Optional[str]
+    small_file_size: int
+
+    def __init__(self,
+                 max_workers: int = DEFAULT_EXTRACT_WORKERS,
+                 passphrase: Optional[str] = None,
+                 small_file_size: int = SMALL_FILE_SIZE):
+        self.max_workers = max(1, max_workers)
+        self.passphrase = passphrase
+        self.small_file_size = small_file_size
+
+    def extract(self, path: str, target_dir: str) -> ExtractionResult:
+        """Extracts the archive at `path` into `target_dir` and returns the statistics."""
+        start = time.perf_counter()
+        result = ExtractionResult()
+        base_dir = Path(target_dir).resolve()
+
+        # First pass: only the headers are read. The data of the entries is skipped by libarchive.
+        targets: Dict[str, Optional[Path]] = {}
+        directories = set()
+        with file_reader(path, passphrase=self.passphrase) as entries:
+            for entry in entries:
+                target_path = _get_target_path(base_dir, entry.pathname)
+                if target_path is None or not (entry.isdir or entry.isfile):
+                    targets[entry.pathname] = None
+                    result.skipped += 1
+                    continue
+
+                targets[entry.pathname] = target_path
+                directories.add(target_path if entry.isdir else target_path.parent)
+
+        for directory in sorted(directories):
+            directory.mkdir(parents=True, exist_ok=True)
+        result.directories = len(directories)
+
+        pending: Deque[Future] = deque()
+        max_pending = self.max_workers * PENDING_WRITES_PER_WORKER
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor, \
+                file_reader(path, passphrase=self.passphrase) as entries:
+            for entry in entries:
+                target_path = targets.get(entry.pathname)
+                if target_path is None or entry.isdir:
+                    continue
+
+                size = entry.size
+                if 0 < size <= self.small_file_size:
+                    data = b"".join(entry.get_blocks())
+                    pending.append(executor.submit(_write_file, target_path, data))
+                    while len(pending) > max_pending:
+                        pending.popleft().result()
+                    result.bytes += len(data)
+                else:
+                    result.bytes += _stream_file(target_path, entry, size)
+                result.files += 1
+
+            while len(pending) > 0:
+                pending.popleft().result()
+
+        result.seconds = time.perf_counter() - start
+        return result
+
+
+def _get_target_path(base_dir: Path, pathname: str) -> Optional[Path]:
+    """Returns the path of the entry inside `base_dir` or None, if the entry would be extracted outside of it."""
+    target_path = (base_dir / pathname).resolve()
+    if target_path != base_dir and base_dir not in target_path.parents:
+        return None
+    return target_path
+
+
+def _write_file(path: Path, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _stream_file(path: Path, entry, size: int) -> int:
+    """Writes the blocks of the entry to `path` and returns the number of written bytes."""
+    written = 0
+    with open(path, "wb") as f:
+        if size > 0 and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+            except OSError:
+                # Not supported by the file system
+                pass
+
+        for block in entry.get_blocks():
+            f.write(block)
+            written += len(block)
+
+        # The size in the header might be wrong. Do not leave preallocated bytes behind.
+        if written != size:
+            f.truncate(written)
+
+    return written
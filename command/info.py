@@ -1,4 +1,5 @@
 import argparse
+import time
 from typing import List, Optional
 
 from rich.table import Table
@@ -8,6 +9,7 @@ from console.cli_panel import create_profile_panel, create_ranking_panel, create
     create_advanced_labs_panel, create_activity_panel, create_level_panel
 from htbapi import User, Activity, FortressUserProfile, ProLabUserProfile, EndgameUserProfile, \
     SherlockUserProfile, MachineOsUserProfile, ChallengeUserProfile
+from htbapi.concurrency import run_concurrently
 
 
 class InfoCommand(BaseCommand):
@@ -18,18 +20,38 @@ class InfoCommand(BaseCommand):
     def __init__(self, htb_cli: "HtbCLI", args: argparse.Namespace):
         super().__init__(htb_cli=htb_cli, args=args)
         self.username = args.username if hasattr(args, "username") else None
+        self.debug = args.debug if hasattr(args, "debug") else False
 
 
     def execute(self):
+        start = time.perf_counter()
         user: User = self.client.get_user(self.username)
-        activities: List[Activity] = self.client.get_user_activity(user_id=user.id,
-                                                                   limit_activity_entries=20 if not self.args.activity else None)
+        timings = {"user": time.perf_counter() - start}
+
+        # All other calls only depend on the user ID. Fetch them concurrently.
+        calls = {"activity": lambda: self.client.get_user_activity(user_id=user.id,
+                                                                   limit_activity_entries=20 if not self.args.activity else None)}
+        if not self.args.activity:
+            calls["fortress"] = lambda: self.client.get_fortress_progress_profile_summary(user_id=user.id)
+            calls["prolabs"] = lambda: self.client.get_prolab_progress_profile_summary(user_id=user.id)
+            calls["sherlocks"] = lambda: self.client.get_sherlock_progress_profile_summary(user_id=user.id)
+            calls["machines"] = lambda: self.client.get_machine_progress_profile_summary(user_id=user.id)
+            calls["challenges"] = lambda: self.client.get_challenge_progress_profile_summary(user_id=user.id)
+            calls["experience"] = lambda: self.client.load_user_details(users=[user], badges=False)
+
+        results, call_timings = run_concurrently(calls)
+        timings |= call_timings
+        if self.debug:
+            self.logger.debug(f"Fetched in {time.perf_counter() - start:.2f}s: " +
+                              ", ".join([f"{name}={duration:.2f}s" for name, duration in timings.items()]))
+
+        activities: List[Activity] = results["activity"]
         if not self.args.activity:
-            fortress_progress: List[FortressUserProfile] = self.client.get_fortress_progress_profile_summary(user_id=user.id)
-            prolabs_progress: List[ProLabUserProfile] = self.client.get_prolab_progress_profile_summary(user_id=user.id)
-            sherlocks_progress: List[SherlockUserProfile] = self.client.get_sherlock_progress_profile_summary(user_id=user.id)
-            machines_os_progress: List[MachineOsUserProfile] = self.client.get_machine_progress_profile_summary(user_id=user.id)
-            challenge_progress: List[ChallengeUserProfile] = self.client.get_challenge_progress_profile_summary(user_id=user.id)
+            fortress_progress: List[FortressUserProfile] = results["fortress"]
+            prolabs_progress: List[ProLabUserProfile] = results["prolabs"]
+            sherlocks_progress: List[SherlockUserProfile] = results["sherlocks"]
+            machines_os_progress: List[MachineOsUserProfile] = results["machines"]
+            challenge_progress: List[ChallengeUserProfile] = results["challenges"]
 
             panel_profile = create_profile_panel(user_dict=user.to_dict(key_filter=["ID", "Name", "Team", "University", "Country", "Subscription"]))
             panel_ranking = create_ranking_panel(ranking_dict=user.to_dict(key_filter=["Ranking", "Next rank", "Team", "University", "Points", "Rank", "Ownership", "Rank Requirement"]))
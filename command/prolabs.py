@@ -54,7 +54,9 @@ class ProlabsCommand(BaseCommand):
             if self.args.id is not None:
                 self.logger.error(f'{Fore.RED}No prolab found with ID "{self.args.id}"{Style.RESET_ALL}')
             else:
-                self.logger.error(f'{Fore.RED}No prolab found with name "{self.args.name}"{Style.RESET_ALL}')
+                suggestions = self.client.suggest_names(kind="prolab", name=self.args.name)
+                self.logger.error(f'{Fore.RED}No prolab found with name "{self.args.name}"'
+                                  f'{". Did you mean: " + ", ".join(suggestions) + "?" if len(suggestions) > 0 else ""}{Style.RESET_ALL}')
             return False
 
         return True
@@ -0,0 +1,25 @@
+import argparse
+import importlib
+
+
+class LazyCommand:
+    """Reference to a command class by name, used as `func` of a subparser.
+
+    The module of the command (and its dependencies, e.g. paramiko for SSH or libarchive for unzipping) is only imported
+    when the command is dispatched, not while the argument parser is built.
+    """
+    class_name: str
+
+    def __init__(self, class_name: str):
+        self.class_name = class_name
+
+    def load(self) -> type:
+        """Imports the module of the command and returns the command class"""
+        return getattr(importlib.import_module("command"), self.class_name)
+
+    # noinspection PyUnresolvedReferences
+    def __call__(self, htb_cli: "HtbCLI", args: argparse.Namespace):
+        return self.load()(htb_cli, args)
+
+    def __repr__(self):
+        return f"<LazyCommand '{self.class_name}'>"
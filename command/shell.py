@@ -0,0 +1,135 @@
+import argparse
+import os
+import shlex
+import sys
+from typing import Optional, List
+
+from colorama import Fore, Style
+
+import htb_completion
+from command.base import BaseCommand
+from console import create_arg_parser
+
+HISTORY_LENGTH = 1000
+EXIT_COMMANDS = {"exit", "quit"}
+
+
+class ShellCommand(BaseCommand):
+    """Interactive shell. Every line is parsed and dispatched like a command line of `htb-operator`, but within this
+    process: the API client, its HTTP/2 connection, the in-memory caches and the argument parser are reused, so a
+    command only costs its own API calls."""
+    parser: Optional[argparse.ArgumentParser]
+    _tree: Optional[dict]
+    _index_dir: str
+    _completions: List[str]
+
+    # noinspection PyUnresolvedReferences
+    def __init__(self, htb_cli: "HtbCLI", args: argparse.Namespace):
+        super().__init__(htb_cli, args)
+        self.parser = None
+        self._tree = None
+        self._index_dir = htb_completion.get_index_dir(self.htb_cli.get_base_store_dir())
+        self._completions = []
+
+    def _get_history_path(self) -> str:
+        return os.path.join(self.htb_cli.get_base_store_dir(), "shell_history")
+
+    def _complete(self, text: str, state: int) -> Optional[str]:
+        """readline completer: commands, options and names from the completion index"""
+        if state == 0:
+            import readline
+            line = readline.get_line_buffer()[:readline.get_endidx()]
+            try:
+                words = shlex.split(line)
+            except ValueError:
+                # Unterminated quote
+                words = line.split()
+            if line.endswith(" ") or len(words) == 0:
+                words.append("")
+            self._completions = htb_completion.complete(words=[self.htb_cli.package_name] + words,
+                                                        index_dir=self._index_dir,
+                                                        shell="readline",
+                                                        tree=self._tree)
+
+        return self._completions[state] if state < len(self._completions) else None
+
+    def _setup_readline(self) -> None:
+        """History and completion, if readline (or pyreadline3 on Windows) is available"""
+        try:
+            import readline
+        except ImportError:
+            return None
+
+        try:
+            readline.read_history_file(self._get_history_path())
+        except OSError:
+            pass
+        readline.set_history_length(HISTORY_LENGTH)
+        readline.set_completer_delims(" \t\n")
+        readline.set_completer(self._complete)
+        readline.parse_and_bind("tab: complete")
+
+    def _save_history(self) -> None:
+        try:
+            import readline
+            readline.write_history_file(self._get_history_path())
+        except (ImportError, OSError):
+            pass
+
+    def run_line(self, line: str) -> None:
+        """Parses the line and dispatches the command. Errors are printed, they never end the shell."""
+        try:
+            words = shlex.split(line)
+        except ValueError as e:
+            self.logger.error(f"{Fore.RED}{e}{Style.RESET_ALL}")
+            return None
+
+        if len(words) > 0 and words[0] == self.htb_cli.package_name:
+            words = words[1:]
+        if len(words) == 0:
+            return None
+        if words[0] == "shell":
+            self.logger.warning(f"{Fore.YELLOW}Already running the shell.{Style.RESET_ALL}")
+            return None
+
+        original_argv = sys.argv
+        try:
+            args = self.parser.parse_args(words)
+            # Commands restarting themselves (e.g. with sudo) use the arguments of the line instead of "shell"
+            sys.argv = [original_argv[0]] + words
+            self.htb_cli.dispatch(parser=self.parser, args=args)
+        except SystemExit:
+            # argparse errors and --help, or a command which exits
+            pass
+        except KeyboardInterrupt:
+            print()
+            self.logger.warning(f"{Fore.YELLOW}Interrupted.{Style.RESET_ALL}")
+        except Exception as e:
+            self.logger.error(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
+        finally:
+            sys.argv = original_argv
+
+        return None
+
+    def execute(self):
+        self.parser = create_arg_parser(self.htb_cli)
+        self._tree = htb_completion.parser_to_tree(self.parser)
+        self._setup_readline()
+
+        print(f"{Fore.MAGENTA}HTB-Operator shell. Type \"help\" for the commands, \"exit\" or Ctrl-D to quit.{Style.RESET_ALL}")
+        try:
+            while True:
+                try:
+                    line = input(f"{self.htb_cli.package_name}> ").strip()
+                except KeyboardInterrupt:
+                    print()
+                    continue
+                except EOFError:
+                    print()
+                    break
+
+                if line in EXIT_COMMANDS:
+                    break
+                self.run_line(line)
+        finally:
+            self._save_history()
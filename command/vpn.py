@@ -1,20 +1,38 @@
 import argparse
+import ipaddress
+import json
 import os
-import re
+import shutil
 import signal
 import socket
 import subprocess
 import sys
-from typing import Optional, List
+import time
+from typing import Optional, List, Tuple
 
 import psutil
 from colorama import Fore, Style
-from tqdm import tqdm
 
 from command.base import BaseCommand, IS_WINDOWS
 from console import create_table_active_vpn_connections, create_vpn_list_table, create_benchmark_table
 from htbapi import VpnServerInfo, AccessibleVpnServer, RequestException, CannotSwitchWithActive, \
-    VpnException, BaseVpnServer, ActiveMachineInfo
+    VpnException, BaseVpnServer, ActiveMachineInfo, VpnHostStore, parse_remote, probe_latencies, score_vpn_server, VpnHealth, \
+    OpenVpnManagement, collect_health, read_health, get_management_path
+from htbapi.openvpn_management import MANAGEMENT_DIRECTORY
+from htbapi.ovpn_cache import chown_to_sudo_user
+from htbapi.vpn_probe import DEFAULT_PROBE_PORT, DEFAULT_SAMPLES
+
+# Minimum improvement of the score (in ms) for which "vpn auto" switches the server
+DEFAULT_AUTO_THRESHOLD = 15
+# "vpn monitor": Seconds between two samples, gateway latency (in ms) above which a sample counts as degraded and number
+# of degraded samples in a row after which the tunnel is restarted (or, if a restart did not help, failed over)
+DEFAULT_MONITOR_INTERVAL = 10
+DEFAULT_MONITOR_MAX_LATENCY = 300
+DEFAULT_MONITOR_FAILURES = 3
+# Products of the accessible VPN servers for which "vpn monitor --failover" can choose another server
+FAILOVER_PRODUCTS = ["labs", "starting_point", "fortresses", "release_arena", "endgames"]
+# Output of OpenVPN if the server does not accept the certificate (e.g. regenerated or revoked on the website)
+TLS_FAILURE_MARKERS = ["TLS Error", "VERIFY ERROR", "AUTH_FAILED", "tls-error"]
 
 
 class VpnCommand(BaseCommand):
@@ -22,7 +40,6 @@ class VpnCommand(BaseCommand):
     target_path: Optional[str]
     tcp: bool
     accessible_vpn_servers: dict[int, AccessibleVpnServer]
-    regex_ping: str
 
     # noinspection PyUnresolvedReferences
     def __init__(self, htb_cli: "HtbCLI", args: argparse.Namespace):
@@ -34,10 +51,9 @@ class VpnCommand(BaseCommand):
         self.target_interface = "tun_htb" if not hasattr(args, "interface") else args.interface
         self.target_path = None if not hasattr(args, "path") else args.path
         self.accessible_vpn_servers = self.client.get_accessible_vpn_server()
-        self.regex_ping = r"min/avg/max/mdev = ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+) ms"
 
         # VPN operations needs root/admin privileges
-        if self.vpn_command in ["start", "stop"]:
+        if self.vpn_command in ["start", "stop"] or (self.vpn_command == "auto" and args.start) or (self.vpn_command == "monitor" and args.failover):
             self.switch_to_root()
 
     def check(self) -> bool:
@@ -62,30 +78,6 @@ class VpnCommand(BaseCommand):
             if path is not None:
                 os.remove(path)
 
-    def ping_hostname(self, hostname: str, count: int=3) -> float:
-        """Ping the hostname"""
-        try:
-            p = subprocess.run(
-                ["ping", "-c", f'{count}', hostname],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True)
-            output = p.stdout
-            match = re.search(self.regex_ping, output)
-            if match:
-                min_latency, avg_latency, max_latency, mdev = match.groups()
-                return float(avg_latency)
-            else:
-                self.logger.error(f"{Fore.RED}Error: Latency could not be parsed: {output}{Style.RESET_ALL}")
-                return 99999999.99
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"{Fore.RED}Ping failed: {e.stderr}{Style.RESET_ALL}")
-            return 99999999.99
-        except Exception as e:
-            self.logger.error(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
-            return 99999999.99
-
     def _get_products(self):
         """Get the products"""
         products: List[str] = []
@@ -107,6 +99,36 @@ class VpnCommand(BaseCommand):
 
         return products
 
+    def _get_host_store(self) -> VpnHostStore:
+        return VpnHostStore(path=os.path.join(self.htb_cli.get_base_store_dir(), "cache", "vpn_hosts.json"))
+
+    def _resolve_hostnames(self, vpn_servers: dict[int, VpnServerInfo], switch: bool) -> dict[int, str]:
+        """Hostnames of the VPN servers. They are taken from the store, the active connections and the .ovpn files
+        of the assigned servers. Only with `switch` the account is switched to the remaining servers to download their
+        .ovpn file. Returns the hostnames by server ID."""
+        host_store = self._get_host_store()
+        hostnames: dict[int, str] = {k: v["hostname"] for k, v in host_store.get_all().items() if k in vpn_servers.keys() and v.get("hostname")}
+
+        for conn in self.client.get_active_connections():
+            if conn.server_id in vpn_servers.keys() and conn.server_hostname:
+                hostnames[conn.server_id] = conn.server_hostname
+                host_store.update(vpn_id=conn.server_id, hostname=conn.server_hostname, port=conn.server_port)
+                if self.client.ovpn_cache is not None:
+                    self.client.ovpn_cache.validate(vpn_id=conn.server_id, hostname=conn.server_hostname)
+
+        for vpn in vpn_servers.values():
+            # The .ovpn file of a server the account is not assigned to can only be downloaded after switching
+            vpn.is_assigned = vpn.is_assigned or vpn.id in self.accessible_vpn_servers.keys()
+            if vpn.id in hostnames.keys() or (not switch and not vpn.is_assigned):
+                continue
+            data = self.read_vpn_file(vpn=vpn)
+            remote = parse_remote(data) if data is not None else None
+            if remote is not None:
+                hostnames[vpn.id] = remote[0]
+                host_store.update(vpn_id=vpn.id, hostname=remote[0], port=remote[1], proto=remote[2])
+
+        return hostnames
+
     def do_benchmark(self):
         """Performing benchmark"""
         self.logger.info(f'{Fore.GREEN}Starting benchmark{Style.RESET_ALL}')
@@ -118,37 +140,213 @@ class VpnCommand(BaseCommand):
         # The "backup". Need it later for restoring old state.
         accessible_vpn_servers: dict[int, AccessibleVpnServer] = self.client.get_accessible_vpn_server()
 
-        result: dict[int, Optional[dict]] = dict()
+        switch = self.args.resolve_hostnames if hasattr(self.args, "resolve_hostnames") else False
         try:
-            pbar_servers = tqdm(vpn_servers.values())
-            for vpn in pbar_servers:
-                pbar_servers.set_description(f'Testing "{vpn.name}" (Location: {vpn.location})')
-                data = self.read_vpn_file(vpn=vpn)
-                if data is None:
-                    continue
-
-                remote_line = next(x for x in data.split("\n") if x.startswith("remote"))
-                hostname = remote_line.split()[1]
-                vpn_server: dict = vpn_servers[vpn.id].to_dict()
-                vpn_server["latency"] = self.ping_hostname(hostname, count=2)
-                vpn_server["hostname"] = hostname
-                vpn_server["is_assigned"] = bool(vpn.id in accessible_vpn_servers.keys())
-                result[vpn.id] = vpn_server
-        except KeyboardInterrupt:
-            pass
+            hostnames = self._resolve_hostnames(vpn_servers=vpn_servers, switch=switch)
+        finally:
+            if switch:
+                for accessible_vpn_server_id in accessible_vpn_servers.keys():
+                    if accessible_vpn_server_id in vpn_servers.keys():
+                        vpn_servers[accessible_vpn_server_id].switch()
+
+        unknown = [x for x in vpn_servers.values() if x.id not in hostnames.keys()]
+        if len(unknown) > 0:
+            self.logger.warning(f'{Fore.LIGHTYELLOW_EX}Skipping {len(unknown)} VPN server(s) with an unknown hostname. Run the benchmark once with '
+                                f'--resolve-hostnames to learn them (this switches your VPN servers temporarily).{Style.RESET_ALL}')
+
+        port = self.args.port if hasattr(self.args, "port") and self.args.port else DEFAULT_PROBE_PORT
+        latencies = probe_latencies(targets={k: (v, port) for k, v in hostnames.items()},
+                                    samples=self.args.samples if hasattr(self.args, "samples") and self.args.samples else DEFAULT_SAMPLES)
+
+        host_store = self._get_host_store()
+        result: dict[int, dict] = dict()
+        for vpn_id, latency in latencies.items():
+            if latency.p50 is not None:
+                host_store.update_latency(vpn_id=vpn_id, latency=latency.p50)
+            vpn_server: dict = vpn_servers[vpn_id].to_dict()
+            vpn_server.update(latency.to_dict())
+            vpn_server["hostname"] = hostnames[vpn_id]
+            vpn_server["is_assigned"] = bool(vpn_id in accessible_vpn_servers.keys())
+            result[vpn_id] = vpn_server
 
         result = {k: v for k, v in sorted(result.items(), key=lambda item: (item[1]["latency"] is None, item[1]["latency"]))}
-        for accessible_vpn_server_id in accessible_vpn_servers.keys():
-            if accessible_vpn_server_id in vpn_servers.keys():
-                vpn = vpn_servers[accessible_vpn_server_id]
-                try:
-                    vpn.switch()
-                except KeyboardInterrupt:
-                    break
-
         self.logger.info(f'{Fore.GREEN}Benchmark done{Style.RESET_ALL}')
         self.console.print(create_benchmark_table(vpn_benchmark_results=[x for x in result.values()]))
 
+    def _score_servers(self, candidates: dict[int, VpnServerInfo]) -> Tuple[dict[int, float], dict[int, dict]]:
+        """Probes the servers with a known hostname and scores them (see `score_vpn_server()`). Returns the scores and
+        the benchmark results by server ID. Servers without an answer are left out."""
+        hostnames = self._resolve_hostnames(vpn_servers=candidates, switch=False)
+        port = self.args.port if hasattr(self.args, "port") and self.args.port else DEFAULT_PROBE_PORT
+        latencies = probe_latencies(targets={k: (v, port) for k, v in hostnames.items()},
+                                    samples=self.args.samples if hasattr(self.args, "samples") and self.args.samples else DEFAULT_SAMPLES)
+
+        host_store = self._get_host_store()
+        scores: dict[int, float] = dict()
+        results: dict[int, dict] = dict()
+        for vpn_id, latency in latencies.items():
+            if latency.p50 is None:
+                continue
+            blended_latency = host_store.update_latency(vpn_id=vpn_id, latency=latency.p50)
+            scores[vpn_id] = score_vpn_server(latency=blended_latency, loss=latency.loss, current_clients=candidates[vpn_id].current_clients)
+            results[vpn_id] = candidates[vpn_id].to_dict() | latency.to_dict() | {"hostname": hostnames[vpn_id]}
+
+        return scores, results
+
+    def do_auto(self):
+        """Scores the servers of the product by latency (blended with the remembered one), load and loss and switches to
+        the best one if it is better than the assigned server by more than the threshold"""
+        vpn_servers: dict[int, VpnServerInfo] = self.client.get_all_vpn_server(products=[self.args.product], vpn_location=self.args.location)
+        candidates = {k: v for k, v in vpn_servers.items() if not v.full or v.is_assigned}
+        if len(candidates) == 0:
+            self.logger.error(f'{Fore.RED}No VPN servers found{Style.RESET_ALL}')
+            return None
+
+        scores, results = self._score_servers(candidates=candidates)
+        if len(scores) == 0:
+            self.logger.error(f'{Fore.RED}None of the VPN servers answered. Run "vpn benchmark --resolve-hostnames" once if their hostnames are unknown.{Style.RESET_ALL}')
+            return None
+
+        self.console.print(create_benchmark_table(vpn_benchmark_results=[results[k] for k in sorted(scores.keys(), key=lambda x: scores[x])]))
+
+        best = candidates[min(scores.keys(), key=lambda x: scores[x])]
+        current = next((x for x in candidates.values() if x.is_assigned), None)
+        threshold = self.args.threshold if self.args.threshold is not None else DEFAULT_AUTO_THRESHOLD
+        if current is not None and current.id == best.id:
+            self.logger.info(f'{Fore.GREEN}The assigned VPN-Server "{current.name}" is already the best one.{Style.RESET_ALL}')
+        elif current is not None and current.id in scores.keys() and scores[current.id] - scores[best.id] <= threshold:
+            self.logger.info(f'{Fore.GREEN}Keeping "{current.name}": "{best.name}" is only {scores[current.id] - scores[best.id]:.1f}ms better (threshold: {threshold}ms).{Style.RESET_ALL}')
+            best = current
+        else:
+            self.vpn_id = best.id
+            if not self.do_switch():
+                return None
+
+        if self.args.start:
+            self.vpn_id = best.id
+            self.accessible_vpn_servers = self.client.get_accessible_vpn_server()
+            self.start_vpn()
+
+    def _get_monitored_interfaces(self) -> List[str]:
+        """Interfaces of the running OpenVPN processes with a management interface (started by "vpn start")"""
+        directory = os.path.join(self.htb_cli.get_base_store_dir(), MANAGEMENT_DIRECTORY)
+        if not os.path.isdir(directory):
+            return []
+
+        existing_interfaces = psutil.net_if_addrs().keys()
+        interfaces = []
+        for name in sorted(os.listdir(directory)):
+            interface, extension = os.path.splitext(name)
+            if extension == ".sock" and interface in existing_interfaces and (self.args.interface is None or interface == self.args.interface):
+                interfaces.append(interface)
+
+        return interfaces
+
+    def do_monitor(self):
+        """Samples the throughput, the gateway latency and the reconnects of the VPN connections. A connection which is
+        degraded for several samples in a row is restarted and, if the restart did not help, failed over to the best
+        other VPN server of the product (with --failover)."""
+        interval = self.args.interval if self.args.interval else DEFAULT_MONITOR_INTERVAL
+        max_latency = self.args.max_latency if self.args.max_latency else DEFAULT_MONITOR_MAX_LATENCY
+        max_failures = self.args.failures if self.args.failures else DEFAULT_MONITOR_FAILURES
+
+        if shutil.which("ping") is None:
+            self.logger.error(f'{Fore.RED}"ping" is required to measure the latency to the VPN gateway{Style.RESET_ALL}')
+            return None
+        if len(self._get_monitored_interfaces()) == 0:
+            self.logger.error(f'{Fore.RED}No VPN connection with a management interface found. Start it with "vpn start".{Style.RESET_ALL}')
+            return None
+
+        failures: dict[str, int] = dict()
+        restarted: dict[str, bool] = dict()
+        reconnects: dict[str, int] = dict()
+        bytes_in: dict[str, int] = dict()
+        self.logger.info(f'{Fore.GREEN}Monitoring the VPN connections every {interval}s (max. latency: {max_latency}ms). Press CTRL+C to stop.{Style.RESET_ALL}')
+        try:
+            while True:
+                for interface in self._get_monitored_interfaces():
+                    health = self._get_health(interface=interface, target=self.args.target)
+                    if health is None:
+                        self.logger.warning(f'{Fore.LIGHTYELLOW_EX}{interface}: Management interface is not reachable{Style.RESET_ALL}')
+                        continue
+
+                    health_dict = health.to_dict()
+                    latency = "-" if health_dict["gateway_latency"] is None else f'{health_dict["gateway_latency"]}ms'
+                    self.logger.info(f'{interface}: {health.state}, Latency: {latency}, Loss: {(health_dict["gateway_loss"] or 0.0):.0%}, '
+                                     f'Down: {health.rx_rate / 1024:.1f} KB/s, Up: {health.tx_rate / 1024:.1f} KB/s, Reconnects: {health.reconnects}')
+                    if health.reconnects > reconnects.get(interface, health.reconnects):
+                        self.logger.warning(f'{Fore.LIGHTYELLOW_EX}{interface}: OpenVPN reconnected{Style.RESET_ALL}')
+                    reconnects[interface] = health.reconnects
+                    self._write_sample(interface=interface, health=health, interval=interval)
+
+                    degraded = health.is_degraded(max_latency=max_latency, previous_bytes_in=bytes_in.get(interface))
+                    bytes_in[interface] = health.bytes_in
+                    if not degraded:
+                        failures[interface] = 0
+                        restarted[interface] = False
+                        continue
+
+                    failures[interface] = failures.get(interface, 0) + 1
+                    if failures[interface] < max_failures:
+                        continue
+
+                    failures[interface] = 0
+                    if not restarted.get(interface, False):
+                        self.logger.warning(f'{Fore.LIGHTYELLOW_EX}{interface}: Degraded for {max_failures} samples. Restarting the tunnel.{Style.RESET_ALL}')
+                        try:
+                            with OpenVpnManagement(self._get_management_path(interface=interface)) as management:
+                                management.restart()
+                        except VpnException as e:
+                            self.logger.error(f'{Fore.RED}{interface}: {e}{Style.RESET_ALL}')
+                        restarted[interface] = True
+                    elif self.args.failover:
+                        self._failover(interface=interface)
+                    else:
+                        self.logger.error(f'{Fore.RED}{interface}: Still degraded after the restart. Use --failover to switch to another VPN server.{Style.RESET_ALL}')
+
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            return None
+
+    def _failover(self, interface: str) -> None:
+        """Stops the OpenVPN process on the interface and starts a connection to the best other VPN server of the
+        product of the current one"""
+        addresses = [x.address for x in psutil.net_if_addrs().get(interface, []) if x.family == socket.AF_INET]
+        conn = next((x for x in self.client.get_active_connections() if x.connection_ipv4 in addresses), None)
+        server = self.accessible_vpn_servers.get(conn.server_id) if conn is not None else None
+        if server is None or server.type not in FAILOVER_PRODUCTS:
+            self.logger.error(f'{Fore.RED}{interface}: No other VPN server to fail over to{Style.RESET_ALL}')
+            return None
+
+        vpn_servers: dict[int, VpnServerInfo] = self.client.get_all_vpn_server(products=[server.type])
+        candidates = {k: v for k, v in vpn_servers.items() if k != server.id and not v.full}
+        scores, _ = self._score_servers(candidates=candidates)
+        if len(scores) == 0:
+            self.logger.error(f'{Fore.RED}{interface}: None of the other VPN servers answered{Style.RESET_ALL}')
+            return None
+
+        best = candidates[min(scores.keys(), key=lambda x: scores[x])]
+        self.logger.warning(f'{Fore.LIGHTYELLOW_EX}{interface}: Failing over from "{server.name}" to "{best.name}"{Style.RESET_ALL}')
+        try:
+            with OpenVpnManagement(self._get_management_path(interface=interface)) as management:
+                management.stop()
+        except VpnException as e:
+            self.logger.error(f'{Fore.RED}{interface}: {e}{Style.RESET_ALL}')
+            return None
+
+        for _ in range(20):
+            if interface not in psutil.net_if_addrs().keys():
+                break
+            time.sleep(0.5)
+
+        self.vpn_id = best.id
+        if not self.do_switch():
+            return None
+
+        self.accessible_vpn_servers = self.client.get_accessible_vpn_server()
+        self.target_interface = interface
+        self.start_vpn()
+
     def get_interface_for_ip(self, ip_address: str):
         """Gets the interface for a given IP"""
         try:
@@ -164,6 +362,59 @@ class VpnCommand(BaseCommand):
             self.logger.error(f"Error during finding the interface: {e}")
             return None
 
+    def _get_management_path(self, interface: str) -> str:
+        return get_management_path(store_dir=self.htb_cli.get_base_store_dir(), interface=interface)
+
+    def _get_gateway(self, interface: str) -> Optional[str]:
+        """First address of the network of the interface (the VPN gateway, e.g. 10.10.14.1)"""
+        for address in psutil.net_if_addrs().get(interface, []):
+            if address.family == socket.AF_INET and address.netmask is not None:
+                network = ipaddress.ip_interface(f"{address.address}/{address.netmask}").network
+                return str(network.network_address + 1)
+
+        return None
+
+    def _get_health(self, interface: str, measure: bool = True, target: Optional[str] = None) -> Optional[VpnHealth]:
+        """Health of the OpenVPN process on the interface. Only with `measure`, the throughput and the latency to the
+        gateway (or `target`) are measured, which takes a moment. None if it has not been started by "vpn start" (no
+        management interface) or is not reachable."""
+        management_path = self._get_management_path(interface=interface)
+        if not os.path.exists(management_path):
+            return None
+
+        try:
+            if not measure:
+                return read_health(path=management_path)
+            return collect_health(path=management_path, gateway=target if target is not None else self._get_gateway(interface=interface))
+        except VpnException:
+            return None
+
+    def _get_sample_path(self, interface: str) -> str:
+        """Last sample of "vpn monitor", which is shown by "vpn status" """
+        return f"{os.path.splitext(self._get_management_path(interface=interface))[0]}.json"
+
+    def _write_sample(self, interface: str, health: VpnHealth, interval: int) -> None:
+        path = self._get_sample_path(interface=interface)
+        try:
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(health.to_dict() | {"measured_at": time.time(), "interval": interval}, f)
+            chown_to_sudo_user(f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+        except OSError:
+            pass
+
+    def _read_sample(self, interface: str) -> Optional[dict]:
+        """Last sample of "vpn monitor" if the monitor is (still) running"""
+        try:
+            with open(self._get_sample_path(interface=interface), encoding="utf-8") as f:
+                sample: dict = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - sample.get("measured_at", 0) > 2 * sample.get("interval", DEFAULT_MONITOR_INTERVAL) + 5:
+            return None
+        return sample
+
     def get_next_free_tun_interface(self):
         """Find a free (unused) tun interface that can be used"""
         if IS_WINDOWS:
@@ -289,6 +540,9 @@ class VpnCommand(BaseCommand):
                 return None
         try:
             for conn in self.client.get_active_connections():
+                if self.client.ovpn_cache is not None and conn.server_id == vpn_server.id and conn.server_hostname:
+                    # The stored file is outdated if the server has been moved to another host
+                    self.client.ovpn_cache.validate(vpn_id=conn.server_id, hostname=conn.server_hostname)
                 intf: Optional[str] = self.get_interface_for_ip(conn.connection_ipv4)
                 if intf is not None:
                     self.logger.warning(
@@ -296,35 +550,86 @@ class VpnCommand(BaseCommand):
                     return None
 
             available_tun = self.get_next_free_tun_interface()
+            ovpn_cache = self.client.ovpn_cache
+            cached = ovpn_cache is not None and ovpn_cache.get_path(vpn_id=vpn_server.id, tcp=self.tcp) is not None
+            if self._run_openvpn(vpn_server=vpn_server, interface=available_tun) is False and cached:
+                # The certificate of the stored file might have been regenerated or revoked on the website
+                self.logger.warning(f'{Fore.LIGHTYELLOW_EX}The stored OpenVPN file was rejected. Downloading it again.{Style.RESET_ALL}')
+                ovpn_cache.invalidate(vpn_id=vpn_server.id, tcp=self.tcp)
+                self._run_openvpn(vpn_server=vpn_server, interface=available_tun)
+        except Exception as e:
+            self.logger.error(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
+
+
+    def _run_openvpn(self, vpn_server: BaseVpnServer, interface: str) -> Optional[bool]:
+        """Starts OpenVPN on the interface and follows its output until the connection is initialized. Returns True if
+        it is started, False if the server rejected the certificate (TLS/auth failure, the process is stopped) and
+        None on other errors."""
+        management_path = self._get_management_path(interface=interface)
+        os.makedirs(os.path.dirname(management_path), mode=0o700, exist_ok=True)
+        if os.path.exists(management_path):
+            os.remove(management_path)
+
+        # OpenVPN keeps logging after this command has returned (e.g. on reconnects). Into a pipe without a reader
+        # this would kill the process, so the output goes into a log file which is followed until the start.
+        log_path = f"{os.path.splitext(management_path)[0]}.log"
+        with open(log_path, "w") as log:
             process = subprocess.Popen(["openvpn",
-                                        "--config", vpn_server.download(path=self.target_path, tcp=self.tcp),
-                                        "--dev", available_tun],
-                                       stdout=subprocess.PIPE,
+                                        "--config", vpn_server.get_ovpn_file(tcp=self.tcp),
+                                        "--dev", interface,
+                                        "--management", management_path, "unix"],
+                                       stdout=log,
                                        stderr=subprocess.DEVNULL,
                                        env=os.environ.copy(),
-                                       start_new_session=True,
-                                       text=True)
-
-            for line in process.stdout:
-                if "Peer Connection Initiated" in line:
-                    self.logger.info(f'{Fore.GREEN}Establishing VPN connection...{Style.RESET_ALL}')
-                elif "net_addr_v4_add" in line or "net_addr_v6_add" in line:
-                    lines = line.split(" ")
-                    if len(lines) > 3:
-                        self.logger.info(
-                            f'{Fore.GREEN}IP{"v4" if "net_addr_v4_add" in line else "v6"}: {lines[3]}{Style.RESET_ALL}')
-                elif "Initialization Sequence Completed" in line:
+                                       start_new_session=True)
+
+        for line in self._follow_log(path=log_path, process=process):
+            if "Peer Connection Initiated" in line:
+                self.logger.info(f'{Fore.GREEN}Establishing VPN connection...{Style.RESET_ALL}')
+            elif "net_addr_v4_add" in line or "net_addr_v6_add" in line:
+                lines = line.split(" ")
+                if len(lines) > 3:
                     self.logger.info(
-                        f'{Fore.GREEN}OpenVPN started for server "{vpn_server.name}" on interface {available_tun} with process id "{process.pid}".{Style.RESET_ALL}')
-                    break
-                elif "ERROR" in line:
-                    self.logger.error(f'{Fore.RED}{line.strip()}{Style.RESET_ALL}')
-                elif "Exiting due to fatal error" in line:
-                    self.logger.error(f'{Fore.RED}{line.strip()}{Style.RESET_ALL}')
-                    break
-        except Exception as e:
-            self.logger.error(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
+                        f'{Fore.GREEN}IP{"v4" if "net_addr_v4_add" in line else "v6"}: {lines[3]}{Style.RESET_ALL}')
+            elif "Initialization Sequence Completed" in line:
+                self.logger.info(
+                    f'{Fore.GREEN}OpenVPN started for server "{vpn_server.name}" on interface {interface} with process id "{process.pid}".{Style.RESET_ALL}')
+                # "vpn status" and "vpn monitor" of the user read the metrics through the management interface
+                for path in [os.path.dirname(management_path), management_path, log_path]:
+                    if os.path.exists(path):
+                        os.chmod(path, 0o700 if os.path.isdir(path) else 0o600)
+                        chown_to_sudo_user(path)
+                return True
+            elif any(x in line for x in TLS_FAILURE_MARKERS):
+                self.logger.error(f'{Fore.RED}{line.strip()}{Style.RESET_ALL}')
+                # OpenVPN would retry forever with the same certificate
+                process.terminate()
+                process.wait(timeout=10)
+                return False
+            elif "ERROR" in line:
+                self.logger.error(f'{Fore.RED}{line.strip()}{Style.RESET_ALL}')
+            elif "Exiting due to fatal error" in line:
+                self.logger.error(f'{Fore.RED}{line.strip()}{Style.RESET_ALL}')
+                return None
 
+        return None
+
+    @staticmethod
+    def _follow_log(path: str, process: subprocess.Popen):
+        """Yields the lines written into the log file while the process is running"""
+        with open(path, "r", errors="replace") as f:
+            line = ""
+            while True:
+                line += f.readline()
+                if line.endswith("\n"):
+                    yield line
+                    line = ""
+                elif process.poll() is not None:
+                    if len(line) > 0:
+                        yield line
+                    return None
+                else:
+                    time.sleep(0.1)
 
     def print_vpn_servers(self):
         """Print the VPN servers."""
@@ -355,6 +660,13 @@ class VpnCommand(BaseCommand):
             # current client is not recorded inside the active connections API but in the accessible vpn servers API
             conns_dict["current_clients"] = self.accessible_vpn_servers[x.server_id].current_clients
             conns_dict["interface"] = self.get_interface_for_ip(x.connection_ipv4)
+            # Only the counters of OpenVPN. The latency and the throughput are measured by "vpn monitor".
+            health = self._get_health(interface=conns_dict["interface"], measure=False) if conns_dict["interface"] is not None else None
+            if health is not None:
+                conns_dict.update(health.to_dict())
+                sample = self._read_sample(interface=conns_dict["interface"])
+                if sample is not None:
+                    conns_dict.update({k: sample.get(k) for k in ["rx_rate", "tx_rate", "gateway_latency", "gateway_loss"]})
             conns.append(conns_dict)
         if len(conns) == 0:
             self.logger.warning(f'{Fore.LIGHTYELLOW_EX}No active connections{Style.RESET_ALL}')
@@ -373,6 +685,10 @@ class VpnCommand(BaseCommand):
             self.print_vpn_servers()
         elif self.vpn_command == "benchmark":
             self.do_benchmark()
+        elif self.vpn_command == "auto":
+            self.do_auto()
+        elif self.vpn_command == "monitor":
+            self.do_monitor()
         elif self.vpn_command == "stop":
             self.stop_vpn()
         elif self.vpn_command == "switch":
@@ -1,13 +1,45 @@
-from .cli_panel import (create_ranking_panel, create_profile_panel, create_misc_panel,
-                        create_activity_panel, create_advanced_labs_panel, create_challenge_info_panel)
-from .argument_creator import create_arg_parser
-from .cli_table import create_table_active_vpn_connections, create_season_list_table
-from .cli_table import create_vpn_list_table, create_benchmark_table, create_machine_list_table
-from .cli_panel import create_prolab_info_panel_text, create_pwnbox_panel, create_panel_active_machine_status
-from .argument_creator import _create_season_command_parser
-from .cli_panel import create_season_panel, create_machine_info_panel
-from .cli_table import create_machine_list_group_by_retired, create_machine_list_group_by_os
-from .cli_panel import create_prolab_detail_info_panel, create_sherlock_list_group_by_retired_panel
-from .cli_table import create_table_challenge_list
-from .cli_table import create_table_badge_list
+import importlib
 
+# Function -> module. The panels and tables (rich, PIL, ...) are imported on first access (PEP 562), so that parsing
+# the arguments does not import them.
+_CONSOLE_MODULES = {
+    "create_arg_parser": ".argument_creator",
+    "_create_season_command_parser": ".argument_creator",
+    "create_ranking_panel": ".cli_panel",
+    "create_profile_panel": ".cli_panel",
+    "create_misc_panel": ".cli_panel",
+    "create_activity_panel": ".cli_panel",
+    "create_advanced_labs_panel": ".cli_panel",
+    "create_challenge_info_panel": ".cli_panel",
+    "create_prolab_info_panel_text": ".cli_panel",
+    "create_pwnbox_panel": ".cli_panel",
+    "create_panel_active_machine_status": ".cli_panel",
+    "create_season_panel": ".cli_panel",
+    "create_machine_info_panel": ".cli_panel",
+    "create_prolab_detail_info_panel": ".cli_panel",
+    "create_sherlock_list_group_by_retired_panel": ".cli_panel",
+    "create_table_active_vpn_connections": ".cli_table",
+    "create_season_list_table": ".cli_table",
+    "create_vpn_list_table": ".cli_table",
+    "create_benchmark_table": ".cli_table",
+    "create_machine_list_table": ".cli_table",
+    "create_machine_list_group_by_retired": ".cli_table",
+    "create_machine_list_group_by_os": ".cli_table",
+    "create_table_challenge_list": ".cli_table",
+    "create_table_badge_list": ".cli_table",
+}
+
+__all__ = list(_CONSOLE_MODULES.keys())
+
+
+def __getattr__(name: str):
+    if name not in _CONSOLE_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_CONSOLE_MODULES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
@@ -3,10 +3,16 @@ from argparse import ArgumentParser
 
 from colorama import Fore, Style
 
+from command.registry import LazyCommand
+
 
 # noinspection PyUnresolvedReferences
 def create_arg_parser(htb_cli: "HtbCLI") -> ArgumentParser:
     parser: ArgumentParser = argparse.ArgumentParser(prog=f"{htb_cli.package_name}", description=f"{Fore.MAGENTA}CLI tool for HTB operations.{Style.RESET_ALL}")
+    parser.add_argument("--debug", action="store_true", help="Print debug information (e.g. timings of the API calls).")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--no-cache", action="store_true", help="Neither read nor write the local HTTP response cache for this call.")
+    cache_group.add_argument("--refresh", action="store_true", help="Ignore cached responses and refresh the local HTTP response cache with the latest data.")
     subparsers = parser.add_subparsers(title="commands", description="Available commands", dest="command")
 
     # info command
@@ -60,16 +66,23 @@ def create_arg_parser(htb_cli: "HtbCLI") -> ArgumentParser:
     # Respect command
     _create_respect_command_parser(subparsers=subparsers)
 
+    # Completion command
+    _create_completion_command_parser(subparsers=subparsers)
+
+    # Shell command
+    _create_shell_command_parser(subparsers=subparsers)
+
+    # Daemon command
+    _create_daemon_command_parser(subparsers=subparsers)
+
     # help command
     subparsers.add_parser("help", help="show this help message and exit")
 
     return parser
 
 def _create_vhosts_command_parser(subparsers):
-    from command import VhostCommand
-
     vhost_parser: ArgumentParser = subparsers.add_parser("vhost", help="Commands for Vhost")
-    vhost_parser.set_defaults(func=VhostCommand)
+    vhost_parser.set_defaults(func=LazyCommand("VhostCommand"))
     vhost_sub_parser = vhost_parser.add_subparsers(title="commands", description="Available commands", dest="vhost")
     vhost_add_sub_parser = vhost_sub_parser.add_parser(name="add", help="Add vhost in hosts file for the active running machine.")
     vhost_add_sub_parser.add_argument("--subdomain", type=str, metavar="<HOSTNAME>", required=True, help="Add <HOSTNAME> to the hosts file. Adding more than one host must be seperated by commas [,]")
@@ -78,15 +91,12 @@ def _create_vhosts_command_parser(subparsers):
 
 
 def _create_respect_command_parser(subparsers):
-    from command import RespectCommand
     vhost_parser: ArgumentParser = subparsers.add_parser("respect", help="If you like htb-operator, please give the author a HTB respect (which is free of charge) by running this command")
-    vhost_parser.set_defaults(func=RespectCommand)
+    vhost_parser.set_defaults(func=LazyCommand("RespectCommand"))
 
 def _create_badge_command_parser(subparsers):
-    from command import BadgeCommand
-
     badge_parser: ArgumentParser = subparsers.add_parser("badge", help="Commands for Badges")
-    badge_parser.set_defaults(func=BadgeCommand)
+    badge_parser.set_defaults(func=LazyCommand("BadgeCommand"))
     badge_sub_parser = badge_parser.add_subparsers(title="commands", description="Available commands", dest="badge")
     badge_list_parser = badge_sub_parser.add_parser(name="list", help="List all badges")
     badge_list_parser.add_argument("-s", "--username", type=str, default=None,help="Specify an username. Default is the own user")
@@ -95,10 +105,8 @@ def _create_badge_command_parser(subparsers):
 
 
 def _create_sherlock_command_parser(subparsers):
-    from command import SherlockCommand
-
     sherlock_parser: ArgumentParser = subparsers.add_parser("sherlock", help="Commands for Sherlock")
-    sherlock_parser.set_defaults(func=SherlockCommand)
+    sherlock_parser.set_defaults(func=LazyCommand("SherlockCommand"))
     sherlock_sub_parser = sherlock_parser.add_subparsers(title="commands", description="Available commands", dest="sherlock")
     sherlock_list_parser = sherlock_sub_parser.add_parser(name="list", help="List active sherlocks")
     sherlock_status_group = sherlock_list_parser.add_mutually_exclusive_group()
@@ -113,10 +121,8 @@ def _create_sherlock_command_parser(subparsers):
 
 
 def _create_pwnbox_command_parser(subparsers):
-    from command import PwnBoxCommand
-
     pwnbox_parser: ArgumentParser = subparsers.add_parser("pwnbox", help="Commands for Pwnbox")
-    pwnbox_parser.set_defaults(func=PwnBoxCommand)
+    pwnbox_parser.set_defaults(func=LazyCommand("PwnBoxCommand"))
     pwnbox_sub_parser = pwnbox_parser.add_subparsers(title="commands", description="Available commands", dest="pwnbox")
     pwnbox_sub_parser.add_parser(name="status", help="Status of an active running Pwnbox")
     pwnbox_sub_parser.add_parser(name="ssh", help="Connect to pwnbox via SSH")
@@ -125,10 +131,8 @@ def _create_pwnbox_command_parser(subparsers):
 
 
 def _create_season_command_parser(subparsers):
-    from command import SeasonCommand
-
     seasons_parser: ArgumentParser = subparsers.add_parser("seasons", help="Commands for Seasons")
-    seasons_parser.set_defaults(func=SeasonCommand)
+    seasons_parser.set_defaults(func=LazyCommand("SeasonCommand"))
     seasons_sub_parser = seasons_parser.add_subparsers(title="commands", description="Available commands", dest="seasons")
     seasons_sub_parser.add_parser(name="list", help="List all Seasons")
     seasons_sub_parser.add_parser(name="machine", help="List all machines of the current season")
@@ -138,8 +142,6 @@ def _create_season_command_parser(subparsers):
 
 def _create_prolabs_command_parser(subparsers):
     """Prolabs command"""
-    from command import ProlabsCommand
-
     def add_id_name_arguments(parser: ArgumentParser):
         parser.add_argument("--id", type=int, metavar="Prolab ID",
                             help="ID of the Prolab. Either --id or --name must be specified")
@@ -147,7 +149,7 @@ def _create_prolabs_command_parser(subparsers):
                             help="Name of the Prolab. Either --id or --name must be specified")
 
     prolabs_parser: ArgumentParser = subparsers.add_parser("prolabs", help="Commands for Prolabs")
-    prolabs_parser.set_defaults(func=ProlabsCommand)
+    prolabs_parser.set_defaults(func=LazyCommand("ProlabsCommand"))
     prolabs_sub_parser = prolabs_parser.add_subparsers(title="commands", description="Available commands", dest="prolabs")
     prolabs_sub_parser.add_parser(name="list", help="List all Prolabs")
 
@@ -181,19 +183,15 @@ def _create_prolabs_command_parser(subparsers):
     prolabs_submit_flag.add_argument("-fl", "--flag", type=str, metavar="Flag", help="The flag")
 
 def _create_api_key_command_parser(subparsers):
-    from command import ApiKey
-
     api_key_parser: ArgumentParser = subparsers.add_parser("api_key", help="Some api-key configurations")
     api_key_parser.add_argument("--check", action="store_true", help="Check the validity of the stored API-Key.")
     api_key_parser.add_argument("--renew", type=str,
                                 help="Stored a new API key. Alter configurations inside the config file are preserved.")
-    api_key_parser.set_defaults(func=ApiKey)
+    api_key_parser.set_defaults(func=LazyCommand("ApiKey"))
 
 def _create_vpn_command_parser(subparsers):
-    from command import VpnCommand
-
     vpn_parser: ArgumentParser = subparsers.add_parser("vpn", help="Commands for OpenVPN in HTB")
-    vpn_parser.set_defaults(func=VpnCommand)
+    vpn_parser.set_defaults(func=LazyCommand("VpnCommand"))
     vpn_sub_parser = vpn_parser.add_subparsers(title="commands", description="Available commands", dest="vpn")
 
     vpn_list_parser = vpn_sub_parser.add_parser(name="list", help="List all VPN Servers")
@@ -229,55 +227,91 @@ def _create_vpn_command_parser(subparsers):
     vpn_benchmark_parser.add_argument("--prolabs", action="store_true",help="Benchmark all prolabs VPN servers")
     vpn_benchmark_parser.add_argument("--only-accessible", action="store_true", help="Benchmark all current accessible VPN servers")
     vpn_benchmark_parser.add_argument("--location", type=str, metavar="<Location>", default=None, help="Benchmark VPN servers which resides in the given location")
+    vpn_benchmark_parser.add_argument("--samples", type=int, default=None, metavar="N", help="Number of latency samples per VPN server. Default: 5")
+    vpn_benchmark_parser.add_argument("--port", type=int, default=None, metavar="PORT", help="TCP port used to measure the latency (TCP handshake). Default: 443")
+    vpn_benchmark_parser.add_argument("--resolve-hostnames", action="store_true", help="Learn the hostnames of VPN servers not benchmarked before by downloading their OpenVPN file. This switches your VPN servers temporarily (they are switched back afterwards)")
+
+    vpn_auto_parser = vpn_sub_parser.add_parser(name="auto", help="Switch to the best VPN server (latency, load and loss) of a product if it is noticeably better than the assigned one")
+    vpn_auto_parser.add_argument("--product", type=str, default="labs", choices=["labs", "starting_point", "fortresses", "release_arena", "endgames"], help="Product of the VPN servers. Default: labs")
+    vpn_auto_parser.add_argument("--location", type=str, metavar="<Location>", default=None, help="Only consider VPN servers in the given location")
+    vpn_auto_parser.add_argument("--threshold", type=float, default=None, metavar="MS", help="Switch only if the best server is better than the assigned one by more than this (in ms). Default: 15")
+    vpn_auto_parser.add_argument("--samples", type=int, default=None, metavar="N", help="Number of latency samples per VPN server. Default: 5")
+    vpn_auto_parser.add_argument("--port", type=int, default=None, metavar="PORT", help="TCP port used to measure the latency (TCP handshake). Default: 443")
+    vpn_auto_parser.add_argument("--start", action="store_true", help="Start the VPN connection to the selected server afterwards. SUDO/Root permissions are required.")
+    vpn_auto_parser.add_argument("--tcp", action="store_true", help="Uses a TCP-connection instead of an UDP-connection (with --start)")
+
+    vpn_monitor_parser = vpn_sub_parser.add_parser(name="monitor", help="Monitor the throughput, gateway latency and reconnects of the VPN connections started by \"vpn start\" and restart degraded tunnels")
+    vpn_monitor_parser.add_argument("--interface", type=str, default=None, metavar="<Interface Name>", help="Only monitor the VPN connection on the given interface")
+    vpn_monitor_parser.add_argument("--interval", type=int, default=None, metavar="SECONDS", help="Seconds between two samples. Default: 10")
+    vpn_monitor_parser.add_argument("--max-latency", type=float, default=None, metavar="MS", help="Gateway latency (in ms) above which a sample counts as degraded. Default: 300")
+    vpn_monitor_parser.add_argument("--failures", type=int, default=None, metavar="N", help="Number of degraded samples in a row after which the tunnel is restarted. Default: 3")
+    vpn_monitor_parser.add_argument("--target", type=str, default=None, metavar="<IP>", help="Host used to measure the latency instead of the VPN gateway (e.g. the IP of the active machine)")
+    vpn_monitor_parser.add_argument("--failover", action="store_true", help="Switch to the best other VPN server of the product if a restart did not help. SUDO/Root permissions are required.")
 
     vpn_switch_parser = vpn_sub_parser.add_parser(name="switch", help="Switch the VPN Server")
     vpn_switch_parser.add_argument("--id", type=int, metavar="<ID of VPN Server>", required=True, help="ID of the VPN Server")
 
+def _create_completion_command_parser(subparsers):
+    from htb_completion import SHELLS
+
+    completion_parser: ArgumentParser = subparsers.add_parser("completion", help='Shell completion of commands and of machine, challenge, Prolab and VPN server names. Enable it with e.g. eval "$(htb-operator completion bash)"')
+    completion_parser.add_argument("shell", nargs="?", choices=SHELLS, default=None, help="Print the completion script for the shell")
+    completion_parser.add_argument("--refresh-index", action="store_true", help="Update the local index of names used for the completion")
+    completion_parser.set_defaults(func=LazyCommand("CompletionCommand"))
+
+
+def _create_shell_command_parser(subparsers):
+    shell_parser: ArgumentParser = subparsers.add_parser("shell", help="Interactive shell which runs the commands in one process, reusing the connection and caches (with history and tab completion)")
+    shell_parser.set_defaults(func=LazyCommand("ShellCommand"))
+
+
+def _create_daemon_command_parser(subparsers):
+    daemon_parser: ArgumentParser = subparsers.add_parser("daemon", help="Background process which keeps the client and caches warm and answers read-only commands (and status queries of scripts) over a UNIX socket")
+    daemon_parser.add_argument("--poll-interval", type=int, default=None, metavar="SECONDS", help="Interval in which the active machine and the VPN connections are polled. Default: 30")
+    daemon_parser.set_defaults(func=LazyCommand("DaemonCommand"))
+    daemon_sub_parser = daemon_parser.add_subparsers(title="commands", description="Available commands", dest="daemon")
+    daemon_sub_parser.add_parser(name="stop", help="Stop the running daemon")
+    daemon_status_parser = daemon_sub_parser.add_parser(name="status", help="Print the state of the running daemon as JSON")
+    daemon_status_parser.add_argument("--query", type=str, default=None, choices=["status", "active_machine", "active_machine_ip", "vpn_status"], help="Print only the answer of this query")
+
+
 def _create_version_command_parser(subparsers):
-    from command import VersionCommand
     version_parser: ArgumentParser = subparsers.add_parser("version", help="Displays the current version and can check for a new version.")
-    version_parser.set_defaults(func=VersionCommand)
+    version_parser.set_defaults(func=LazyCommand("VersionCommand"))
     version_parser.add_argument("--check", action="store_true", help="Checks for a new version")
 
 
 def _create_proxy_command_parser(subparsers):
-    from command import ProxyCommand
-
     proxy_parser: ArgumentParser = subparsers.add_parser("proxy", help="Proxy configuration")
     proxy_parser.add_argument("--http", metavar="HTTP_PROXIES", type=str,
                               help='Specify the http(s) proxy in the form "<http_proxy>,<https_proxy>" seperated by ","')
     proxy_parser.add_argument("--clear", action="store_true", help="Clear the proxies")
-    proxy_parser.set_defaults(func=ProxyCommand)
+    proxy_parser.set_defaults(func=LazyCommand("ProxyCommand"))
 
 
 def _create_config_command_parser(subparsers):
-    from command import ConfigCommand
-
     config_parser: ArgumentParser = subparsers.add_parser("config", help="General configuration settings")
     ssl_group = config_parser.add_mutually_exclusive_group()
     ssl_group.add_argument("--verify-ssl", action="store_true", help="Enable SSL certificate verification")
     ssl_group.add_argument("--no-verify-ssl", action="store_true", help="Disable SSL certificate verification")
-    config_parser.set_defaults(func=ConfigCommand)
+    config_parser.add_argument("--cache-stats", action="store_true", help="Show the hit/revalidation/miss ratio of the local HTTP cache")
+    config_parser.set_defaults(func=LazyCommand("ConfigCommand"))
 
 
 def _create_init_command_parser(subparsers):
-    from command import InitCommand
-
     init_parser: ArgumentParser = subparsers.add_parser("init", help="Initialize the htb-operator")
     init_parser.add_argument("-api", "--apikey", type=str, required=True, help="Specify the API-key.")
     init_parser.add_argument("--apiurl", type=str, default=None, help="(Optional) URL for accessing the HTB API")
-    init_parser.set_defaults(func=InitCommand)
+    init_parser.set_defaults(func=LazyCommand("InitCommand"))
 
 
 def _create_machine_command_parser(subparsers):
-    from command import MachineCommand
-
     def add_id_name_arguments(parser: ArgumentParser):
         parser.add_argument("--name", type=str, metavar="Machine Name", help="Name of the Machine. Either --id or --name must be specified")
         parser.add_argument("--id", type=int, metavar="Machine ID", help="ID of the Machine. Either --id or --name must be specified")
 
     machine_parser: ArgumentParser = subparsers.add_parser(name="machine", help="Commands for HTB-Machines")
-    machine_parser.set_defaults(func=MachineCommand)
+    machine_parser.set_defaults(func=LazyCommand("MachineCommand"))
     machine_sub_parser = machine_parser.add_subparsers(title="commands", description="Available commands", dest="machine")
 
     machine_start = machine_sub_parser.add_parser(name="start", help="Start a machine")
@@ -333,14 +367,12 @@ def _create_machine_command_parser(subparsers):
 
 
 def _create_challenge_command_parser(subparsers):
-    from command import ChallengeCommand
-
     def add_id_name_arguments(parser: ArgumentParser):
         parser.add_argument("--name", type=str, metavar="Challenge Name",help="Name of the challenge. Either --id or --name must be specified")
         parser.add_argument("--id", type=int, metavar="Challenge ID", help="ID of the challenge. Either --id or --name must be specified")
 
     challenge_parser: ArgumentParser = subparsers.add_parser(name="challenge", help="Commands for HTB-Challenges")
-    challenge_parser.set_defaults(func=ChallengeCommand)
+    challenge_parser.set_defaults(func=LazyCommand("ChallengeCommand"))
     challenge_sub_parser = challenge_parser.add_subparsers(title="commands", description="Available commands",
                                                            dest="challenge")
     challenge_list_parser: ArgumentParser = challenge_sub_parser.add_parser(name="list",
@@ -392,6 +424,31 @@ def _create_challenge_command_parser(subparsers):
                                     help="Clear / Remove the downloaded file after unzipping. Works only if --unzip is specified.")
     challenge_download.add_argument("-s", "--start_instance", action="store_true",
                                     help="Try to start the instance when the download was successful.")
+    challenge_download.add_argument("--segments", type=int, default=1, metavar="N",
+                                    help="Download the file in N parts concurrently if the server supports it. Default: 1")
+    challenge_bulk_download: ArgumentParser = challenge_sub_parser.add_parser(name="bulk_download", help="Download the files of all challenges matching the filters concurrently")
+    challenge_bulk_status_group = challenge_bulk_download.add_mutually_exclusive_group()
+    challenge_bulk_status_group.add_argument("--active", action="store_true", default=False,
+                                             help="only active challenges are downloaded (default behavior)")
+    challenge_bulk_status_group.add_argument("--retired", action="store_true", default=False,
+                                             help="only retired challenges are downloaded")
+    challenge_bulk_status_group.add_argument("--all", action="store_true", default=False,
+                                             help="download all challenges (both active and retired)")
+    challenge_bulk_download.add_argument("--unsolved", action="store_true", help="only unsolved challenges are downloaded")
+    challenge_bulk_download.add_argument("--solved", action="store_true",
+                                         help="only solved challenges are downloaded. If both --solved and --unsolved are specified, just unsolved will be downloaded")
+    challenge_bulk_download.add_argument("--todo", action="store_true", help='only challenges which are marked as "TODO"')
+    challenge_bulk_download.add_argument("--category", metavar="CATEGORY", type=str, default=None,
+                                         help="Filter challenges by category")
+    challenge_bulk_download.add_argument("--difficulty", metavar="Difficulty", type=str, default=None,
+                                         help="Filter challenges by difficulty")
+    challenge_bulk_download.add_argument("-d", "--path", type=str, default=None, metavar="Directory",
+                                         help="Directory where every challenge is downloaded into its own subdirectory. If no directory is provided, the current working directory will be used.")
+    challenge_bulk_download.add_argument("--unzip", action="store_true",
+                                         help="Unzip the downloaded files in the directory of the challenge.")
+    challenge_bulk_download.add_argument("-w", "--workers", type=int, default=4, metavar="N",
+                                         help="Number of concurrent downloads. Default: 4")
+
     challenge_instance: ArgumentParser = challenge_sub_parser.add_parser(name="instance",
                                                                          help="Start/Stop instance if provided")
     challenge_instance_sub = challenge_instance.add_subparsers(title="commands", description="Available commands", dest="instance")
@@ -411,15 +468,15 @@ def _create_challenge_command_parser(subparsers):
     challenge_download_writeup.add_argument("-d", "--path", type=str, default=None, metavar="Directory",
                                             help="Directory where the writeup will be downloaded. If no directory is provided, the current working directory will be used."
                                                  "If the directory doest not exist, it will be created.")
+    challenge_download_writeup.add_argument("--segments", type=int, default=1, metavar="N",
+                                            help="Download the file in N parts concurrently if the server supports it. Default: 1")
 
 
 def _create_certificate_command_parser(subparsers):
-    from command import CertificateCommand
-
     certificate_parser: ArgumentParser = subparsers.add_parser("certificate",
                                                                help="Retrieve obtained certificates of completion")
     certificate_parser.add_argument("-l", "--list", action="store_true", help="List all obtained certificates")
-    certificate_parser.set_defaults(func=CertificateCommand)
+    certificate_parser.set_defaults(func=LazyCommand("CertificateCommand"))
     certificate_download_parser = (
         certificate_parser.add_subparsers(title="commands", description="Available commands", dest="certificate")
         .add_parser(name="download", help="Download certificate of completion"))
@@ -430,12 +487,10 @@ def _create_certificate_command_parser(subparsers):
 
 
 def _create_info_command_parser(subparsers):
-    from command import InfoCommand
-
     info_parser: ArgumentParser = subparsers.add_parser("info",
                                                         help="Retrieve information from the active machine or a user.")
     info_parser.add_argument("-s", "--username", type=str, default=None,
                              help="Specify an username to retrieve their information. Default is the own user")
     info_parser.add_argument("-a", "--activity", action="store_true",
                              help="Show only the activity of the user if possible. All entries will be displayed!")
-    info_parser.set_defaults(func=InfoCommand)
+    info_parser.set_defaults(func=LazyCommand("InfoCommand"))
@@ -117,6 +117,8 @@ def create_benchmark_table(vpn_benchmark_results: list) -> Table | Panel:
     table = Table(expand=True, show_lines=False, box=None)
     table.add_column(header="#",justify="left")
     table.add_column(header="Latency [ms]", justify="left")
+    table.add_column(header="p90 [ms]", justify="left")
+    table.add_column(header="Loss", justify="center")
     table.add_column(header="VPN-ID", justify="center")
     table.add_column(header="Hostname", justify="left")
     table.add_column(header="Product", justify="left")
@@ -127,13 +129,18 @@ def create_benchmark_table(vpn_benchmark_results: list) -> Table | Panel:
 
     for i, res in enumerate(vpn_benchmark_results):
         latency = res['latency']
-        if res["latency"] < 50:
+        if latency is None:
+            latency = f'[bold bright_red]Timeout[/bold bright_red]'
+        elif res["latency"] < 50:
             latency = f'[bold bright_green]{latency}ms[/bold bright_green]'
         elif res["latency"] < 120:
             latency = f'[bold bright_yellow]{latency}ms[/bold bright_yellow]'
         else:
             latency = f'[bold bright_red]{latency}ms[/bold bright_red]'
 
+        latency_p90 = res.get("latency_p90")
+        loss = res.get("loss")
+
         current_clients = res['current_clients']
         if res["current_clients"] < 20:
             current_clients = f'[bold bright_green]{current_clients}[/bold bright_green]'
@@ -144,6 +151,8 @@ def create_benchmark_table(vpn_benchmark_results: list) -> Table | Panel:
 
         table.add_row(f'{i + 1}',
                       f'{latency}',
+                      '-' if latency_p90 is None else f'{latency_p90}ms',
+                      '-' if loss is None else f'{loss:.0%}',
                       f'{res["id"]}',
                       f'{res["hostname"]}',
                       f'{res["product"]}',
@@ -194,6 +203,15 @@ def create_vpn_list_table(vpn_servers: list[dict]) -> Table | Panel:
                  title_align="left",
                  expand=False)
 
+def _format_traffic(vpn_connection: dict) -> str:
+    """Throughput (measured by "vpn monitor") or the transferred bytes of a VPN connection"""
+    if vpn_connection.get("rx_rate", None) is not None:
+        return f'{vpn_connection["rx_rate"] / 1024:.1f} / {vpn_connection["tx_rate"] / 1024:.1f} KB/s'
+    if vpn_connection.get("bytes_in", None) is not None:
+        return f'{vpn_connection["bytes_in"] / 1024 / 1024:.1f} / {vpn_connection["bytes_out"] / 1024 / 1024:.1f} MB'
+    return "-"
+
+
 def create_table_active_vpn_connections(vpn_connections: List[dict]):
     table = Table(title="Active VPN-Connections", show_lines=True)
     table.add_column(header="Type", style="cyan", justify="left")
@@ -207,8 +225,13 @@ def create_table_active_vpn_connections(vpn_connections: List[dict]):
     table.add_column(header="IPv6", style="cyan", justify="left")
     table.add_column(header="Interface", style="cyan", justify="left")
     table.add_column(header="# Clients connected", style="cyan", justify="left")
+    table.add_column(header="Gateway Latency", style="cyan", justify="left")
+    table.add_column(header="Down / Up", style="cyan", justify="left")
+    table.add_column(header="Reconnects", style="cyan", justify="left")
 
     for vpn_connection in vpn_connections:
+        latency = vpn_connection.get("gateway_latency", None)
+        has_health = "reconnects" in vpn_connection
         table.add_row(f'{vpn_connection["type"]}',
                       f'{vpn_connection["name"]}',
                       f'{vpn_connection["server_id"]}',
@@ -219,7 +242,10 @@ def create_table_active_vpn_connections(vpn_connections: List[dict]):
                       f'{vpn_connection["connection_ipv4"]}',
                       f'{vpn_connection["connection_ipv6"]}',
                       f'{vpn_connection["interface"]}',
-                      f'{vpn_connection["current_clients"]}'
+                      f'{vpn_connection["current_clients"]}',
+                      f'{latency}ms' if latency is not None else ("Timeout" if vpn_connection.get("gateway_loss", None) is not None else "-"),
+                      _format_traffic(vpn_connection),
+                      f'{vpn_connection["reconnects"]}' if has_health else "-"
                       )
 
     return table
@@ -0,0 +1,247 @@
+"""Shell completion (bash, zsh, fish) for htb-operator.
+
+This module is the entry point of the completion scripts (`htb-operator-complete`). It runs on every <TAB>, so it only
+uses the standard library: no httpx, no API client and no network. The candidates are read from plain files in the
+`cache/completion` folder of the store directory:
+
+- `tree.json`: commands, subcommands and options of the argument parser
+- `<kind>.txt`: one "<ID>\t<name>" line per machine, challenge, Sherlock, Pro Lab or VPN server
+
+The files are written by `htb-operator completion --refresh-index`. If they are outdated, that command is started in
+the background and the (outdated) files are used for this completion.
+"""
+import configparser
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple, Dict
+
+PACKAGE_NAME = "htb-operator"
+DEFAULT_INDEX_TTL = 60 * 60
+# A background refresh is started at most once within this time
+REFRESH_RETRY_SECONDS = 2 * 60
+KINDS = ("machine", "challenge", "sherlock", "prolab", "vpn")
+# Top level command -> kind of the values of its "--name" and "--id" options
+COMMAND_KINDS = {"machine": "machine",
+                 "challenge": "challenge",
+                 "sherlock": "sherlock",
+                 "prolabs": "prolab",
+                 "vpn": "vpn"}
+SHELLS = ("bash", "zsh", "fish")
+
+_BASH_SCRIPT = """_htb_operator_complete() {
+    local IFS=$'\\n'
+    COMPREPLY=($(htb-operator-complete --shell bash -- "${COMP_WORDS[@]:0:COMP_CWORD+1}" 2>/dev/null))
+}
+complete -o default -F _htb_operator_complete htb-operator
+"""
+
+_ZSH_SCRIPT = """#compdef htb-operator
+_htb_operator() {
+    local -a candidates
+    candidates=("${(@f)$(htb-operator-complete --shell zsh -- "${(@)words[1,CURRENT]}" 2>/dev/null)}")
+    if [[ -n "${candidates[1]}" ]]; then
+        compadd -U -a candidates
+    else
+        _files
+    fi
+}
+compdef _htb_operator htb-operator
+"""
+
+_FISH_SCRIPT = """complete -c htb-operator -f -a '(htb-operator-complete --shell fish -- (commandline -opc) (commandline -ct) 2>/dev/null)'
+"""
+
+
+def get_script(shell: str) -> str:
+    """Returns the completion script for the given shell"""
+    return {"bash": _BASH_SCRIPT, "zsh": _ZSH_SCRIPT, "fish": _FISH_SCRIPT}[shell]
+
+
+def get_base_store_dir() -> str:
+    """Same as `HtbCLI.get_base_store_dir()`, which cannot be imported here without the API client."""
+    if sys.platform.startswith("win"):
+        config_path = os.path.join(os.getenv("APPDATA"), PACKAGE_NAME)
+    else:
+        config_path = os.path.join(os.path.expanduser("~"), ".config", PACKAGE_NAME)
+
+    env_store_dir = os.environ.get("HTB_TERMINAL_STORE_DIR")
+    return env_store_dir if env_store_dir else config_path
+
+
+def get_index_dir(store_dir: Optional[str] = None) -> str:
+    return os.path.join(store_dir if store_dir is not None else get_base_store_dir(), "cache", "completion")
+
+
+def parser_to_tree(parser) -> dict:
+    """Converts an argparse parser into the tree used for the completion:
+    {"options": [...], "value_options": [...], "commands": {name: tree}}"""
+    import argparse
+
+    tree = {"options": [], "value_options": [], "commands": {}}
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            for name, sub_parser in action.choices.items():
+                tree["commands"][name] = parser_to_tree(sub_parser)
+            continue
+
+        tree["options"] += action.option_strings
+        if action.option_strings and action.nargs != 0:
+            tree["value_options"] += action.option_strings
+
+    return tree
+
+
+def write_index(index_dir: str, tree: Optional[dict] = None, names: Optional[Dict[str, List[Tuple[int, str]]]] = None) -> None:
+    """Writes the command tree and/or the names by kind. Every file is replaced atomically, so that a completion
+    running at the same time never reads a partial file."""
+    os.makedirs(index_dir, exist_ok=True)
+
+    files = {}
+    if tree is not None:
+        files["tree.json"] = json.dumps(tree)
+    for kind, entries in (names or {}).items():
+        files[f"{kind}.txt"] = "".join(f"{entry_id}\t{_clean_name(name)}\n" for entry_id, name in entries if name)
+
+    for filename, content in files.items():
+        tmp_path = os.path.join(index_dir, f".{filename}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, os.path.join(index_dir, filename))
+
+
+def _clean_name(name: str) -> str:
+    return " ".join(str(name).split())
+
+
+def read_names(index_dir: str, kind: str) -> List[Tuple[str, str]]:
+    """Returns the (ID, name) entries of the kind. Empty if the index does not exist yet."""
+    try:
+        with open(os.path.join(index_dir, f"{kind}.txt"), encoding="utf-8") as f:
+            return [tuple(line.rstrip("\n").split("\t", 1)) for line in f if "\t" in line]
+    except OSError:
+        return []
+
+
+def is_stale(index_dir: str, ttl: int) -> bool:
+    """True if the names are missing or older than `ttl` seconds"""
+    try:
+        return time.time() - min(os.path.getmtime(os.path.join(index_dir, f"{kind}.txt")) for kind in KINDS) > ttl
+    except OSError:
+        return True
+
+
+def refresh_in_background(index_dir: str) -> bool:
+    """Starts `htb-operator completion --refresh-index` detached from the shell. Returns False if a refresh has just
+    been started (by this or another completion)."""
+    lock_path = os.path.join(index_dir, "refresh.lock")
+    try:
+        if time.time() - os.path.getmtime(lock_path) < REFRESH_RETRY_SECONDS:
+            return False
+    except OSError:
+        pass
+
+    try:
+        os.makedirs(index_dir, exist_ok=True)
+        with open(lock_path, "w"):
+            pass
+        subprocess.Popen([sys.executable, "-c", "from htb_operator import main; main()", "completion", "--refresh-index"],
+                         stdin=subprocess.DEVNULL,
+                         stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL,
+                         start_new_session=True)
+    except OSError:
+        return False
+
+    return True
+
+
+def _get_index_ttl(store_dir: str) -> int:
+    config = configparser.ConfigParser()
+    try:
+        config.read(os.path.join(store_dir, "config.ini"))
+        return config.getint("Completion", "ttl_minutes", fallback=DEFAULT_INDEX_TTL // 60) * 60
+    except (configparser.Error, ValueError):
+        return DEFAULT_INDEX_TTL
+
+
+def complete(words: List[str], index_dir: str, shell: str = "bash", tree: Optional[dict] = None) -> List[str]:
+    """Returns the candidates for the last word of the command line `words` (starting with the program name). The
+    command tree is read from the index, unless it is given."""
+    node = tree
+    if node is None:
+        try:
+            with open(os.path.join(index_dir, "tree.json"), encoding="utf-8") as f:
+                node = json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    if len(words) == 0:
+        return []
+    current = words[-1].replace("\\ ", " ").strip("'\"")
+    previous = words[-2] if len(words) > 1 else None
+
+    path = []
+    for word in words[1:-1]:
+        if word in node["commands"]:
+            node = node["commands"][word]
+            path.append(word)
+
+    if previous in node["value_options"]:
+        kind = COMMAND_KINDS.get(path[0]) if len(path) > 0 else None
+        if kind is None or previous not in ("--name", "--id"):
+            # Let the shell complete e.g. a path
+            return []
+        return _complete_names(read_names(index_dir, kind), current, by_id=previous == "--id", shell=shell)
+
+    if current.startswith("-"):
+        candidates = node["options"]
+    else:
+        candidates = list(node["commands"].keys())
+
+    return sorted(x for x in candidates if x.startswith(current))
+
+
+def _complete_names(entries: List[Tuple[str, str]], current: str, by_id: bool, shell: str) -> List[str]:
+    current_lower = current.lower()
+    if by_id:
+        matches = [x for x in entries if x[0].startswith(current)]
+    else:
+        # Prefix matches first. If there are none, names containing the word.
+        matches = [x for x in entries if x[1].lower().startswith(current_lower)]
+        if len(matches) == 0:
+            matches = [x for x in entries if current_lower in x[1].lower()]
+
+    if by_id:
+        # fish shows the name as description of the ID
+        return [f"{entry_id}\t{name}" if shell == "fish" else entry_id for entry_id, name in matches]
+    if shell == "bash":
+        return [name.replace(" ", "\\ ") for _, name in sorted(matches, key=lambda x: x[1].lower())]
+    return [name for _, name in sorted(matches, key=lambda x: x[1].lower())]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """htb-operator-complete [--shell bash|zsh|fish] -- <words of the command line>"""
+    argv = sys.argv[1:] if argv is None else argv
+    shell = "bash"
+    if len(argv) >= 2 and argv[0] == "--shell":
+        shell = argv[1]
+        argv = argv[2:]
+    if len(argv) > 0 and argv[0] == "--":
+        argv = argv[1:]
+
+    store_dir = get_base_store_dir()
+    index_dir = get_index_dir(store_dir)
+    for candidate in complete(words=argv, index_dir=index_dir, shell=shell):
+        print(candidate)
+
+    # Only after the answer has been written. The shell does not wait for the refresh.
+    sys.stdout.flush()
+    if os.path.exists(os.path.join(store_dir, "config.ini")) and is_stale(index_dir, ttl=_get_index_ttl(store_dir)):
+        refresh_in_background(index_dir)
+
+
+if __name__ == "__main__":
+    main()
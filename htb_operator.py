@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
 import argparse
+import atexit
 import configparser
 import ctypes
+import hashlib
 import itertools
 import logging
 import os
@@ -19,8 +21,9 @@ from colorama import Fore, Style
 from rich.console import Console
 
 from command.base import BaseCommand, InsufficientPermissions
-from console import *
-from htbapi import HTBClient, RequestException, HtbHtbHttpRequest, BaseHtbHttpRequest
+from command.registry import LazyCommand
+from console.argument_creator import create_arg_parser
+from htbapi import HTBClient, RequestException, HtbHtbHttpRequest, BaseHtbHttpRequest, HttpCache, BlobStore, Catalog, OvpnCache
 
 IS_WINDOWS: bool = sys.platform.startswith("win")
 IS_ROOT_OR_ADMIN: bool =  ((not IS_WINDOWS and os.getuid() == 0) or
@@ -30,7 +33,10 @@ class HtbCLI:
     """Main class for the HTB-Command line interface"""
     AUTHOR_USERNAME = "user01337"
     RESPECT_PROMPT_DONE_KEY = "respect_prompt_done"
-    PROMPT_EXCLUDED_COMMANDS = {"help", "init", "respect", "version"}
+    PROMPT_EXCLUDED_COMMANDS = {"help", "init", "respect", "version", "completion", "shell", "daemon"}
+    # The output of "completion" is evaluated by the shell, "shell" reads from stdin and "daemon" runs until it is
+    # stopped. No spinner must be written.
+    NO_WAIT_ANIMATION_COMMANDS = {"completion", "shell", "daemon"}
 
     class _OutputProxy:
         def __init__(self, wrapped, on_write):
@@ -65,6 +71,10 @@ class HtbCLI:
         self._wait_animation_lock = threading.Lock()
         self._wait_animation_stream = sys.stdout
         self._wait_animation_last_len = 0
+        self.http_cache: Optional[HttpCache] = None
+        self.blob_store: Optional[BlobStore] = None
+        self.catalog: Optional[Catalog] = None
+        self.ovpn_cache: Optional[OvpnCache] = None
 
         try:
             self.version = version(self.package_name)
@@ -88,12 +98,29 @@ class HtbCLI:
                 verify_ssl = True
 
             if htb_http_request is None:
+                self.http_cache = HttpCache(directory=os.path.join(self.get_base_store_dir(), "cache", "http"),
+                                            namespace=self.api_key,
+                                            max_size=self.config.getint("Cache", "max_size_mb", fallback=64) * 1024 * 1024)
+                # The hit/miss counters are kept in memory and written once
+                atexit.register(self.http_cache.close)
+                # Content-addressed, so it can be shared between accounts (and users, e.g. on a jump host)
+                self.blob_store = BlobStore(directory=self.config.get("Cache", "blob_dir", fallback=os.path.join(self.get_base_store_dir(), "blobs")),
+                                            max_size=self.config.getint("Cache", "blob_max_size_mb", fallback=2048) * 1024 * 1024)
                 htb_http_request = HtbHtbHttpRequest(app_token=self.api_key,
                                                      api_base=self._api_base,
                                                      user_agent=self._user_agent,
                                                      proxy=self.proxy if self.proxy else None,
-                                                     verify_ssl=verify_ssl)
-            self.client = HTBClient(htb_http_request=htb_http_request)
+                                                     verify_ssl=verify_ssl,
+                                                     cache=self.http_cache,
+                                                     blob_store=self.blob_store)
+                # The catalog contains the solved state, so it is stored per account
+                self.catalog = Catalog(path=os.path.join(self.get_base_store_dir(), "cache", "catalog", f"{hashlib.sha256(self.api_key.encode()).hexdigest()[:16]}.sqlite"),
+                                       ttl=self.config.getint("Catalog", "ttl_minutes", fallback=60) * 60,
+                                       full_sync_ttl=self.config.getint("Catalog", "full_sync_hours", fallback=24) * 60 * 60,
+                                       vpn_ttl=self.config.getint("Catalog", "vpn_ttl_minutes", fallback=10) * 60)
+                # Contains the certificate of the account, so the files are stored per API key (with 0600)
+                self.ovpn_cache = OvpnCache(directory=os.path.join(self.get_base_store_dir(), "cache", "ovpn"), namespace=self.api_key)
+            self.client = HTBClient(htb_http_request=htb_http_request, catalog=self.catalog, ovpn_cache=self.ovpn_cache)
 
     def _animate_wait(self, text: str) -> None:
         spinner = itertools.cycle(['|', '/', '-', '\\'])
@@ -204,15 +231,40 @@ class HtbCLI:
 
         parser: ArgumentParser = create_arg_parser(self)
         args: argparse.Namespace = parser.parse_args()
+        self.dispatch(parser=parser, args=args)
+        print()
+
+    def dispatch(self, parser: ArgumentParser, args: argparse.Namespace, interactive: bool = True) -> None:
+        """Runs the command of the parsed arguments. Used for every command line of the `shell` and the `daemon` as
+        well. Without `interactive` (the output is captured by the daemon), there is neither a prompt nor a spinner."""
         init = self.api_key is not None
 
+        if self.http_cache is not None:
+            self.http_cache.enabled = not args.no_cache
+            self.http_cache.refresh = args.refresh
+        if self.blob_store is not None:
+            self.blob_store.enabled = not args.no_cache
+            self.blob_store.refresh = args.refresh
+        if self.catalog is not None:
+            self.catalog.enabled = not args.no_cache
+            self.catalog.refresh = args.refresh
+        if self.ovpn_cache is not None:
+            self.ovpn_cache.enabled = not args.no_cache
+            self.ovpn_cache.refresh = args.refresh
+
+        if args.debug if hasattr(args, "debug") else False:
+            self.logger.setLevel(logging.DEBUG)
+        else:
+            self.logger.setLevel(logging.INFO)
+
         if args.command is None or args.command == "help":
             parser.print_help()
-        elif not init and args.command not in ["version", "init"]:
+        elif not init and args.command not in ["version", "init", "completion"]:
             print(f"{Fore.RED}HTB-Operator needs to be initialized. Use the \"init\" command.{Style.RESET_ALL}", file=sys.stderr)
         else:
             try:
-                self.maybe_prompt_author_respect(command_name=args.command)
+                if interactive:
+                    self.maybe_prompt_author_respect(command_name=args.command)
                 original_stdout = sys.stdout
                 original_stderr = sys.stderr
                 stdout_proxy = HtbCLI._OutputProxy(original_stdout, self.stop_wait_animation)
@@ -228,11 +280,15 @@ class HtbCLI:
                     elif handler.stream is original_stdout:
                         handler.stream = stdout_proxy
 
-                self.start_wait_animation(stream=original_stdout)
+                if interactive and args.command not in HtbCLI.NO_WAIT_ANIMATION_COMMANDS:
+                    # Commands of the shell are dispatched while the streams of the shell are already wrapped
+                    self.start_wait_animation(stream=original_stdout._wrapped if isinstance(original_stdout, HtbCLI._OutputProxy) else original_stdout)
                 sys.stdout = stdout_proxy
                 sys.stderr = stderr_proxy
                 try:
-                    if not (ismethod(args.func) or isfunction(args.func)) and issubclass(args.func, BaseCommand):
+                    if isinstance(args.func, LazyCommand):
+                        args.func(self, args).execute()
+                    elif not (ismethod(args.func) or isfunction(args.func)) and issubclass(args.func, BaseCommand):
                         args.func(self, args).execute()
                     else:
                         args.func(args)
@@ -250,7 +306,6 @@ class HtbCLI:
                 return None
             except InsufficientPermissions as e:
                 pass
-        print()
 
 class CustomFormatter(logging.Formatter):
     """Custom logging formatter with color."""
@@ -262,6 +317,8 @@ class CustomFormatter(logging.Formatter):
             prefix = f"{Fore.RED}[-]{Style.RESET_ALL}"
         elif level == "WARNING":
             prefix = f"{Fore.YELLOW}[*]{Style.RESET_ALL}"
+        elif level == "DEBUG":
+            prefix = f"{Fore.LIGHTBLACK_EX}[D]{Style.RESET_ALL}"
         else:
             prefix = ""
         return f"{prefix} {record.getMessage()}"
@@ -278,6 +335,12 @@ def setup_logger() -> Logger:
     return logger
 
 def main():
+    # A running daemon answers read-only commands with its warm client and caches
+    from command.daemon import forward_command
+    from htb_completion import get_base_store_dir
+    if forward_command(store_dir=get_base_store_dir(), argv=sys.argv[1:]):
+        return None
+
     cli = HtbCLI()
     try:
         cli.start()
@@ -10,7 +10,15 @@ from .machine import MachineOsUserProfile, MachineInfo, ActiveMachineInfo, Machi
 from .challenge import ChallengeUserProfile, ChallengeList, Category, ChallengeInfo
 from .certificate import Certificate
 from .vpn import VpnServerInfo, VpnConnection, AccessibleVpnServer, BaseVpnServer
+from .vpn_probe import probe_latencies, LatencyResult, VpnHostStore, parse_remote, score_vpn_server, ping_latency
+from .openvpn_management import OpenVpnManagement, VpnHealth, collect_health, read_health, get_management_path
 from .season import SeasonList, SeasonLeaderboardUserPosition, SeasonUserDetails
 from .pwnbox import PwnboxStatus, PwnboxUsage
 from .badge import Badge, BadgeCategory
-from .htb_http_request import HtbHtbHttpRequest, BaseHtbHttpRequest
+from .htb_http_request import HtbHtbHttpRequest, BaseHtbHttpRequest, AsyncHtbHttpRequest
+from .http_cache import HttpCache
+from .blob_store import BlobStore
+from .catalog import Catalog
+from .ovpn_cache import OvpnCache
+from .rate_limiter import RateLimiter
+from .async_client import AsyncHTBClient
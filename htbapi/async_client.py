@@ -0,0 +1,162 @@
+import asyncio
+import threading
+from typing import Optional, Union
+
+from .client import HTBClient
+from .htb_http_request import AsyncHtbHttpRequest, BaseHtbHttpRequest, HtbHtbHttpRequest
+
+
+class _LoopBridgeHttpRequest(BaseHtbHttpRequest):
+    """Synchronous view on an AsyncHtbHttpRequest.
+
+    The HTBClient (and the lazy attributes of the API objects) issue blocking requests. The AsyncHTBClient runs them in
+    worker threads, which hand every request over to the event loop, so that they share the HTTP/2 connection of the
+    AsyncHtbHttpRequest. Requests issued without a running loop or on the loop thread itself (e.g. a lazy attribute
+    that is read in a coroutine) cannot wait for the loop and are sent with a synchronous client instead.
+    """
+    _async_request: AsyncHtbHttpRequest
+    _loop: Optional[asyncio.AbstractEventLoop]
+    _sync_request: Optional[HtbHtbHttpRequest]
+    _lock: threading.Lock
+
+    def __init__(self, async_request: AsyncHtbHttpRequest):
+        super().__init__(app_token=async_request._app_token,
+                         api_base=async_request._api_base,
+                         user_agent=async_request._user_agent,
+                         download_cooldown=async_request._download_cooldown,
+                         api_version=async_request._api_version)
+        self._async_request = async_request
+        self._loop = None
+        self._sync_request = None
+        self._lock = threading.Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def _get_sync_request(self) -> HtbHtbHttpRequest:
+        with self._lock:
+            if self._sync_request is None:
+                self._sync_request = HtbHtbHttpRequest(app_token=self._app_token,
+                                                       api_base=self._api_base,
+                                                       user_agent=self._user_agent,
+                                                       download_cooldown=self._download_cooldown,
+                                                       api_version=self._api_version,
+                                                       proxy=self._async_request.proxies,
+                                                       verify_ssl=self._async_request.verify_ssl,
+                                                       cache=self._async_request.cache,
+                                                       blob_store=self._async_request.blob_store,
+                                                       rate_limiter=self._async_request._rate_limiter)
+            return self._sync_request
+
+    def _can_use_loop(self) -> bool:
+        if self._loop is None or self._loop.is_closed() or not self._loop.is_running():
+            return False
+
+        try:
+            return asyncio.get_running_loop() is not self._loop
+        except RuntimeError:
+            # No loop in this thread, i.e. a worker thread
+            return True
+
+    def set_proxies(self, proxies: Optional[dict]) -> None:
+        self._async_request.set_proxies(proxies)
+
+    def set_verify_ssl(self, verify_ssl: bool) -> None:
+        self._async_request.set_verify_ssl(verify_ssl)
+
+    def post_request(self, endpoint: str, json=None, api_version: str = "v4") -> dict:
+        if not self._can_use_loop():
+            return self._get_sync_request().post_request(endpoint=endpoint, json=json, api_version=api_version)
+
+        coro = self._async_request.post_request(endpoint=endpoint, json=json, api_version=api_version)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def get_request(self,
+                    endpoint: Optional[str] = None,
+                    download=False,
+                    base: str = None,
+                    custom_url: Optional[str] = None,
+                    api_version: Optional[str] = None) -> Union[list, dict, bytes]:
+        if not self._can_use_loop():
+            return self._get_sync_request().get_request(endpoint=endpoint,
+                                                        download=download,
+                                                        base=base,
+                                                        custom_url=custom_url,
+                                                        api_version=api_version)
+
+        coro = self._async_request.get_request(endpoint=endpoint,
+                                               download=download,
+                                               base=base,
+                                               custom_url=custom_url,
+                                               api_version=api_version)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def download(self,
+                 path: str,
+                 endpoint: Optional[str] = None,
+                 custom_url: Optional[str] = None,
+                 api_version: Optional[str] = None,
+                 expected_sha256: Optional[str] = None,
+                 resume: bool = True,
+                 segments: int = 1) -> str:
+        if not self._can_use_loop():
+            return self._get_sync_request().download(path=path,
+                                                     endpoint=endpoint,
+                                                     custom_url=custom_url,
+                                                     api_version=api_version,
+                                                     expected_sha256=expected_sha256,
+                                                     resume=resume,
+                                                     segments=segments)
+
+        coro = self._async_request.download(path=path,
+                                            endpoint=endpoint,
+                                            custom_url=custom_url,
+                                            api_version=api_version,
+                                            expected_sha256=expected_sha256,
+                                            resume=resume,
+                                            segments=segments)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+
+class AsyncHTBClient:
+    """Asyncio facade of the HTBClient.
+
+    Every `get_*` method of the HTBClient is available as a coroutine with the same signature, e.g.
+    `await client.get_user()`. Independent calls can be awaited concurrently with `asyncio.gather()`, so the latency is
+    bounded by the slowest call instead of the sum of all calls. All calls share one HTTP/2 connection.
+    """
+    htb_http_request: AsyncHtbHttpRequest
+    client: HTBClient
+    _bridge: _LoopBridgeHttpRequest
+
+    def __init__(self, htb_http_request: AsyncHtbHttpRequest) -> None:
+        assert htb_http_request is not None
+        self.htb_http_request = htb_http_request
+        self._bridge = _LoopBridgeHttpRequest(async_request=htb_http_request)
+        self.client = HTBClient(htb_http_request=self._bridge)
+
+    def __getattr__(self, item):
+        attr = getattr(self.client, item)
+        if not item.startswith("get_") or not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            self._bridge.bind(asyncio.get_running_loop())
+            return await asyncio.to_thread(attr, *args, **kwargs)
+
+        call.__name__ = item
+        call.__doc__ = attr.__doc__
+        return call
+
+    async def aclose(self) -> None:
+        """Close the shared connection."""
+        await self.htb_http_request.aclose()
+
+    async def __aenter__(self) -> "AsyncHTBClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.aclose()
+
+    def __repr__(self):
+        return f"<AsyncHTBClient {self.htb_http_request._api_base}>"
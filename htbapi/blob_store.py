@@ -0,0 +1,153 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Optional
+
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024
+# ioctl request of Linux to clone a file (reflink), e.g. on btrfs or XFS
+_FICLONE = 0x40049409
+_SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobStore:
+    """Content-addressed store for downloaded files (challenge archives, writeups, ...).
+
+    Every file is stored once under its SHA-256 below `directory`. A file whose hash is known before the download (e.g.
+    `ChallengeInfo.download_sha256`) is taken from the store instead of the network: as a hardlink if possible,
+    otherwise as a reflink or a copy. Since a hardlinked file can be changed by the user, the content is verified
+    before it is used. If the store exceeds `max_size` bytes, the least recently used files are evicted.
+    """
+    directory: str
+    max_size: int
+    enabled: bool
+    refresh: bool
+    _lock: threading.Lock
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE):
+        assert directory is not None
+
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = True
+        self.refresh = False
+        self._lock = threading.Lock()
+
+    def _get_path(self, sha256: str) -> str:
+        return os.path.join(self.directory, sha256[:2], sha256)
+
+    def contains(self, sha256: str) -> bool:
+        sha256 = sha256.lower()
+        return _SHA256_PATTERN.match(sha256) is not None and os.path.isfile(self._get_path(sha256))
+
+    def get(self, sha256: str, path: str) -> bool:
+        """Places the file with the given SHA-256 at `path`. Returns False if the store does not contain it."""
+        if not self.enabled or self.refresh or sha256 is None or not self.contains(sha256):
+            return False
+
+        sha256 = sha256.lower()
+        blob_path = self._get_path(sha256)
+        if _hash_file(blob_path) != sha256:
+            # Changed through a hardlink (or damaged). Never hand out wrong content.
+            _remove(blob_path)
+            return False
+
+        try:
+            _materialize(blob_path, path)
+            # Mark as recently used for the LRU eviction. The modification time is kept, it is shared by all hardlinks.
+            os.utime(blob_path, (time.time(), os.stat(blob_path).st_mtime))
+        except OSError:
+            return False
+
+        return True
+
+    def put(self, path: str, sha256: str) -> None:
+        """Adds the file at `path` with the given (already verified) SHA-256 to the store."""
+        if not self.enabled or sha256 is None:
+            return None
+
+        sha256 = sha256.lower()
+        if _SHA256_PATTERN.match(sha256) is None or self.contains(sha256):
+            return None
+
+        blob_path = self._get_path(sha256)
+        try:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            _materialize(path, blob_path)
+        except OSError:
+            # The store is only an optimization. Never break a download because of it (e.g. read-only store dir).
+            return None
+
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Removes the least recently used files until the store fits into `max_size`."""
+        blobs = []
+        total_size = 0
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                if _SHA256_PATTERN.match(file) is None:
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                blobs.append((stat.st_atime, stat.st_size, path))
+                total_size += stat.st_size
+
+        for _, size, path in sorted(blobs):
+            if total_size <= self.max_size:
+                break
+            _remove(path)
+            total_size -= size
+
+        return None
+
+    def __repr__(self):
+        return f"<BlobStore '{self.directory}'>"
+
+
+def _materialize(source: str, target: str) -> None:
+    """Places `source` at `target` (replacing it) as hardlink, reflink or copy, in this order."""
+    tmp_path = os.path.join(os.path.dirname(os.path.abspath(target)),
+                            f".{os.path.basename(target)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            # Other file system, too many links or not supported
+            _clone_or_copy(source, tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        _remove(tmp_path)
+
+
+def _clone_or_copy(source: str, target: str) -> None:
+    try:
+        import fcntl
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        return None
+    except (ImportError, OSError):
+        pass
+
+    shutil.copyfile(source, target)
+
+
+def _hash_file(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError:
+        return None
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
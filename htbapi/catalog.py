@@ -0,0 +1,465 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, List, Iterable, Set, Tuple
+
+from .ovpn_cache import chown_to_sudo_user
+
+KINDS = ("machine", "challenge", "sherlock", "prolab")
+
+DEFAULT_TTL = 60 * 60
+DEFAULT_FULL_SYNC_TTL = 24 * 60 * 60
+DEFAULT_VPN_TTL = 10 * 60
+# A VPN server list the account cannot access (e.g. the servers of a Pro Lab) is not requested again within this time
+DEFAULT_VPN_FORBIDDEN_TTL = 24 * 60 * 60
+# Minimum trigram similarity (shared / all trigrams of both names) of a suggested name
+MIN_SIMILARITY = 0.3
+
+_logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    retired INTEGER,
+    difficulty TEXT,
+    os TEXT,
+    category_id INTEGER,
+    solved INTEGER,
+    todo INTEGER,
+    release_date TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS entries_name ON entries (kind, name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS entries_release ON entries (kind, release_date);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_name ON users (name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS trigrams (
+    kind TEXT NOT NULL,
+    trigram TEXT NOT NULL,
+    id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trigrams_lookup ON trigrams (kind, trigram);
+CREATE INDEX IF NOT EXISTS trigrams_id ON trigrams (kind, id);
+CREATE TABLE IF NOT EXISTS sync (
+    kind TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL,
+    full_synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vpn_servers (
+    source TEXT PRIMARY KEY,
+    data TEXT,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+class Catalog:
+    """Local SQLite mirror of the machine, challenge, Sherlock and Pro Lab lists of an account.
+
+    The raw API entries are stored together with the columns used for filtering (name, retired, difficulty, OS,
+    category, solved and TODO state, release date), so that lists can be filtered and searched locally in milliseconds
+    and offline. The mirror is synchronized by `HTBClient.sync_catalog()`: incrementally after `ttl` seconds (only new
+    entries and the current ones) and completely after `full_sync_ttl` seconds or after the account state has changed
+    (`invalidate()`, e.g. a submitted flag).
+
+    All names (and the names of resolved users) are indexed by their trigrams, so that names can be resolved to IDs and
+    misspelled names can be matched (`resolve_name()`, `suggest_names()`) without a request.
+
+    The VPN server lists are stored by source (product or Pro Lab) for `vpn_ttl` seconds. A list the account is not
+    allowed to access is stored as well (without data) and is not requested again for `vpn_forbidden_ttl` seconds.
+
+    The catalog is only an optimization: if the database cannot be used (e.g. a corrupt file or one written by root),
+    the catalog disables itself and everything is requested from the API.
+    """
+    path: str
+    ttl: int
+    full_sync_ttl: int
+    vpn_ttl: int
+    vpn_forbidden_ttl: int
+    enabled: bool
+    refresh: bool
+    _connection: Optional[sqlite3.Connection]
+    _lock: threading.RLock
+
+    def __init__(self,
+                 path: str,
+                 ttl: int = DEFAULT_TTL,
+                 full_sync_ttl: int = DEFAULT_FULL_SYNC_TTL,
+                 vpn_ttl: int = DEFAULT_VPN_TTL,
+                 vpn_forbidden_ttl: int = DEFAULT_VPN_FORBIDDEN_TTL):
+        assert path is not None
+
+        self.path = path
+        self.ttl = ttl
+        self.full_sync_ttl = full_sync_ttl
+        self.vpn_ttl = vpn_ttl
+        self.vpn_forbidden_ttl = vpn_forbidden_ttl
+        self.enabled = True
+        self.refresh = False
+        self._connection = None
+        self._lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
+                chown_to_sudo_user(directory)
+            created = not os.path.exists(self.path)
+
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            try:
+                connection.row_factory = sqlite3.Row
+                connection.executescript(_SCHEMA)
+            except sqlite3.Error:
+                connection.close()
+                raise
+            if created:
+                # E.g. created by `vpn auto --start` (sudo), but used by the other commands of the user as well
+                chown_to_sudo_user(self.path)
+            self._connection = connection
+        return self._connection
+
+    def _disable(self, e: Exception) -> None:
+        """The database cannot be used (e.g. corrupt or read-only). The catalog is not used anymore by this process."""
+        _logger.debug(f"Catalog {self.path} disabled: {e}")
+        self.enabled = False
+        try:
+            self.close()
+        except sqlite3.Error:
+            self._connection = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def is_fresh(self, kind: str) -> bool:
+        """True if the entries of the kind were synchronized within the TTL (and no refresh is requested)."""
+        sync = self._get_sync(kind)
+        return not self.refresh and sync is not None and time.time() - sync["synced_at"] < self.ttl
+
+    def needs_full_sync(self, kind: str) -> bool:
+        """True if the entries of the kind have to be synchronized completely (instead of incrementally)."""
+        sync = self._get_sync(kind)
+        return self.refresh or sync is None or time.time() - sync["full_synced_at"] >= self.full_sync_ttl
+
+    def has_entries(self, kind: str) -> bool:
+        return self._get_sync(kind) is not None
+
+    def _get_sync(self, kind: str) -> Optional[sqlite3.Row]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            try:
+                return self._connect().execute("SELECT * FROM sync WHERE kind = ?", (kind,)).fetchone()
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+                return None
+
+    def get_ids(self, kind: str) -> Set[int]:
+        if not self.enabled:
+            return set()
+
+        with self._lock:
+            try:
+                return {row["id"] for row in self._connect().execute("SELECT id FROM entries WHERE kind = ?", (kind,))}
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+                return set()
+
+    def store(self, kind: str, entries: Iterable[dict], full: bool) -> None:
+        """Stores (inserts or updates) the raw API entries of the kind and marks the kind as synchronized. A full
+        synchronization removes all entries which are not part of `entries` anymore."""
+        assert kind in KINDS
+
+        if not self.enabled:
+            return None
+
+        rows = [_to_row(kind, x) for x in entries]
+        now = time.time()
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    if full:
+                        connection.execute("DELETE FROM entries WHERE kind = ?", (kind,))
+                        connection.execute("DELETE FROM trigrams WHERE kind = ?", (kind,))
+                    _index_names(connection, kind, [(x["id"], x["name"]) for x in rows], replace=not full)
+                    connection.executemany("INSERT OR REPLACE INTO entries VALUES "
+                                           "(:kind, :id, :name, :retired, :difficulty, :os, :category_id, :solved, :todo, :release_date, :data)",
+                                           rows)
+                    sync = connection.execute("SELECT full_synced_at FROM sync WHERE kind = ?", (kind,)).fetchone()
+                    full_synced_at = now if full or sync is None else sync["full_synced_at"]
+                    connection.execute("INSERT OR REPLACE INTO sync VALUES (?, ?, ?)", (kind, now, full_synced_at))
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+
+    def invalidate(self) -> None:
+        """The state of the account has changed (e.g. solved flags). All kinds are synchronized completely next time,
+        the stored entries can still be used if the API is not reachable."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute("UPDATE sync SET synced_at = 0, full_synced_at = 0")
+                    # E.g. the assigned VPN server has been switched. The access to a list does not change.
+                    connection.execute("UPDATE vpn_servers SET synced_at = 0 WHERE data IS NOT NULL")
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+
+    def get_vpn_servers(self, source: str, fresh: bool = True) -> Tuple[bool, Optional[dict]]:
+        """Returns whether the VPN server list of the source (e.g. "labs" or "prolab/3") is stored and its raw data
+        (None if the account cannot access it). With `fresh`, only a list within its TTL is returned."""
+        if not self.enabled or (fresh and self.refresh):
+            return False, None
+
+        with self._lock:
+            try:
+                row = self._connect().execute("SELECT * FROM vpn_servers WHERE source = ?", (source,)).fetchone()
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+                return False, None
+        if row is None:
+            return False, None
+
+        ttl = self.vpn_ttl if row["data"] is not None else self.vpn_forbidden_ttl
+        if fresh and time.time() - row["synced_at"] >= ttl:
+            return False, None
+        return True, json.loads(row["data"]) if row["data"] is not None else None
+
+    def store_vpn_servers(self, source: str, data: Optional[dict]) -> None:
+        """Stores the raw VPN server list of the source. None marks a list the account cannot access."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute("INSERT OR REPLACE INTO vpn_servers VALUES (?, ?, ?)",
+                                       (source, json.dumps(data) if data is not None else None, time.time()))
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+
+    def remember_user(self, user_id: int, name: str) -> None:
+        """Adds a resolved user to the name index"""
+        if not self.enabled or name is None:
+            return None
+
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", (user_id, name))
+                    _index_names(connection, "user", [(user_id, name)], replace=True)
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+
+    def resolve_name(self, kind: str, name: str) -> Optional[int]:
+        """Returns the ID of the entry (kind "user" for users) with the given name (case-insensitive) or None."""
+        if not self.enabled or name is None:
+            return None
+
+        table, condition = _get_names_table(kind)
+        with self._lock:
+            try:
+                row = self._connect().execute(f"SELECT id FROM {table} WHERE {condition} name = ? COLLATE NOCASE",
+                                              (kind, name.strip()) if kind != "user" else (name.strip(),)).fetchone()
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+                return None
+        return None if row is None else row["id"]
+
+    def suggest_names(self, kind: str, name: str, limit: int = 5) -> List[str]:
+        """Returns up to `limit` names similar to the given (e.g. misspelled or incomplete) one. Names starting with it
+        come first, followed by the names sharing the most trigrams."""
+        if not self.enabled or name is None or len(name.strip()) == 0:
+            return []
+
+        name = name.strip().lower()
+        trigrams = _get_trigrams(name)
+        table, condition = _get_names_table(kind)
+        params = (kind,) if kind != "user" else ()
+        with self._lock:
+            try:
+                connection = self._connect()
+                candidates: List[Tuple[int, int]] = [
+                    (row["id"], row["hits"]) for row in connection.execute(
+                        f"SELECT id, COUNT(*) AS hits FROM trigrams WHERE kind = ? AND trigram IN ({','.join('?' * len(trigrams))}) "
+                        f"GROUP BY id ORDER BY hits DESC LIMIT ?", (kind, *trigrams, limit * 10))]
+                prefixed = [row["name"] for row in connection.execute(
+                    f"SELECT name FROM {table} WHERE {condition} name LIKE ? ESCAPE '\\' ORDER BY LENGTH(name), name LIMIT ?",
+                    (*params, f"{_escape_like(name)}%", limit))]
+                names = {row["id"]: row["name"] for row in connection.execute(
+                    f"SELECT id, name FROM {table} WHERE {condition} id IN ({','.join('?' * len(candidates))})",
+                    (*params, *[x[0] for x in candidates]))}
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+                return []
+
+        scored = []
+        for candidate_id, hits in candidates:
+            candidate_name = names.get(candidate_id)
+            if candidate_name is None or candidate_name in prefixed:
+                continue
+            similarity = hits / (len(trigrams) + len(_get_trigrams(candidate_name.lower())) - hits)
+            if similarity >= MIN_SIMILARITY:
+                scored.append((-similarity, candidate_name))
+
+        return (prefixed + [x[1] for x in sorted(scored)])[:limit]
+
+    def query(self,
+              kind: str,
+              retired: Optional[bool] = None,
+              name_contains: Optional[str] = None,
+              name_prefix: Optional[str] = None,
+              os_list: Optional[List[str]] = None,
+              difficulty_list: Optional[List[str]] = None,
+              category_ids: Optional[List[int]] = None,
+              unsolved: Optional[bool] = None,
+              todo: Optional[bool] = None,
+              sort_type: Optional[str] = None,
+              limit: Optional[int] = None) -> Optional[List[dict]]:
+        """Returns the raw API entries of the kind matching all given filters. Entries without solved state are never
+        filtered by `unsolved`. `sort_type` ("asc", "desc") sorts by release date. None if the catalog cannot be used."""
+        if not self.enabled:
+            return None
+
+        conditions = ["kind = ?"]
+        params: list = [kind]
+        if retired is not None:
+            conditions.append("retired = ?")
+            params.append(int(retired))
+        if name_contains:
+            conditions.append("name LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(name_contains)}%")
+        if name_prefix:
+            conditions.append("name LIKE ? ESCAPE '\\'")
+            params.append(f"{_escape_like(name_prefix)}%")
+        if os_list:
+            conditions.append(f"LOWER(os) IN ({','.join('?' * len(os_list))})")
+            params += [x.lower() for x in os_list]
+        if difficulty_list:
+            conditions.append(f"LOWER(difficulty) IN ({','.join('?' * len(difficulty_list))})")
+            params += [x.lower() for x in difficulty_list]
+        if category_ids:
+            conditions.append(f"category_id IN ({','.join('?' * len(category_ids))})")
+            params += category_ids
+        if unsolved is not None:
+            conditions.append("(solved IS NULL OR solved != ?)")
+            params.append(int(unsolved))
+        if todo:
+            conditions.append("todo = 1")
+
+        sql = f"SELECT data FROM entries WHERE {' AND '.join(conditions)}"
+        if sort_type is not None:
+            sql += f" ORDER BY release_date {'ASC' if sort_type == 'asc' else 'DESC'}, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            try:
+                return [json.loads(row["data"]) for row in self._connect().execute(sql, params)]
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+                return None
+
+    def clear(self) -> None:
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute("DELETE FROM entries")
+                    connection.execute("DELETE FROM users")
+                    connection.execute("DELETE FROM trigrams")
+                    connection.execute("DELETE FROM sync")
+                    connection.execute("DELETE FROM vpn_servers")
+            except (sqlite3.Error, OSError) as e:
+                self._disable(e)
+
+    def __repr__(self):
+        return f"<Catalog '{self.path}'>"
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _get_trigrams(name: str) -> Set[str]:
+    """Trigrams of the (lower case) name. The padding lets the first letters weigh more, like for a prefix."""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _get_names_table(kind: str) -> Tuple[str, str]:
+    """Table and kind condition (to be followed by another condition) containing the names of the kind"""
+    return ("users", "") if kind == "user" else ("entries", "kind = ? AND")
+
+
+def _index_names(connection: sqlite3.Connection, kind: str, names: List[Tuple[int, str]], replace: bool) -> None:
+    if replace:
+        connection.executemany("DELETE FROM trigrams WHERE kind = ? AND id = ?", [(kind, x[0]) for x in names])
+    connection.executemany("INSERT INTO trigrams VALUES (?, ?, ?)",
+                           [(kind, trigram, name_id) for name_id, name in names for trigram in _get_trigrams(name.lower())])
+
+
+def _to_bool(value) -> Optional[int]:
+    return None if value is None else int(bool(value))
+
+
+def _to_row(kind: str, data: dict) -> dict:
+    """Extracts the columns used for filtering from a raw API entry."""
+    row = {"kind": kind,
+           "id": data["id"],
+           "name": data.get("name", ""),
+           "retired": None,
+           "difficulty": None,
+           "os": None,
+           "category_id": None,
+           "solved": None,
+           "todo": None,
+           "release_date": None,
+           "data": json.dumps(data)}
+
+    if kind == "machine":
+        row.update(retired=_to_bool(data.get("retired")),
+                   difficulty=data.get("difficultyText"),
+                   os=data.get("os"),
+                   solved=_to_bool(data.get("authUserInRootOwns")),
+                   todo=_to_bool(data.get("isTodo")),
+                   release_date=data.get("release"))
+    elif kind == "challenge":
+        row.update(retired=_to_bool(data.get("retired", False)),
+                   difficulty=data.get("difficulty"),
+                   category_id=data.get("challenge_category_id", data.get("category_id")),
+                   solved=_to_bool(data.get("authUserSolve")),
+                   todo=_to_bool(data.get("isTodo")),
+                   release_date=data.get("release_date"))
+    elif kind == "sherlock":
+        # Unreleased Sherlocks are neither active nor retired
+        row.update(retired={"active": 0, "retired": 1}.get(data.get("state")),
+                   difficulty=data.get("difficulty"),
+                   category_id=data.get("category_id"),
+                   solved=_to_bool(data.get("is_owned")),
+                   todo=_to_bool(data.get("isTodo")),
+                   release_date=data.get("release_date"))
+    elif kind == "prolab":
+        row.update(release_date=data.get("release_at"))
+
+    return row
@@ -1,13 +1,13 @@
-import hashlib
 import os
 from datetime import datetime
-from typing import List, Optional, cast
+from typing import List, Optional
 
 import dateutil.parser
 
 from htbapi import client, IncorrectArgumentException, User
 from htbapi.base_user_profile import BaseUserProfile
-from htbapi.exception.errors import IncorrectFlagException, UnknownDirectoryException, RequestException
+from htbapi.exception.errors import IncorrectFlagException, UnknownDirectoryException, RequestException, \
+    HashMismatchException
 
 
 class ChallengeBase(client.BaseHtbApiObject):
@@ -23,10 +23,12 @@ class ChallengeBase(client.BaseHtbApiObject):
     solved: bool
     isTodo: bool
     recommended: int
+    download_file_sha256: Optional[str]   # SHA-256 of the last downloaded file (see download())
 
     # noinspection PyUnresolvedReferences
     def __init__(self, data: dict, _client: "HTBClient"):
         self._client = _client
+        self.download_file_sha256 = None
         self.id = data['id']
         self.name = data.get('name', '')
         self.retired = data.get('retired', True)
@@ -103,18 +105,31 @@ class ChallengeBase(client.BaseHtbApiObject):
         return data["message"]
 
 
-    def download(self, path: Optional[str] = None) -> str:
+    def get_download_path(self, path: Optional[str] = None) -> str:
+        """Returns the path of the challenge file inside the given directory (default: current working directory)."""
+        filename = f'{self.name.strip().replace(" ", "_")}.zip'
         if path is None:
-            path = os.path.join(os.getcwd(), f'{self.name.strip().replace(" ", "_")}.zip')
-        else:
-            path = path.strip() + ("" if path.endswith(os.path.sep) else os.path.sep)
-            path = os.path.dirname(path)
-            if not os.path.isdir(path):
-                os.makedirs(path)
-            path = os.path.join(path, f'{self.name.strip().replace(" ", "_")}.zip')
+            return os.path.join(os.getcwd(), filename)
+
+        path = path.strip() + ("" if path.endswith(os.path.sep) else os.path.sep)
+        return os.path.join(os.path.dirname(path), filename)
+
+    def download(self, path: Optional[str] = None, segments: int = 1) -> str:
+        """Download the challenge files. An interrupted download is resumed by the next call. With `segments` > 1,
+        the file is fetched in that many parts concurrently if the server supports it."""
+        path = self.get_download_path(path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
 
         try:
-            data = cast(bytes, self._client.htb_http_request.get_request(endpoint=f"challenge/download/{self.id}", download=True))
+            # The hash is not always provided by the HTB API (e.g. for the challenge list)
+            expected_sha256 = getattr(self, "download_sha256", None) or None
+            self.download_file_sha256 = self._client.htb_http_request.download(path=path,
+                                                                               endpoint=f"challenge/download/{self.id}",
+                                                                               expected_sha256=expected_sha256,
+                                                                               segments=segments)
+        except HashMismatchException:
+            raise RequestException(f"Could not download file for challenge {self.name}: Hash mismatch.")
         except RequestException as e:
             if not e.args or len(e.args) == 0 or "message" not in e.args[0].keys():
                 raise RequestException(f"Could not download file for challenge {self.name}")
@@ -125,13 +140,11 @@ class ChallengeBase(client.BaseHtbApiObject):
                 raise RequestException(f"Could not download file for challenge {self.name}: Certificate not found.")
             else:
                 raise e
-        with open(path, "wb") as f:
-            f.write(data)
 
         return path
 
 
-    def download_writeup(self, path: Optional[str] = None) -> str:
+    def download_writeup(self, path: Optional[str] = None, segments: int = 1) -> str:
         """Download writeup"""
         data:dict = self._client.htb_http_request.get_request(endpoint=f"challenge/{self.id}/writeup")["data"]
         if "official" not in data:
@@ -152,7 +165,9 @@ class ChallengeBase(client.BaseHtbApiObject):
             path = os.path.join(path, f'{filename}')
 
         try:
-            file_data = cast(bytes, self._client.htb_http_request.get_request(custom_url=f"{url}", download=True))
+            self._client.htb_http_request.download(path=path, custom_url=f"{url}", expected_sha256=sha256, segments=segments)
+        except HashMismatchException:
+            raise RequestException(f"Could not download writeup for challenge {self.name}: Hash mismatch.")
         except RequestException as e:
             msg = e.args[0]["message"]
             if "unauthorized" in msg:
@@ -162,13 +177,6 @@ class ChallengeBase(client.BaseHtbApiObject):
             else:
                 raise e
 
-        file_hash = hashlib.sha256(file_data).hexdigest()
-        if file_hash != sha256:
-            raise RequestException(f"Could not download writeup for challenge {self.name}: Hash mismatch.")
-
-        with open(path, "wb") as f:
-            f.write(file_data)
-
         return path
 
 
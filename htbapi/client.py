@@ -1,24 +1,167 @@
+import itertools
 import os
-import time
-from typing import Optional, List, cast, Tuple
+from typing import Optional, List, cast, Tuple, Callable, Iterator
 import dateutil.parser
 from datetime import datetime, timezone
 
-from .exception.errors import RequestException, NoPwnBoxActiveException
+import httpx
+
+from .catalog import Catalog, KINDS as CATALOG_KINDS
+from .concurrency import map_concurrently, iter_concurrently, DEFAULT_MAX_WORKERS
+from .ovpn_cache import OvpnCache
+from .exception.errors import RequestException, NoPwnBoxActiveException, IncorrectArgumentException
 
-# noinspection PyUnresolvedReferences
-_vpn_server_cache = dict()
 # noinspection PyUnresolvedReferences
 _user_cache: dict[int, "User"] = dict()
 
 class HTBClient:
     # noinspection PyUnresolvedReferences
     htb_http_request: "BaseHtbHttpRequest"
+    max_workers: int
+    catalog: Optional[Catalog]
+    ovpn_cache: Optional[OvpnCache]
 
     # noinspection PyUnresolvedReferences
-    def __init__(self,htb_http_request: "BaseHtbHttpRequest") -> None:
+    def __init__(self,
+                 htb_http_request: "BaseHtbHttpRequest",
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 catalog: Optional[Catalog] = None,
+                 ovpn_cache: Optional[OvpnCache] = None) -> None:
         assert htb_http_request is not None
         self.htb_http_request = htb_http_request
+        self.max_workers = max_workers
+        self.catalog = catalog
+        self.ovpn_cache = ovpn_cache
+        if catalog is not None and hasattr(htb_http_request, "add_post_listener"):
+            # E.g. a submitted flag changes the solved state of the stored entries
+            htb_http_request.add_post_listener(lambda endpoint: catalog.invalidate())
+
+    def _query_catalog(self, kind: str, **filters) -> Optional[List[dict]]:
+        """Returns the raw entries of the kind matching the filters (see `Catalog.query()`) from the local catalog. The
+        catalog is synchronized first if it is outdated. If the API is not reachable, the stored entries are used. None
+        if the list has to be requested from the API (no catalog or an unusable database)."""
+        if self.catalog is None or not self.catalog.enabled:
+            return None
+
+        # A database which cannot be read disables the catalog
+        if not self.catalog.is_fresh(kind) and self.catalog.enabled:
+            try:
+                self.sync_catalog(kinds=[kind])
+            except (RequestException, httpx.TransportError):
+                if not self.catalog.has_entries(kind):
+                    raise
+
+        return self.catalog.query(kind=kind, **filters)
+
+    def _resolve_name(self, kind: str, id_or_name: int | str) -> int | str:
+        """Returns the ID of the given name if it is known to the local catalog. Otherwise, the name is returned
+        unchanged and resolved by the API."""
+        if (self.catalog is None or not isinstance(id_or_name, str) or id_or_name.strip().isdigit()
+                or not self.catalog.enabled or self.catalog.refresh):
+            return id_or_name
+
+        resolved_id = self.catalog.resolve_name(kind=kind, name=id_or_name)
+        return id_or_name if resolved_id is None else resolved_id
+
+    def suggest_names(self, kind: str, name: str, limit: int = 5) -> List[str]:
+        """Names of the local catalog similar to the given (e.g. misspelled) one. Valid kinds are "machine",
+        "challenge", "sherlock", "prolab" and "user"."""
+        if self.catalog is None or name is None:
+            return []
+
+        return self.catalog.suggest_names(kind=kind, name=name, limit=limit)
+
+    def _raise_not_found(self, kind: str, name: int | str, e: RequestException) -> None:
+        """Re-raises the error of an unknown name with suggestions of similar names (if there are some)."""
+        suggestions = self.suggest_names(kind=kind, name=name) if isinstance(name, str) else []
+        if len(suggestions) == 0 or len(e.args) == 0 or not isinstance(e.args[0], dict) or e.args[0].get("status_code") != 404:
+            raise e
+
+        raise RequestException({"message": f'No {kind} found with name "{name}". Did you mean: {", ".join(suggestions)}?',
+                                "status_code": 404}) from e
+
+    def sync_catalog(self, kinds: Optional[List[str]] = None) -> None:
+        """Synchronizes the local catalog with the API. Machines and Sherlocks are synchronized incrementally (new
+        entries and the active ones) unless a full synchronization is due. The other lists are small and requested
+        completely."""
+        assert self.catalog is not None
+
+        for kind in kinds if kinds is not None else CATALOG_KINDS:
+            full = self.catalog.needs_full_sync(kind)
+            if kind == "machine":
+                entries = self._fetch_catalog_pages(self._fetch_machine_page, "per_page=100&sort_type=desc", kind, full)
+                if not full:
+                    # The active machines change state (retired, owned) most often
+                    entries += self._fetch_catalog_pages(self._fetch_machine_page, "per_page=100&state=active", kind, full=True)
+            elif kind == "sherlock":
+                entries = self._fetch_catalog_pages(self._fetch_sherlock_page, "per_page=100", kind, full)
+                if not full:
+                    entries += self._fetch_catalog_pages(self._fetch_sherlock_page, "per_page=100&state=active", kind, full=True)
+            elif kind == "challenge":
+                entries = self._fetch_challenge_entries(retired=False) + self._fetch_challenge_entries(retired=True)
+                full = True
+            elif kind == "prolab":
+                entries = self._fetch_prolab_entries()
+                full = True
+            else:
+                raise IncorrectArgumentException(f"Unknown catalog kind: {kind}")
+
+            self.catalog.store(kind=kind, entries=entries, full=full)
+
+    def _fetch_catalog_pages(self,
+                             fetch_page: Callable[[str], Tuple[int, List[dict]]],
+                             query: str,
+                             kind: str,
+                             full: bool) -> List[dict]:
+        """Requests the pages (newest first) of a paginated list. If not `full`, no further page is requested after a
+        page without any entry unknown to the catalog."""
+        if full:
+            return list(self._iter_pages(fetch_page=lambda page_no: fetch_page(f"{query}&page={page_no}"),
+                                         prefetch=self.max_workers))
+
+        known_ids = self.catalog.get_ids(kind)
+        entries = []
+        page_no, last_page = 1, 1
+        while page_no <= last_page:
+            last_page, page = fetch_page(f"{query}&page={page_no}")
+            entries += page
+            if all(x["id"] in known_ids for x in page):
+                break
+            page_no += 1
+
+        return entries
+
+    @staticmethod
+    def _iter_pages(fetch_page: Callable[[int], Tuple[int, list]],
+                    limit: Optional[int] = None,
+                    per_page: Optional[int] = None,
+                    prefetch: int = 0) -> Iterator:
+        """Yields the entries of a paginated endpoint as the pages arrive. `fetch_page` returns the last page number and
+        the entries of the given page. No further page is requested once `limit` entries are yielded or the consumer
+        stops. With `prefetch` > 1, up to `prefetch` pages are requested concurrently ahead of the consumer."""
+        if limit is not None and limit <= 0:
+            return
+
+        last_page, entries = fetch_page(1)
+        if limit is not None and per_page is not None:
+            last_page = min(last_page, -(-limit // per_page))
+
+        remaining_pages = iter_concurrently(lambda page_number: fetch_page(page_number)[1],
+                                            range(2, last_page + 1),
+                                            max_workers=prefetch)
+        count = 0
+        try:
+            for page in itertools.chain([entries], remaining_pages):
+                if len(page) == 0:
+                    return
+                for entry in page:
+                    yield entry
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return
+        finally:
+            # Cancels the prefetched pages that are not needed anymore
+            remaining_pages.close()
 
     # noinspection PyUnresolvedReferences
     def get_user(self, username: Optional[str]=None, user_id: Optional[int]=None) -> "User":
@@ -34,17 +177,37 @@ class HTBClient:
                 user_id: int = int(data["id"])
 
             else:
-                data = self.htb_http_request.get_request(endpoint=f'search/fetch?query="{username}"')
-                if len(data) == 0 or "users" not in data.keys():
-                    return None
-                user_id = data["users"][0]["id"]
+                user_id = self.catalog.resolve_name(kind="user", name=username) if self.catalog is not None else None
+                if user_id in _user_cache.keys():
+                    return _user_cache[user_id]
+
+                if user_id is None:
+                    data = self.htb_http_request.get_request(endpoint=f'search/fetch?query="{username}"')
+                    if len(data) == 0 or "users" not in data.keys():
+                        return None
+                    user_id = data["users"][0]["id"]
 
         data = self.htb_http_request.get_request(endpoint=f"user/profile/basic/{user_id}")["profile"]
 
         user: User = User(_client=self, data=data)
         _user_cache[user_id] = user
+        if self.catalog is not None:
+            self.catalog.remember_user(user_id=user.id, name=user.name)
         return user
 
+    # noinspection PyUnresolvedReferences
+    def load_user_details(self, users: List["User"], badges: bool = True, experience: bool = True) -> None:
+        """Loads the badges and/or the experience data of the given users concurrently. Otherwise, they are loaded on
+        first access (one request after the other)."""
+        calls = []
+        for user in users:
+            if badges and "badges" not in user.__dict__:
+                calls.append(user._load_badges)
+            if experience and "xp_level" not in user.__dict__:
+                calls.append(user._load_experience)
+
+        map_concurrently(lambda call: call(), calls, max_workers=self.max_workers)
+
     def give_user_respect(self, user_id: int) -> None:
         """Give respect to a user by adding a +1 to their respect count."""
         self.htb_http_request.post_request(endpoint=f"user/respect/{user_id}")
@@ -58,6 +221,15 @@ class HTBClient:
         """Search for challenges for a given name."""
         from .challenge import ChallengeList
 
+        entries = self._query_catalog("challenge",
+                                      name_contains=name,
+                                      unsolved=unsolved,
+                                      todo=filter_todo,
+                                      category_ids=filter_category_list,
+                                      difficulty_list=[filter_difficulty] if filter_difficulty is not None else None)
+        if entries is not None:
+            return [ChallengeList(_client=self, data=d) for d in entries]
+
         data: List = self.htb_http_request.get_request(endpoint=f'challenges?keyword={name}&sort_type=asc')["data"]
         if len(data) == 0:
             return []
@@ -197,23 +369,40 @@ class HTBClient:
         """
         from .challenge import ChallengeList
 
+        entries = self._query_catalog("challenge",
+                                      retired=retired,
+                                      unsolved=unsolved,
+                                      todo=filter_todo,
+                                      category_ids=filter_category_list,
+                                      difficulty_list=[filter_difficulty] if filter_difficulty is not None else None)
+        if entries is not None:
+            return [ChallengeList(_client=self, data=d) for d in entries]
+
+        data = self._fetch_challenge_entries(retired=retired)
+        return [
+            ChallengeList(_client=self, data=d) for d in data
+            if unsolved is None or "authUserSolve" not in d or d["authUserSolve"] != unsolved
+                if filter_todo is None or not filter_todo or (d["isTodo"] == filter_todo)
+                if filter_category_list is None or len(filter_category_list) == 0 or (("category_id" in d.keys() and "category_id" in d and d["category_id"] in filter_category_list) or ("challenge_category_id" in d.keys() and d["challenge_category_id"] in filter_category_list))
+                if filter_difficulty is None or (d["difficulty"].lower() == filter_difficulty.lower())
+                ]
+
+    def _fetch_challenge_entries(self, retired: bool) -> List[dict]:
+        """Returns the raw entries of the retired or the active (including unreleased) challenges."""
         if retired:
             data: List[dict] = self.htb_http_request.get_request(endpoint=f"challenge/list/retired")["challenges"]
         else:
-            data: List[dict] =  self.htb_http_request.get_request(endpoint=f"challenge/list")["challenges"]
+            data: List[dict] = self.htb_http_request.get_request(endpoint=f"challenge/list")["challenges"]
             try:
                 data = data + self.htb_http_request.get_request(endpoint=f"challenges?state=unreleased&sort_type=asc")["data"]
             except:
                 # Do nothing... We already got a valid list of challenges
                 pass
 
-        return [
-            ChallengeList(_client=self, data=d) for d in data
-            if unsolved is None or "authUserSolve" not in d or d["authUserSolve"] != unsolved
-                if filter_todo is None or not filter_todo or (d["isTodo"] == filter_todo)
-                if filter_category_list is None or len(filter_category_list) == 0 or (("category_id" in d.keys() and "category_id" in d and d["category_id"] in filter_category_list) or ("challenge_category_id" in d.keys() and d["challenge_category_id"] in filter_category_list))
-                if filter_difficulty is None or (d["difficulty"].lower() == filter_difficulty.lower())
-                ]
+        # The endpoint decides whether a challenge is retired, the entries do not always contain it
+        for x in data:
+            x["retired"] = retired
+        return data
 
     # noinspection PyUnresolvedReferences
     def get_challenge_categories_list(self) -> List["Category"]:
@@ -274,6 +463,28 @@ class HTBClient:
         """Get a list of sherlock information"""
         from .sherlock import SherlockInfo
 
+        entries = self._query_catalog("sherlock",
+                                      retired=True if only_retired else False if only_active else None,
+                                      category_ids=[x.id for x in filter_sherlock_category] if filter_sherlock_category else None)
+        if entries is not None:
+            return [SherlockInfo(_client=self, data=x) for x in entries]
+
+        return list(self.iter_sherlocks(only_active=only_active,
+                                        only_retired=only_retired,
+                                        filter_sherlock_category=filter_sherlock_category,
+                                        prefetch=self.max_workers))
+
+    # noinspection PyUnresolvedReferences
+    def iter_sherlocks(self,
+                       only_active: Optional[bool]=None,
+                       only_retired: Optional[bool]=None,
+                       filter_sherlock_category: Optional[List["SherlockCategory"]]=None,
+                       limit: Optional[int] = None,
+                       prefetch: int = 0) -> Iterator["SherlockInfo"]:
+        """Yields the sherlocks (see `get_sherlocks`) page by page. No further page is requested once the consumer
+        stops. With `prefetch` > 1, that many pages are requested concurrently ahead of the consumer."""
+        from .sherlock import SherlockInfo
+
         if only_active:
             state = "&state=active"
         elif only_retired:
@@ -286,29 +497,28 @@ class HTBClient:
         else:
             categories = ""
 
-        page_no: int = 1
-        sherlock_result: List["SherlockInfo"] = []
-        while True:
-            res: dict = self.htb_http_request.get_request(endpoint=f"sherlocks?page={page_no}{state}{categories}")
+        per_page = None if limit is None else max(1, min(100, limit))
+        per_page_option = "" if per_page is None else f"&per_page={per_page}"
 
-            if res is None or len(res.keys()) == 0:
-                break
-            if "data" not in res:
-                break
+        def fetch_page(page_no: int) -> Tuple[int, List[SherlockInfo]]:
+            """Returns the last page number and the sherlocks of the page."""
+            last_page, data = self._fetch_sherlock_page(f"page={page_no}{per_page_option}{state}{categories}")
+            return last_page, [SherlockInfo(_client=self, data=x) for x in data]
 
-            data:List[dict] = res["data"]
-            if data is None or len(data) == 0:
-                break
+        return self._iter_pages(fetch_page=fetch_page, limit=limit, per_page=per_page, prefetch=prefetch)
 
-            sherlock_result += [SherlockInfo(_client=self, data=x) for x in data]
+    def _fetch_sherlock_page(self, query: str) -> Tuple[int, List[dict]]:
+        """Returns the last page number and the raw sherlock entries of the page for the given query string."""
+        res: dict = self.htb_http_request.get_request(endpoint=f"sherlocks?{query}")
 
-            last_page = res["meta"]["last_page"]
-            if page_no >= last_page:
-                break
+        if res is None or len(res.keys()) == 0 or "data" not in res:
+            return 0, []
 
-            page_no += 1
+        data: List[dict] = res["data"]
+        if data is None or len(data) == 0:
+            return 0, []
 
-        return sherlock_result
+        return res["meta"]["last_page"], data
 
     # noinspection PyUnresolvedReferences
     def get_machine_progress_profile_summary(self, user_id: int) -> List["MachineOsUserProfile"]:
@@ -334,9 +544,20 @@ class HTBClient:
         if challenge_id_or_name is None:
             return None
 
-        data = self.htb_http_request.get_request(endpoint=f'challenge/info/{challenge_id_or_name}')["challenge"]
+        try:
+            data = self.htb_http_request.get_request(endpoint=f'challenge/info/{self._resolve_name("challenge", challenge_id_or_name)}')["challenge"]
+        except RequestException as e:
+            self._raise_not_found(kind="challenge", name=challenge_id_or_name, e=e)
         return ChallengeInfo(_client=self, data=data)
 
+    # noinspection PyUnresolvedReferences
+    def get_challenge_infos(self, challenge_ids_or_names: List[int | str]) -> dict[int | str, "ChallengeInfo"]:
+        """Retrieve the challenges for the given IDs or names concurrently. Every ID is requested only once.
+        Returns the challenges by the given ID or name."""
+        unique_ids = list(dict.fromkeys(x for x in challenge_ids_or_names if x is not None))
+        challenges = map_concurrently(self.get_challenge, unique_ids, max_workers=self.max_workers)
+        return dict(zip(unique_ids, challenges))
+
 
     # noinspection PyUnresolvedReferences
     def get_challenges(self, retired: bool = False) -> List["ChallengeList"]:
@@ -355,29 +576,37 @@ class HTBClient:
         """Requests a list of `ProLab` from the API"""
         from .prolab import ProLabInfo
 
+        entries = self._query_catalog("prolab")
+        return [ProLabInfo(data=x, _client=self) for x in (entries if entries is not None else self._fetch_prolab_entries())]
+
+    def _fetch_prolab_entries(self) -> List[dict]:
         data: dict = self.htb_http_request.get_request(endpoint=f"prolabs")["data"]
 
         if data is None or len(data) == 0:
             return []
 
-        return [ProLabInfo(data=x, _client=self) for x in data["labs"]]
+        return data["labs"]
 
     # noinspection PyUnresolvedReferences
     def get_prolab(self, prolab_id: Optional[int], prolab_name: Optional[str]) -> Optional["ProLabInfo"]:
         """Requests a `ProLab` from the API"""
         from .prolab import ProLabInfo
 
-        data: dict = self.htb_http_request.get_request(endpoint=f"prolabs")["data"]
+        entries = self._query_catalog("prolab")
+        if entries is not None:
+            if prolab_id is None:
+                prolab_id = next((x["id"] for x in entries if x["name"].lower() == prolab_name.strip().lower()), None)
+            labs = [x for x in entries if x["id"] == prolab_id]
+            return ProLabInfo(data=labs[0], _client=self) if len(labs) > 0 else None
 
-        if data is None or len(data) == 0:
-            return None
+        labs: List[dict] = self._fetch_prolab_entries()
 
         data_lab: Optional[dict]
         try:
             if prolab_id is not None:
-                data_lab = next(x for x in data["labs"] if x["id"] == prolab_id)
+                data_lab = next(x for x in labs if x["id"] == prolab_id)
             else:
-                data_lab = next(x for x in data["labs"] if x["name"].lower().strip() == prolab_name.lower().strip())
+                data_lab = next(x for x in labs if x["name"].lower().strip() == prolab_name.lower().strip())
         except StopIteration:
             return None
 
@@ -394,23 +623,19 @@ class HTBClient:
                            vpn_location: Optional[str] = None) -> dict[int, "VpnServerInfo"]:
         """Get all VPN Server for the given product.
         :args: products. Valid values (as list): "labs", "starting_point", "fortresses", "release_arena", "endgames", "prolab"
-               prolab_id: If product is equal to "prolab", I prolab_id must be indicated. Use "get_prolabs()" for
-               retrieving the ID.
-               prolab_name: Name of the prolab, if product = "prolab"
+               For "prolab", the VPN servers of all Pro Labs the account can access are returned.
+               vpn_location: Only servers in this location (e.g. "EU")
         """
         from .vpn import VpnServerInfo
-        from .prolab import ProLabInfo
-        import hashlib
-        global _vpn_server_cache
 
-        def parse_data(raw_data: dict, my_location: Optional[str]) -> dict:
+        def parse_data(raw_data: dict, product_name: str) -> dict[int, VpnServerInfo]:
             data_assigned: dict = raw_data.get("assigned", dict())
             data_location: dict = raw_data.get("options", dict())
             servers = dict()
-            for location in [k for k in data_location.keys() if my_location is None or k == my_location]:
+            for location in [k for k in data_location.keys() if vpn_location is None or k == vpn_location]:
                 for location_role in data_location[location].keys():
                     for server in data_location[location][location_role]["servers"].values():
-                        server["product"] = f'{product} | {prolab_name}' if product == "prolab" else product
+                        server["product"] = product_name
                         if data_assigned is not None and server["id"] == data_assigned.get("id", -1):
                             server["is_assigned"] = True
                             server["location_type_friendly"] = data_assigned.get("location_type_friendly", None)
@@ -420,59 +645,59 @@ class HTBClient:
         if products is None or len(products) == 0:
             products = ["starting_point", "fortresses", "release_arena", "labs"]
 
+        # (source, endpoint, product name)
+        sources: List[Tuple[str, str, str]] = [(p, f"connections/servers?product={p}", p) for p in products if p != "prolab"]
+        if "prolab" in products:
+            # Only the IDs and names are needed, not the details requested by `get_prolabs()` for every Pro Lab
+            prolabs = self._query_catalog("prolab")
+            if prolabs is None:
+                prolabs = self._fetch_prolab_entries()
+            sources += [(f"prolab/{x['id']}", f"connections/servers/prolab/{x['id']}", f"prolab | {x['name']}") for x in prolabs]
+
+        raw_data = map_concurrently(lambda x: self._get_vpn_server_data(source=x[0], endpoint=x[1]), sources, max_workers=self.max_workers)
 
         vpn_servers: dict[int, VpnServerInfo] = dict()
-        for product in [p for p in products if p != "prolab"]:
-            # caching key
-            caching_key = hashlib.md5(f'{product}'.encode()).hexdigest()
-
-            # VPN Server are not altered very often. Use a cache for increasing performance. But we have to consider between
-            # "release_arena" VPN-server and for "labs" VPN Server
-            if (_vpn_server_cache is not None and
-                    caching_key in _vpn_server_cache.keys() and
-                    len(_vpn_server_cache[caching_key].keys()) > 0):
-                print(f"Caching hit: {caching_key} | {product}")
-                vpn_servers = vpn_servers | _vpn_server_cache.get(caching_key)
+        for (source, _, product_name), data in zip(sources, raw_data):
+            if data is None:
                 continue
 
-            if _vpn_server_cache is None:
-                _vpn_server_cache = dict()
-
-            data: dict = self.htb_http_request.get_request(endpoint=f"connections/servers?product={product}", api_version="v4")["data"]
-            servers = parse_data(data, my_location=vpn_location)
-            _vpn_server_cache[caching_key] = servers
-            if vpn_servers is not None and len(vpn_servers.keys()) > 0:
+            servers = parse_data(data, product_name)
+            if not source.startswith("prolab/"):
+                # E.g. the same server is used for "labs" and "release_arena"
                 for server in servers.values():
                     if server.id in vpn_servers.keys():
-                        server.product = f'{product} | {vpn_servers[server.id].product}'
-
+                        server.product = f'{server.product} | {vpn_servers[server.id].product}'
             vpn_servers = vpn_servers | servers
 
-        if "prolab" in products:
-            for prolab in self.get_prolabs():
-                product = "prolab"
-                prolab_name = prolab.name
-                # caching key
-                caching_key = hashlib.md5(f'{product}{prolab.id}'.encode()).hexdigest()
-
-                # VPN Server are not altered very often. Use a cache for increasing performance. But we have to consider between
-                # "release_arena" VPN-server and for "labs" VPN Server
-                if (_vpn_server_cache is not None and
-                        caching_key in _vpn_server_cache.keys() and
-                        len(_vpn_server_cache[caching_key].keys()) > 0):
-                    vpn_servers = vpn_servers | _vpn_server_cache.get(caching_key)
-                    continue
-                try:
-                    data: dict = self.htb_http_request.get_request(endpoint=f"connections/servers/prolab/{prolab.id}", api_version="v4")["data"]
-                except RequestException:
-                    # Ignore RequestException because we do not have read permission for some resources (e.g., when an account type is free).
-                    continue
-                servers = parse_data(data, my_location=vpn_location)
-                _vpn_server_cache[caching_key] = servers
-                vpn_servers = vpn_servers | servers
-
         return vpn_servers
 
+    def _get_vpn_server_data(self, source: str, endpoint: str) -> Optional[dict]:
+        """Raw VPN server list of a product or Pro Lab, answered by the catalog within its TTL. None if the account
+        cannot access the list (e.g. the Pro Lab servers for a free account)."""
+        catalog = self.catalog if self.catalog is not None and self.catalog.enabled else None
+        if catalog is not None:
+            stored, data = catalog.get_vpn_servers(source)
+            if stored:
+                return data
+
+        try:
+            data = self.htb_http_request.get_request(endpoint=endpoint, api_version="v4")["data"]
+        except RequestException as e:
+            status_code = e.args[0].get("status_code") if len(e.args) > 0 and isinstance(e.args[0], dict) else None
+            if catalog is not None and status_code in (401, 403, 404):
+                catalog.store_vpn_servers(source, data=None)
+            return None
+        except httpx.TransportError:
+            # Offline: the outdated list is better than none
+            stored, data = catalog.get_vpn_servers(source, fresh=False) if catalog is not None else (False, None)
+            if not stored:
+                raise
+            return data
+
+        if catalog is not None:
+            catalog.store_vpn_servers(source, data=data)
+        return data
+
     # noinspection PyUnresolvedReferences
     def get_accessible_vpn_server(self) -> dict[int, "AccessibleVpnServer"]:
         """Get all VPN Servers that are directly accessible without switching the VPN-Server"""
@@ -533,7 +758,40 @@ class HTBClient:
                          sort_by: Optional[str] = "release-date",
                          sort_type: Optional[str] = "desc") -> List["MachineInfo"]:
         """Get a list of all machines for the given keyword (search word) and whether only retired or active machine should be
-        considered."""
+        considered. All pages after the first one are fetched concurrently."""
+        from .machine import MachineInfo
+
+        entries = self._query_catalog("machine",
+                                      retired={"": None, "active": False, "retired": True}[state],
+                                      name_contains=keyword,
+                                      os_list=os_filter,
+                                      difficulty_list=difficulty_filter,
+                                      sort_type=sort_type if sort_by is not None else None,
+                                      limit=limit) if state in ("", "active", "retired") else None
+        if entries is not None:
+            return [MachineInfo(_client=self, data=x) for x in entries]
+
+        return list(self.iter_machines(state=state,
+                                       keyword=keyword,
+                                       limit=limit,
+                                       os_filter=os_filter,
+                                       difficulty_filter=difficulty_filter,
+                                       sort_by=sort_by,
+                                       sort_type=sort_type,
+                                       prefetch=self.max_workers))
+
+    # noinspection PyUnresolvedReferences
+    def iter_machines(self,
+                      state: str = "",
+                      keyword: str = None,
+                      limit: Optional[int] = None,
+                      os_filter: Optional[List[str]] = None,
+                      difficulty_filter: Optional[List[str]] = None,
+                      sort_by: Optional[str] = "release-date",
+                      sort_type: Optional[str] = "desc",
+                      prefetch: int = 0) -> Iterator["MachineInfo"]:
+        """Yields the machines (see `get_machine_list`) page by page. No further page is requested once the consumer
+        stops. With `prefetch` > 1, that many pages are requested concurrently ahead of the consumer."""
         from .machine import MachineInfo
 
         assert sort_type is None or sort_type in ["asc", "desc"]
@@ -556,43 +814,38 @@ class HTBClient:
         if difficulty_filter is not None and len(difficulty_filter) > 0:
             os_difficulty_option = "".join([f'&difficulty[]={x}' for x in difficulty_filter])
 
-        result_list: List[MachineInfo] = []
-        page_number = 1
-        while True:
-            state_param = ""
-            if state is not None and len(state) > 0:
-                state_param = f"&state={state}"
-
-            res = self.htb_http_request.get_request(endpoint=f"machines?per_page=100&page={page_number}{state_param}{keyword_option}{sort_option}{os_filter_option}{os_difficulty_option}", api_version="v5")
+        state_param = ""
+        if state is not None and len(state) > 0:
+            state_param = f"&state={state}"
 
-            data: list = res["data"]
-            if data is None or len(data) == 0:
-                return result_list
+        per_page = 100 if limit is None else max(1, min(100, limit))
 
-            # Add retired flag because that data does not contain this information
-            for x in data:
-                # MachineInfo needs "release" field (since v4 for machine profile provides this field, as well).
-                if "release" not in x:
-                    x["release"] = x.get("releaseDate", None)
+        def fetch_page(page_number: int) -> Tuple[int, List[MachineInfo]]:
+            """Returns the last page number and the machines of the page."""
+            last_page, data = self._fetch_machine_page(f"per_page={per_page}&page={page_number}{state_param}{keyword_option}{sort_option}{os_filter_option}{os_difficulty_option}")
+            return last_page, [MachineInfo(_client=self, data=x) for x in data]
 
-                if "retired" not in x:
-                    retired_date = x.get("retiredDate", None)
-                    x["retired"] = retired_date is not None and dateutil.parser.parse(retired_date).replace(tzinfo=timezone.utc) < datetime.now(tz=timezone.utc)
+        return self._iter_pages(fetch_page=fetch_page, limit=limit, per_page=per_page, prefetch=prefetch)
 
-            result_list = result_list + [MachineInfo(_client=self, data=x) for x in data]
+    def _fetch_machine_page(self, query: str) -> Tuple[int, List[dict]]:
+        """Returns the last page number and the raw machine entries of the page for the given query string."""
+        res = self.htb_http_request.get_request(endpoint=f"machines?{query}", api_version="v5")
 
-            if limit is not None and len(data) >= limit:
-                return result_list[:limit]
+        data: list = res["data"]
+        if data is None or len(data) == 0:
+            return 0, []
 
-            meta: dict = res["meta"]
-            last_page: int = meta["last_page"]
-            if last_page <= page_number:
-                break
+        # Add retired flag because that data does not contain this information
+        for x in data:
+            # MachineInfo needs "release" field (since v4 for machine profile provides this field, as well).
+            if "release" not in x:
+                x["release"] = x.get("releaseDate", None)
 
-            time.sleep(0.3)
-            page_number += 1
+            if "retired" not in x:
+                retired_date = x.get("retiredDate", None)
+                x["retired"] = retired_date is not None and dateutil.parser.parse(retired_date).replace(tzinfo=timezone.utc) < datetime.now(tz=timezone.utc)
 
-        return result_list
+        return res["meta"]["last_page"], data
 
     # noinspection PyUnresolvedReferences
     def get_unreleased_machines(self) -> List[Tuple["MachineInfo", Optional["MachineInfo"]]]:
@@ -600,15 +853,15 @@ class HTBClient:
         from .machine import MachineInfo
         data: List[dict] = self.htb_http_request.get_request(endpoint=f"machines?state=unreleased", api_version="v5")["data"]
 
+        machines = self.get_machines([row["id"] for row in data] + [row["retiring"]["id"] for row in data if "retiring" in row])
+
         res = []
         for row in data:
-            machine = self.get_machine(machine_id_or_name=row["id"])
-
             retiring_machine: Optional[MachineInfo] = None
             if "retiring" in row:
-                retiring_machine = self.get_machine(machine_id_or_name=row["retiring"]["id"])
+                retiring_machine = machines[row["retiring"]["id"]]
 
-            res.append((machine, retiring_machine))
+            res.append((machines[row["id"]], retiring_machine))
         return res
 
 
@@ -620,9 +873,20 @@ class HTBClient:
         if machine_id_or_name is None:
             return None
 
-        data = self.htb_http_request.get_request(endpoint=f'machine/profile/{machine_id_or_name}')["info"]
+        try:
+            data = self.htb_http_request.get_request(endpoint=f'machine/profile/{self._resolve_name("machine", machine_id_or_name)}')["info"]
+        except RequestException as e:
+            self._raise_not_found(kind="machine", name=machine_id_or_name, e=e)
         return MachineInfo(_client=self, data=data)
 
+    # noinspection PyUnresolvedReferences
+    def get_machines(self, machine_ids_or_names: List[int | str]) -> dict[int | str, "MachineInfo"]:
+        """Retrieve the machines for the given IDs or names concurrently. Every ID is requested only once.
+        Returns the machines by the given ID or name."""
+        unique_ids = list(dict.fromkeys(x for x in machine_ids_or_names if x is not None))
+        machines = map_concurrently(self.get_machine, unique_ids, max_workers=self.max_workers)
+        return dict(zip(unique_ids, machines))
+
     # noinspection PyUnresolvedReferences
     def get_active_machine(self) -> Optional["ActiveMachineInfo"]:
         """Retrieve the active machine info."""
@@ -637,37 +901,47 @@ class HTBClient:
     # noinspection PyUnresolvedReferences
     def get_user_activity(self, user_id: int, limit_activity_entries: Optional[int] = 20) -> List["Activity"]:
         """Retrieves a list of `Activity` from the API"""
-        from .activity import Activity
+        return list(self.iter_activity(user_id=user_id, limit=limit_activity_entries, prefetch=self.max_workers))
 
-        page_number = 1
-        lastpage = 1
-        res = []
-        while page_number <= lastpage:
-            time.sleep(0.5)
-            activity_dict: dict = self.htb_http_request.get_request(endpoint=f'user/profile/activity/{user_id}?page={page_number}', api_version="v5")
-
-            meta: dict = activity_dict["meta"]
-            data: list = activity_dict["data"]
+    # noinspection PyUnresolvedReferences
+    def iter_activity(self, user_id: int, limit: Optional[int] = None, prefetch: int = 0) -> Iterator["Activity"]:
+        """Yields the `Activity` of a user (newest first) page by page. No further page is requested once the consumer
+        stops. With `prefetch` > 1, that many pages are requested concurrently ahead of the consumer."""
+        from .activity import Activity
 
-            if len(data) == 0:
-                return res
+        per_page = None if limit is None else max(1, min(100, limit))
+        per_page_option = "" if per_page is None else f"&per_page={per_page}"
 
-            page_number = meta['page'] + 1
-            lastpage = meta['lastPage']
+        def fetch_page(page_number: int) -> Tuple[int, List[Activity]]:
+            """Returns the last page number and the activities of the page."""
+            activity_dict: dict = self.htb_http_request.get_request(endpoint=f'user/profile/activity/{user_id}?page={page_number}{per_page_option}', api_version="v5")
 
-            res += [Activity(data=x, _client=self) for x in data]
+            return activity_dict["meta"]["lastPage"], [Activity(data=x, _client=self) for x in activity_dict["data"]]
 
-            if limit_activity_entries is not None and len(res) >= limit_activity_entries:
-                return res[:limit_activity_entries + 1]
+        return self._iter_pages(fetch_page=fetch_page, limit=limit, per_page=per_page, prefetch=prefetch)
 
-        return res
     # noinspection PyUnresolvedReferences
     def get_fortress_list(self) -> List["Fortress"]:
         """Retrieves a list of `Fortress` from the API"""
+        data: dict = self.htb_http_request.get_request(endpoint=f'fortresses')["data"]
+        fortress_ids = [x["id"] for x in data.values()]
+        fortresses = self.get_fortresses(fortress_ids)
+        return [fortresses[x] for x in fortress_ids]
+
+    # noinspection PyUnresolvedReferences
+    def get_fortress(self, fortress_id: int) -> "Fortress":
+        """Retrieve a fortress object for the given fortress ID."""
         from .fortress import Fortress
 
-        data: dict = self.htb_http_request.get_request(endpoint=f'fortresses')["data"]
-        return [Fortress(_client=self, data=self.htb_http_request.get_request(endpoint=f'fortress/{x["id"]}')["data"]) for x in data.values()]
+        return Fortress(_client=self, data=self.htb_http_request.get_request(endpoint=f'fortress/{fortress_id}')["data"])
+
+    # noinspection PyUnresolvedReferences
+    def get_fortresses(self, fortress_ids: List[int]) -> dict[int, "Fortress"]:
+        """Retrieve the fortresses for the given IDs concurrently. Every ID is requested only once.
+        Returns the fortresses by ID."""
+        unique_ids = list(dict.fromkeys(x for x in fortress_ids if x is not None))
+        fortresses = map_concurrently(self.get_fortress, unique_ids, max_workers=self.max_workers)
+        return dict(zip(unique_ids, fortresses))
 
 
     def __repr__(self):
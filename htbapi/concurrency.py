@@ -0,0 +1,54 @@
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Iterable, Iterator, List, TypeVar, Deque, Dict, Any, Tuple
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Upper bound of concurrent requests. The rate limiter of the HTTP request still decides how fast they are sent.
+DEFAULT_MAX_WORKERS = 8
+
+
+def map_concurrently(func: Callable[[T], R], items: Iterable[T], max_workers: int = DEFAULT_MAX_WORKERS) -> List[R]:
+    """Calls `func` for every item with a bounded thread pool and returns the results in the order of the items.
+    The first exception raised by `func` is re-raised."""
+    return list(iter_concurrently(func, items, max_workers=max_workers))
+
+
+def iter_concurrently(func: Callable[[T], R], items: Iterable[T], max_workers: int = DEFAULT_MAX_WORKERS) -> Iterator[R]:
+    """Lazy variant of `map_concurrently`. The results are yielded in the order of the items, while at most
+    `max_workers` calls are in flight. Calls that have not been started yet are cancelled when the consumer stops."""
+    if max_workers <= 1:
+        for x in items:
+            yield func(x)
+        return
+
+    iterator = iter(items)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures: Deque[Future] = deque(executor.submit(func, x) for x in itertools.islice(iterator, max_workers))
+        while len(futures) > 0:
+            result = futures.popleft().result()
+            # Keep the pool busy while the consumer processes the result
+            for x in itertools.islice(iterator, 1):
+                futures.append(executor.submit(func, x))
+            yield result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_concurrently(calls: Dict[str, Callable[[], Any]],
+                     max_workers: int = DEFAULT_MAX_WORKERS) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """Runs independent calls with a bounded thread pool. Returns the results and the duration (in seconds) of every
+    call by its name. The first exception raised by a call is re-raised."""
+    def timed_call(name: str) -> Tuple[Any, float]:
+        start = time.perf_counter()
+        result = calls[name]()
+        return result, time.perf_counter() - start
+
+    names = list(calls.keys())
+    results = map_concurrently(timed_call, names, max_workers=max_workers)
+    return ({name: result for name, (result, _) in zip(names, results)},
+            {name: duration for name, (_, duration) in zip(names, results)})
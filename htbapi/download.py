@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Callable, Optional, List
+
+import httpx
+
+from .concurrency import map_concurrently
+from .exception.errors import RequestException, HashMismatchException
+from .htb_http_request import _to_request_exception
+
+CHUNK_SIZE = 1024 * 1024
+# The progress is stored after this number of bytes (and whenever a transfer stops)
+STATE_SAVE_INTERVAL = 8 * 1024 * 1024
+DEFAULT_MAX_ATTEMPTS = 5
+
+
+class _RestartDownload(Exception):
+    """The stored progress cannot be used anymore (e.g. the file changed on the server)"""
+    pass
+
+
+class RangeDownloader:
+    """Resumable download of a file to `path`.
+
+    The file is written to `<path>.part`. The progress (URL, validator, size and the downloaded bytes of every range)
+    is stored in `<path>.part.json`. If a transfer drops, the download continues with a HTTP Range request from the
+    stored offset: within the same call up to `max_attempts` times, or with the next call for the same path and URL.
+    The validator (ETag or Last-Modified) is sent as If-Range, so a changed file is downloaded from the beginning.
+
+    With `segments` > 1 and a server that supports ranges, the file is split into that many ranges which are fetched
+    concurrently.
+    """
+    url: str
+    path: str
+    segments: int
+    max_attempts: int
+    _send: Callable[..., httpx.Response]
+    _part_path: str
+    _state_path: str
+    _state: Optional[dict]
+    _lock: threading.Lock
+    _hasher: Optional["hashlib._Hash"]
+
+    def __init__(self,
+                 send: Callable[..., httpx.Response],
+                 url: str,
+                 path: str,
+                 segments: int = 1,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        assert segments >= 1
+
+        self.url = url
+        self.path = path
+        self.segments = segments
+        self.max_attempts = max_attempts
+        self._send = send
+        self._part_path = f"{path}.part"
+        self._state_path = f"{path}.part.json"
+        self._state = None
+        self._lock = threading.Lock()
+        self._hasher = None
+
+    def download(self, expected_sha256: Optional[str] = None, resume: bool = True) -> str:
+        """Downloads the file and returns its SHA-256 (hex).
+
+        If `expected_sha256` does not match, the partial data is discarded and a HashMismatchException is raised. A
+        resumed download is downloaded once more from the beginning before giving up.
+        """
+        self._state = self._load_state() if resume else None
+        resumed = self._state is not None and self._downloaded_bytes() > 0
+        if self._state is None:
+            self._start()
+
+        try:
+            self._fetch()
+        except _RestartDownload:
+            self._discard()
+            # Once more from the beginning as a single stream without ranges. A server (or proxy) which answered the
+            # probe with 206 but the segments with 200 would do so again.
+            self.segments = 1
+            return self.download(expected_sha256=expected_sha256, resume=False)
+        except Exception:
+            # Keep the partial file only if there is something to resume
+            if self._state is None or self._downloaded_bytes() == 0:
+                self._discard()
+            raise
+
+        file_hash = self._hasher.hexdigest() if self._hasher is not None else _hash_file(self._part_path)
+        if expected_sha256 is not None and file_hash != expected_sha256.lower():
+            self._discard()
+            if resumed:
+                # The stored partial data might be outdated. Try once more from the beginning.
+                return self.download(expected_sha256=expected_sha256, resume=False)
+            raise HashMismatchException({"message": f"Hash mismatch: expected {expected_sha256}, got {file_hash}",
+                                         "status_code": None})
+
+        os.replace(self._part_path, self.path)
+        _remove(self._state_path)
+        return file_hash
+
+    def _downloaded_bytes(self) -> int:
+        return sum(done for _, _, done in self._state["ranges"])
+
+    def _load_state(self) -> Optional[dict]:
+        """Returns the stored progress if it belongs to the same URL and the partial file still exists."""
+        try:
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                state: dict = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if state.get("url") != self.url or not os.path.exists(self._part_path) or "ranges" not in state:
+            return None
+
+        return state
+
+    def _save_state(self) -> None:
+        with self._lock:
+            tmp_path = f"{self._state_path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._state, f)
+                os.replace(tmp_path, self._state_path)
+            except OSError:
+                pass
+
+    def _discard(self) -> None:
+        _remove(self._part_path)
+        _remove(self._state_path)
+        self._state = None
+        self._hasher = None
+
+    def _start(self) -> None:
+        """Creates a new partial file. For a segmented download, the size is probed and the file is preallocated."""
+        self._state = {"url": self.url, "validator": None, "size": None, "ranges": [[0, None, 0]]}
+        if self.segments > 1:
+            self._probe()
+
+        with open(self._part_path, "wb") as f:
+            if self._state["size"] is not None:
+                f.truncate(self._state["size"])
+
+        self._save_state()
+
+    def _probe(self) -> None:
+        """Requests the first byte to learn the size and whether ranges are supported (206 Partial Content)."""
+        r = self._send("GET", self.url, stream=True, headers={"Range": "bytes=0-0"})
+        try:
+            content_range = re.match(r"bytes\s+0-0/(\d+)", r.headers.get("Content-Range", ""))
+            if r.status_code != httpx.codes.PARTIAL_CONTENT or content_range is None:
+                return None
+
+            size = int(content_range.group(1))
+            segment_size = -(-size // self.segments)
+            self._state["size"] = size
+            self._state["validator"] = _get_validator(r)
+            self._state["ranges"] = [[start, min(start + segment_size, size) - 1, 0]
+                                     for start in range(0, size, segment_size)] if size > 0 else [[0, None, 0]]
+        finally:
+            r.close()
+
+    def _fetch(self) -> None:
+        ranges: List[int] = list(range(len(self._state["ranges"])))
+        try:
+            if len(ranges) == 1:
+                self._fetch_range(0)
+            else:
+                map_concurrently(self._fetch_range, ranges, max_workers=len(ranges))
+        finally:
+            if self._state is not None:
+                self._save_state()
+
+    def _fetch_range(self, index: int) -> None:
+        """Fetches the missing bytes of the range with the given index. Interrupted transfers are resumed."""
+        segmented = len(self._state["ranges"]) > 1
+        attempt = 0
+        while True:
+            start, end, done = self._state["ranges"][index]
+            if end is not None and start + done > end:
+                return None
+
+            headers = {}
+            if start + done > 0 or end is not None:
+                headers["Range"] = f"bytes={start + done}-{'' if end is None else end}"
+                if self._state["validator"] is not None:
+                    headers["If-Range"] = self._state["validator"]
+
+            try:
+                self._transfer(index, headers, segmented)
+                return None
+            except httpx.TransportError as e:
+                attempt += 1
+                # Only the single stream can be hashed while downloading. After an interruption, the file is hashed.
+                self._hasher = None
+                if attempt >= self.max_attempts:
+                    raise RequestException({"message": f"Download interrupted ({e}). Run the download again to resume it.",
+                                            "status_code": None})
+
+    def _transfer(self, index: int, headers: dict, segmented: bool) -> None:
+        start, end, done = self._state["ranges"][index]
+        r = self._send("GET", self.url, stream=True, headers=headers)
+        try:
+            if r.status_code == httpx.codes.OK:
+                if segmented:
+                    # The server ignores the range (or the file has changed)
+                    raise _RestartDownload()
+                # Full body, either requested or because the file has changed (If-Range). Start from the beginning.
+                done = 0
+                self._state["ranges"][index][2] = 0
+                self._state["validator"] = _get_validator(r)
+            elif r.status_code == httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE:
+                raise _RestartDownload()
+            elif r.status_code != httpx.codes.PARTIAL_CONTENT:
+                raise _to_request_exception(r.status_code, r.read(), r.json)
+
+            if not segmented and done == 0:
+                self._hasher = hashlib.sha256()
+
+            unsaved = 0
+            with open(self._part_path, "r+b") as f:
+                f.seek(start + done)
+                if not segmented:
+                    f.truncate()
+                for chunk in r.iter_bytes():
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    if self._hasher is not None:
+                        self._hasher.update(chunk)
+                    self._state["ranges"][index][2] += len(chunk)
+                    unsaved += len(chunk)
+                    if unsaved >= STATE_SAVE_INTERVAL:
+                        f.flush()
+                        self._save_state()
+                        unsaved = 0
+        finally:
+            r.close()
+
+
+def _get_validator(r: httpx.Response) -> Optional[str]:
+    etag = r.headers.get("ETag")
+    # Weak ETags must not be used for If-Range
+    if etag is not None and not etag.startswith("W/"):
+        return etag
+    return r.headers.get("Last-Modified")
+
+
+def _hash_file(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,5 +1,6 @@
 from .errors import AuthenticationException
 from .errors import RequestException
+from .errors import HashMismatchException
 from .errors import IncorrectArgumentException
 from .errors import UnknownDirectoryException
 from .errors import CannotSwitchWithActive
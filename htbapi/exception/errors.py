@@ -9,6 +9,10 @@ class AuthenticationException(HtbCliException):
 class RequestException(HtbCliException):
     pass
 
+class HashMismatchException(RequestException):
+    """The SHA-256 of a downloaded file does not match the expected one"""
+    pass
+
 class IncorrectArgumentException(HtbCliException):
     pass
 
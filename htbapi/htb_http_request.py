@@ -1,10 +1,20 @@
-import time
+import asyncio
+import hashlib
+import os
+import tempfile
 from json import JSONDecodeError
-from typing import Optional, Union
+from typing import Optional, Union, Iterable, Callable, List
 
 import httpx
 
-from htbapi import RequestException
+from htbapi import RequestException, HashMismatchException
+from htbapi.blob_store import BlobStore
+from htbapi.http_cache import HttpCache
+from htbapi.rate_limiter import RateLimiter
+
+# The umask can only be read by setting it. It is read once at import, before other threads create files.
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
 
 class BaseHtbHttpRequest:
     """Base class for HTTP requests."""
@@ -13,6 +23,7 @@ class BaseHtbHttpRequest:
     _api_base: str
     _user_agent: str
     _download_cooldown: int
+    _post_listeners: List[Callable[[str], None]]
 
     def __init__(self,
                  app_token: str,
@@ -29,6 +40,16 @@ class BaseHtbHttpRequest:
         self._api_version = api_version
         self._user_agent = user_agent
         self._download_cooldown = download_cooldown
+        self._post_listeners = []
+
+    def add_post_listener(self, listener: Callable[[str], None]) -> None:
+        """Registers a function that is called with the endpoint after every successful POST request. A POST alters the
+        state of the account (e.g. solved flags), so local copies of account data might be outdated."""
+        self._post_listeners.append(listener)
+
+    def _notify_post(self, endpoint: str) -> None:
+        for listener in self._post_listeners:
+            listener(endpoint)
 
     def set_proxies(self, proxies: Optional[dict]) -> None:
         raise NotImplementedError()
@@ -42,6 +63,24 @@ class BaseHtbHttpRequest:
     def get_request(self, endpoint: Optional[str] = None, download=False, base: str = None, custom_url: Optional[str] = None, api_version: Optional[str] = None) -> Union[list, dict, bytes]:
         raise NotImplementedError()
 
+    def download(self,
+                 path: str,
+                 endpoint: Optional[str] = None,
+                 custom_url: Optional[str] = None,
+                 api_version: Optional[str] = None,
+                 expected_sha256: Optional[str] = None,
+                 resume: bool = True,
+                 segments: int = 1) -> str:
+        """Download a file of the API (or a custom URL) to `path` and return its SHA-256 (hex).
+
+        The file is written to a temporary file first and renamed on success. If `expected_sha256` is given and does
+        not match, a HashMismatchException is raised and `path` is not touched. Implementations should stream the
+        body, this default implementation buffers it by using `get_request`. `resume` (continue an interrupted
+        download) and `segments` (number of ranges fetched concurrently) are hints which implementations may ignore.
+        """
+        data = self.get_request(endpoint=endpoint, download=True, custom_url=custom_url, api_version=api_version)
+        return _write_file(path=path, chunks=[data], expected_sha256=expected_sha256)
+
 
 class HtbHtbHttpRequest(BaseHtbHttpRequest):
     """HTTP request for HTB API."""
@@ -49,6 +88,9 @@ class HtbHtbHttpRequest(BaseHtbHttpRequest):
     _verify_ssl: bool
     _http_headers: dict
     _client: httpx.Client
+    _cache: Optional[HttpCache]
+    _blob_store: Optional[BlobStore]
+    _rate_limiter: RateLimiter
 
     def __init__(self,
                  app_token: str,
@@ -57,27 +99,31 @@ class HtbHtbHttpRequest(BaseHtbHttpRequest):
                  download_cooldown: int = 30,
                  api_version: str = "v4",
                  proxy: Optional[dict] = None,
-                 verify_ssl: bool = True) -> None:
+                 verify_ssl: bool = True,
+                 cache: Optional[HttpCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 blob_store: Optional[BlobStore] = None) -> None:
         super().__init__(app_token=app_token,
                          api_base=api_base,
                          user_agent=user_agent,
                          download_cooldown=download_cooldown,
                          api_version=api_version)
 
-        self._proxies = None
-        self._verify_ssl = True
-        self.set_verify_ssl(verify_ssl)
-        if proxy is not None and ("http" in proxy or "https" in proxy):
-            self.set_proxies({"http": proxy["http"] if "http" in proxy and len(proxy["http"]) > 0 else None,
-                              "https": proxy["https"] if "https" in proxy and len(proxy["https"]) > 0 else None})
-
+        self._cache = cache
+        self._blob_store = blob_store
+        self._rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
         self._http_headers = {"Authorization": f"Bearer {self._app_token}",
                               "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/149.0.0.0 Safari/537.36",
                               "Accept": "application/json",
                               "Referer": "https://app.hackthebox.com/",
                               "Origin": "https://app.hackthebox.com",}
+        self._verify_ssl = verify_ssl
+        self._proxies = None
+        if proxy is not None and ("http" in proxy or "https" in proxy):
+            self._proxies = {"http": proxy["http"] if "http" in proxy and len(proxy["http"]) > 0 else None,
+                             "https": proxy["https"] if "https" in proxy and len(proxy["https"]) > 0 else None}
 
-        # build HTTP/2 client
+        # build HTTP/2 client (once, all settings are known)
         self._client = self._build_client()
 
     def _build_client(self) -> httpx.Client:
@@ -105,21 +151,35 @@ class HtbHtbHttpRequest(BaseHtbHttpRequest):
 
 
 
+    def _rebuild_client(self) -> None:
+        """Replaces the client (and closes the connections of the old one) to apply changed settings."""
+        old_client = self._client
+        self._client = self._build_client()
+        old_client.close()
+
     def set_proxies(self, proxies: Optional[dict]) -> None:
         """Set proxies."""
         self._proxies = proxies
-        # Recreate client to apply new proxies
-        self._client = self._build_client()
+        self._rebuild_client()
 
     def set_verify_ssl(self, verify_ssl: bool) -> None:
         """Set verify SSL."""
         self._verify_ssl = verify_ssl
-        # Recreate client to apply new SSL setting
-        # (client may not yet exist during __init__, so guard it)
-        try:
-            self._client = self._build_client()
-        except AttributeError:
-            pass
+        self._rebuild_client()
+
+    def _send(self, method: str, url: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """Send the request as soon as the rate limiter allows it. Rate limited requests (429) are retried."""
+        attempt = 0
+        while True:
+            self._rate_limiter.acquire()
+            r = self._client.send(self._client.build_request(method, url, **kwargs), stream=stream)
+            if r.status_code != 429:
+                self._rate_limiter.update(r.status_code, r.headers)
+                return r
+
+            r.close()
+            self._rate_limiter.on_rate_limited(r.headers, attempt)
+            attempt += 1
 
     def post_request(self,endpoint: str, json=None, api_version: str = "v4") -> dict:
         """Send post request to HTB API."""
@@ -127,29 +187,17 @@ class HtbHtbHttpRequest(BaseHtbHttpRequest):
             api_version = self._api_version
 
 
-        while True:
-            r = self._client.post(url=f"{self._api_base}{api_version}/{endpoint}",
-                                  json=json)
-            # Due to rate limit
-            if r.status_code == 429:
-                time.sleep(1)
-                continue
-            else:
-                break
+        r = self._send("POST", f"{self._api_base}{api_version}/{endpoint}", json=json)
 
         if r.status_code != httpx.codes.OK:
             if r.status_code == httpx.codes.NO_CONTENT:
                 return dict()
+            raise _to_request_exception(r.status_code, r.content, r.json)
 
-            if r.content and len(r.content) > 0:
-                try:
-                    raise RequestException(r.json())
-                except JSONDecodeError:
-                    # ensure callers expecting a mapping don't break on bytes
-                    text = r.content.decode('utf-8', errors='replace')
-                    raise RequestException({"message": text, "status_code": r.status_code})
-            else:
-                raise RequestException(r.status_code)
+        # A POST alters the state of the account (e.g. solved flags, switched VPN server). Cached lists might be outdated.
+        if self._cache is not None:
+            self._cache.clear()
+        self._notify_post(endpoint)
 
         return r.json()
 
@@ -172,50 +220,361 @@ class HtbHtbHttpRequest(BaseHtbHttpRequest):
 
         # Stream downloads in chunks to reduce memory usage and support large files
         if download:
-            while True:
-                with self._client.stream("GET", url) as r:
-                    if r.status_code == 429:
-                        # rate limited, retry after short sleep
-                        time.sleep(1)
-                        continue
-
-                    if r.status_code != httpx.codes.OK:
-                        # read body to include details in exception
-                        body = r.read()
-                        if body:
-                            try:
-                                raise RequestException(r.json())
-                            except JSONDecodeError:
-                                # normalize to a dict so upstream code using .keys() won't fail
-                                text = body.decode('utf-8', errors='replace')
-                                raise RequestException({"message": text, "status_code": r.status_code})
-                        else:
-                            raise RequestException(r.status_code)
-
-                    # status OK: collect bytes in chunks
-                    buf = bytearray()
-                    for chunk in r.iter_bytes():  # default reasonable chunk size
-                        if chunk:
-                            buf.extend(chunk)
-                    return bytes(buf)
+            r = self._send("GET", url, stream=True)
+            try:
+                if r.status_code != httpx.codes.OK:
+                    # read body to include details in exception
+                    raise _to_request_exception(r.status_code, r.read(), r.json)
+
+                # status OK: collect bytes in chunks
+                buf = bytearray()
+                for chunk in r.iter_bytes():  # default reasonable chunk size
+                    if chunk:
+                        buf.extend(chunk)
+                return bytes(buf)
+            finally:
+                r.close()
         else:
-            while True:
-                r = self._client.get(url=url)
-                if r.status_code == 429:
-                    time.sleep(1)
-                    continue
-                else:
-                    break
+            # Only API endpoints are cacheable. Custom URLs (e.g. download links) are always requested.
+            cache_endpoint = endpoint if custom_url is None else None
+            headers = {}
+            if self._cache is not None:
+                cached_body = self._cache.get(endpoint=cache_endpoint, url=url)
+                if cached_body is not None:
+                    return cached_body
+                headers = self._cache.get_validators(endpoint=cache_endpoint, url=url)
+
+            r = self._send("GET", url, headers=headers)
+            if r.status_code == httpx.codes.NOT_MODIFIED and self._cache is not None:
+                cached_body = self._cache.revalidate(endpoint=cache_endpoint, url=url)
+                if cached_body is not None:
+                    return cached_body
+                # The stored entry is gone in the meantime (e.g. evicted). Request the full body.
+                r = self._send("GET", url)
+
+            if r.status_code != httpx.codes.OK:
+                raise _to_request_exception(r.status_code, r.content, r.json)
+
+            body = r.json()
+            if self._cache is not None:
+                self._cache.put(endpoint=cache_endpoint,
+                                url=url,
+                                body=body,
+                                etag=r.headers.get("ETag"),
+                                last_modified=r.headers.get("Last-Modified"))
+
+            return body
+
+    def download(self,
+                 path: str,
+                 endpoint: Optional[str] = None,
+                 custom_url: Optional[str] = None,
+                 api_version: Optional[str] = None,
+                 expected_sha256: Optional[str] = None,
+                 resume: bool = True,
+                 segments: int = 1) -> str:
+        """Stream a file of the API (or a custom URL) in chunks to `path` and return its SHA-256 (hex).
+
+        An interrupted download is continued with HTTP Range requests, also by a later call with `resume` set
+        (see `RangeDownloader`). With `segments` > 1, the file is fetched in that many ranges concurrently if the
+        server supports it. See `BaseHtbHttpRequest.download`."""
+        from htbapi.download import RangeDownloader
+        assert endpoint is not None or custom_url is not None
+
+        if api_version is None:
+            api_version = self._api_version
+
+        # Known content is taken from the local store instead of the network
+        if expected_sha256 is not None and self._blob_store is not None and self._blob_store.get(expected_sha256, path):
+            return expected_sha256.lower()
+
+        url = custom_url if custom_url is not None else f"{self._api_base}{api_version}/{endpoint}"
+        downloader = RangeDownloader(send=self._send, url=url, path=path, segments=segments)
+        file_hash = downloader.download(expected_sha256=expected_sha256, resume=resume)
+        if self._blob_store is not None:
+            self._blob_store.put(path, file_hash)
+
+        return file_hash
+
+
+class AsyncHtbHttpRequest(BaseHtbHttpRequest):
+    """Asyncio implementation of the HTTP requests for the HTB API.
+
+    All requests share one HTTP/2 connection (httpx.AsyncClient), so independent requests are multiplexed instead of
+    being sent one after the other. The client is bound to the event loop of the first request and must be closed
+    with `aclose()`.
+    """
+    _proxies: Optional[dict]
+    _verify_ssl: bool
+    _http_headers: dict
+    _client: Optional[httpx.AsyncClient]
+    _cache: Optional[HttpCache]
+    _blob_store: Optional[BlobStore]
+    _rate_limiter: RateLimiter
+
+    def __init__(self,
+                 app_token: str,
+                 api_base: str,
+                 user_agent: str,
+                 download_cooldown: int = 30,
+                 api_version: str = "v4",
+                 proxy: Optional[dict] = None,
+                 verify_ssl: bool = True,
+                 cache: Optional[HttpCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 blob_store: Optional[BlobStore] = None) -> None:
+        super().__init__(app_token=app_token,
+                         api_base=api_base,
+                         user_agent=user_agent,
+                         download_cooldown=download_cooldown,
+                         api_version=api_version)
+
+        self._cache = cache
+        self._blob_store = blob_store
+        self._rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self._client = None
+        self._http_headers = {"Authorization": f"Bearer {self._app_token}",
+                              "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/149.0.0.0 Safari/537.36",
+                              "Accept": "application/json",
+                              "Referer": "https://app.hackthebox.com/",
+                              "Origin": "https://app.hackthebox.com",}
+        self._proxies = None
+        self._verify_ssl = verify_ssl
+        if proxy is not None and ("http" in proxy or "https" in proxy):
+            self.set_proxies({"http": proxy["http"] if "http" in proxy and len(proxy["http"]) > 0 else None,
+                              "https": proxy["https"] if "https" in proxy and len(proxy["https"]) > 0 else None})
+
+    @property
+    def proxies(self) -> Optional[dict]:
+        return self._proxies
+
+    @property
+    def verify_ssl(self) -> bool:
+        return self._verify_ssl
+
+    @property
+    def cache(self) -> Optional[HttpCache]:
+        return self._cache
+
+    @property
+    def blob_store(self) -> Optional[BlobStore]:
+        return self._blob_store
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Returns the shared HTTP/2 client. It is created lazily, because it must be created within the event loop."""
+        if self._client is None:
+            proxy_url = None
+            if self._proxies:
+                proxy_url = self._proxies.get("https") or self._proxies.get("http")
+
+            self._client = httpx.AsyncClient(http2=True,
+                                             headers=self._http_headers,
+                                             verify=self._verify_ssl,
+                                             follow_redirects=True,
+                                             max_redirects=2,
+                                             proxy=proxy_url)
+        return self._client
+
+    def set_proxies(self, proxies: Optional[dict]) -> None:
+        """Set proxies. Takes effect for the next client (i.e. before the first request or after `aclose()`)."""
+        self._proxies = proxies
+
+    def set_verify_ssl(self, verify_ssl: bool) -> None:
+        """Set verify SSL. Takes effect for the next client (i.e. before the first request or after `aclose()`)."""
+        self._verify_ssl = verify_ssl
+
+    async def aclose(self) -> None:
+        """Close the shared connection."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _send(self, method: str, url: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """Send the request as soon as the rate limiter allows it. Rate limited requests (429) are retried."""
+        attempt = 0
+        while True:
+            delay = self._rate_limiter.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            client = self._get_client()
+            r = await client.send(client.build_request(method, url, **kwargs), stream=stream)
+            if r.status_code != 429:
+                self._rate_limiter.update(r.status_code, r.headers)
+                return r
+
+            await r.aclose()
+            self._rate_limiter.on_rate_limited(r.headers, attempt)
+            attempt += 1
+
+    async def post_request(self, endpoint: str, json=None, api_version: str = "v4") -> dict:
+        """Send post request to HTB API."""
+        if api_version is None:
+            api_version = self._api_version
+
+        r = await self._send("POST", f"{self._api_base}{api_version}/{endpoint}", json=json)
+
+        if r.status_code != httpx.codes.OK:
+            if r.status_code == httpx.codes.NO_CONTENT:
+                return dict()
+            raise _to_request_exception(r.status_code, r.content, r.json)
+
+        # A POST alters the state of the account (e.g. solved flags, switched VPN server). Cached lists might be outdated.
+        if self._cache is not None:
+            self._cache.clear()
+        self._notify_post(endpoint)
+
+        return r.json()
+
+    async def get_request(self,
+                          endpoint: Optional[str]=None,
+                          download: bool = False,
+                          base: Optional[str] = None,
+                          custom_url: Optional[str]=None,
+                          api_version: Optional[str] = None) -> Union[list, dict, bytes]:
+        """Send a GET request to the API"""
+        assert endpoint is not None or custom_url is not None
+
+        if api_version is None:
+            api_version = self._api_version
+
+        if base is None:
+            base = self._api_base
+
+        url = custom_url if custom_url is not None else f"{base}{api_version}/{endpoint}"
 
+        if download:
+            r = await self._send("GET", url)
             if r.status_code != httpx.codes.OK:
-                if r.content and len(r.content) > 0:
-                    try:
-                        raise RequestException(r.json())
-                    except JSONDecodeError:
-                        text = r.content.decode('utf-8', errors='replace')
-                        raise RequestException({"message": text, "status_code": r.status_code})
-                else:
-                    raise RequestException(r.status_code)
+                raise _to_request_exception(r.status_code, r.content, r.json)
+            return r.content
+
+        # Only API endpoints are cacheable. Custom URLs (e.g. download links) are always requested.
+        cache_endpoint = endpoint if custom_url is None else None
+        headers = {}
+        if self._cache is not None:
+            cached_body = self._cache.get(endpoint=cache_endpoint, url=url)
+            if cached_body is not None:
+                return cached_body
+            headers = self._cache.get_validators(endpoint=cache_endpoint, url=url)
+
+        r = await self._send("GET", url, headers=headers)
+        if r.status_code == httpx.codes.NOT_MODIFIED and self._cache is not None:
+            cached_body = self._cache.revalidate(endpoint=cache_endpoint, url=url)
+            if cached_body is not None:
+                return cached_body
+            # The stored entry is gone in the meantime (e.g. evicted). Request the full body.
+            r = await self._send("GET", url)
 
-            return r.json()
+        if r.status_code != httpx.codes.OK:
+            raise _to_request_exception(r.status_code, r.content, r.json)
+
+        body = r.json()
+        if self._cache is not None:
+            self._cache.put(endpoint=cache_endpoint,
+                            url=url,
+                            body=body,
+                            etag=r.headers.get("ETag"),
+                            last_modified=r.headers.get("Last-Modified"))
+
+        return body
+
+    async def download(self,
+                       path: str,
+                       endpoint: Optional[str] = None,
+                       custom_url: Optional[str] = None,
+                       api_version: Optional[str] = None,
+                       expected_sha256: Optional[str] = None,
+                       resume: bool = True,
+                       segments: int = 1) -> str:
+        """Stream a file of the API (or a custom URL) in chunks to `path` and return its SHA-256 (hex).
+        The file is downloaded in one piece, `resume` and `segments` are ignored. See `BaseHtbHttpRequest.download`."""
+        assert endpoint is not None or custom_url is not None
 
+        if api_version is None:
+            api_version = self._api_version
+
+        if expected_sha256 is not None and self._blob_store is not None and self._blob_store.get(expected_sha256, path):
+            return expected_sha256.lower()
+
+        url = custom_url if custom_url is not None else f"{self._api_base}{api_version}/{endpoint}"
+        r = await self._send("GET", url, stream=True)
+        try:
+            if r.status_code != httpx.codes.OK:
+                body = await r.aread()
+                raise _to_request_exception(r.status_code, body, r.json)
+
+            with _TempFile(path) as tmp:
+                async for chunk in r.aiter_bytes():
+                    tmp.write(chunk)
+                file_hash = tmp.commit(expected_sha256=expected_sha256)
+        finally:
+            await r.aclose()
+
+        if self._blob_store is not None:
+            self._blob_store.put(path, file_hash)
+
+        return file_hash
+
+
+class _TempFile:
+    """Temporary file next to `path` that is hashed while it is written and renamed to `path` on commit.
+    It is removed if it is not committed."""
+    path: str
+    sha256: "hashlib._Hash"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sha256 = hashlib.sha256()
+        self._fd, self._tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                                    prefix=f".{os.path.basename(path)}.",
+                                                    suffix=".tmp")
+        self._file = os.fdopen(self._fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        if chunk:
+            self._file.write(chunk)
+            self.sha256.update(chunk)
+
+    def commit(self, expected_sha256: Optional[str] = None) -> str:
+        """Renames the temporary file to the target path and returns the SHA-256 (hex)."""
+        self._file.close()
+        file_hash = self.sha256.hexdigest()
+        if expected_sha256 is not None and file_hash != expected_sha256.lower():
+            raise HashMismatchException({"message": f"Hash mismatch: expected {expected_sha256}, got {file_hash}",
+                                         "status_code": None})
+
+        # mkstemp() creates the file with 0600. The downloaded file gets the permissions of a file created with open().
+        os.chmod(self._tmp_path, 0o666 & ~_UMASK)
+        os.replace(self._tmp_path, self.path)
+        self._tmp_path = None
+        return file_hash
+
+    def __enter__(self) -> "_TempFile":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._file.close()
+        if self._tmp_path is not None and os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def _write_file(path: str, chunks: Iterable[bytes], expected_sha256: Optional[str] = None) -> str:
+    """Writes the chunks to `path` (see `_TempFile`) and returns the SHA-256 (hex)."""
+    with _TempFile(path) as tmp:
+        for chunk in chunks:
+            tmp.write(chunk)
+        return tmp.commit(expected_sha256=expected_sha256)
+
+
+def _to_request_exception(status_code: int, content: bytes, json_func) -> RequestException:
+    """Creates the RequestException for an unsuccessful response."""
+    if content and len(content) > 0:
+        try:
+            return RequestException(json_func())
+        except JSONDecodeError:
+            # normalize to a dict so upstream code using .keys() won't fail
+            text = content.decode('utf-8', errors='replace')
+            return RequestException({"message": text, "status_code": status_code})
+    else:
+        return RequestException(status_code)
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Optional, List, Tuple, Union
+
+# Endpoint patterns (relative to the API version, e.g. "challenge/list") and their time-to-live in seconds.
+# Only endpoints matching one of these rules are cached. Everything else (active machine, VPN status, ...) is
+# user state that changes all the time and is always requested from the API.
+DEFAULT_TTL_RULES: List[Tuple[str, int]] = [
+    (r"^challenge/list(/retired)?$", 60 * 60),
+    (r"^challenge/categories/list$", 24 * 60 * 60),
+    (r"^challenges\?state=unreleased", 60 * 60),
+    (r"^machines\?", 60 * 60),
+    (r"^sherlocks/categories/list$", 24 * 60 * 60),
+    (r"^sherlocks\?", 60 * 60),
+    (r"^badges$", 24 * 60 * 60),
+    (r"^prolabs$", 6 * 60 * 60),
+    (r"^season/list$", 24 * 60 * 60),
+]
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class HttpCache:
+    """Persistent on-disk cache for GET responses of the HTB API.
+
+    Every entry is stored as a JSON file below `directory`. Entries are grouped by a namespace (a fingerprint of the
+    API token), so that switching or renewing the API key never returns responses of another account. If the cache
+    exceeds `max_size` bytes, the least recently used entries are evicted.
+
+    Expired entries are kept until they are evicted. Their validators (ETag, Last-Modified) are used to revalidate them
+    with a conditional request, so an unchanged list does not have to be transferred again.
+    """
+    directory: str
+    max_size: int
+    enabled: bool
+    refresh: bool
+    _namespace_dir: str
+    _stats_path: str
+    _pending_stats: dict
+    _ttl_rules: List[Tuple[re.Pattern, int]]
+    _lock: threading.Lock
+
+    def __init__(self,
+                 directory: str,
+                 namespace: str = "",
+                 max_size: int = DEFAULT_MAX_SIZE,
+                 ttl_rules: Optional[List[Tuple[str, int]]] = None):
+        assert directory is not None
+
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = True
+        self.refresh = False
+        self._namespace_dir = os.path.join(directory, hashlib.sha256(namespace.encode()).hexdigest()[:16])
+        self._stats_path = os.path.join(directory, "stats.json")
+        self._pending_stats = _empty_stats()
+        self._ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in (ttl_rules if ttl_rules is not None else DEFAULT_TTL_RULES)]
+        self._lock = threading.Lock()
+
+    def get_ttl(self, endpoint: Optional[str]) -> Optional[int]:
+        """Returns the TTL for the given endpoint or None if the endpoint must not be cached."""
+        if endpoint is None:
+            return None
+
+        return next((ttl for pattern, ttl in self._ttl_rules if pattern.search(endpoint)), None)
+
+    def _get_path(self, url: str) -> str:
+        return os.path.join(self._namespace_dir, f"{hashlib.sha256(url.encode()).hexdigest()}.json")
+
+    def _read_entry(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._get_path(url), "r", encoding="utf-8") as f:
+                entry: dict = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        return entry if entry.get("url") == url else None
+
+    def _write_entry(self, url: str, entry: dict) -> bool:
+        path = self._get_path(url)
+        try:
+            os.makedirs(self._namespace_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            # The cache is only an optimization. Never break a request because of it (e.g. read-only store dir).
+            return False
+
+        return True
+
+    def get(self, endpoint: Optional[str], url: str) -> Optional[Union[list, dict]]:
+        """Returns the cached body for the URL if it is cacheable and not expired, otherwise None."""
+        if not self.enabled or self.refresh or self.get_ttl(endpoint) is None:
+            return None
+
+        entry = self._read_entry(url)
+        if entry is None or entry.get("expires_at", 0) < time.time():
+            return None
+
+        path = self._get_path(url)
+        # Mark as recently used for the LRU eviction
+        try:
+            os.utime(path)
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+
+        self._record("hits", size)
+        return entry["body"]
+
+    def get_validators(self, endpoint: Optional[str], url: str) -> dict:
+        """Returns the conditional request headers (If-None-Match, If-Modified-Since) of a stored (possibly stale)
+        entry. An empty dict is returned if there is nothing to revalidate."""
+        if not self.enabled or self.get_ttl(endpoint) is None:
+            return {}
+
+        entry = self._read_entry(url)
+        if entry is None:
+            return {}
+
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+    def revalidate(self, endpoint: Optional[str], url: str) -> Optional[Union[list, dict]]:
+        """Called after the API answered with 304 Not Modified. Renews the TTL of the stored entry and returns its
+        body. None is returned if the entry is gone in the meantime."""
+        ttl = self.get_ttl(endpoint)
+        if not self.enabled or ttl is None:
+            return None
+
+        with self._lock:
+            entry = self._read_entry(url)
+            if entry is None:
+                return None
+
+            now = time.time()
+            entry["stored_at"] = now
+            entry["expires_at"] = now + ttl
+            self._write_entry(url, entry)
+
+        try:
+            size = os.path.getsize(self._get_path(url))
+        except OSError:
+            size = 0
+
+        self._record("revalidations", size)
+        return entry["body"]
+
+    def put(self,
+            endpoint: Optional[str],
+            url: str,
+            body: Union[list, dict],
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> None:
+        """Stores the body and its validators (ETag, Last-Modified) if the endpoint is cacheable."""
+        if not self.enabled:
+            return None
+
+        ttl = self.get_ttl(endpoint)
+        if ttl is None:
+            return None
+
+        now = time.time()
+        entry = {"url": url,
+                 "stored_at": now,
+                 "expires_at": now + ttl,
+                 "etag": etag,
+                 "last_modified": last_modified,
+                 "body": body}
+        with self._lock:
+            if not self._write_entry(url, entry):
+                return None
+
+            self._evict()
+
+        self._record("misses")
+
+    def _record(self, counter: str, saved_bytes: int = 0) -> None:
+        """Counts a hit/revalidation/miss in memory. The counters are written by `close()`."""
+        with self._lock:
+            self._pending_stats[counter] += 1
+            self._pending_stats["saved_bytes"] += saved_bytes
+
+    def close(self) -> None:
+        """Adds the counters of this process to the persistent statistics"""
+        with self._lock:
+            if not any(self._pending_stats.values()):
+                return None
+
+            stats = self._read_stats()
+            for k, v in self._pending_stats.items():
+                stats[k] += v
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                tmp_path = f"{self._stats_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(stats, f)
+                os.replace(tmp_path, self._stats_path)
+            except OSError:
+                pass
+            self._pending_stats = _empty_stats()
+
+    def _read_stats(self) -> dict:
+        stats = _empty_stats()
+        try:
+            with open(self._stats_path, "r", encoding="utf-8") as f:
+                stats.update({k: int(v) for k, v in json.load(f).items() if k in stats})
+        except (OSError, ValueError, TypeError, AttributeError):
+            pass
+
+        return stats
+
+    def get_stats(self) -> dict:
+        """Returns the statistics: number of fresh hits, revalidations (304), misses and the bytes not transferred."""
+        with self._lock:
+            stats = self._read_stats()
+            return {k: v + self._pending_stats[k] for k, v in stats.items()}
+
+    def clear(self) -> None:
+        """Removes all cached entries of the current namespace."""
+        with self._lock:
+            shutil.rmtree(self._namespace_dir, ignore_errors=True)
+
+    def _evict(self) -> None:
+        """Removes the least recently used entries (across all namespaces) until the cache fits into `max_size`."""
+        entries = []
+        total_size = 0
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                # Only entries in the namespace folders are evictable (not the statistics in the top folder)
+                if root == self.directory or not file.endswith(".json"):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        if total_size <= self.max_size:
+            return None
+
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            if total_size <= self.max_size * 0.9:
+                break
+
+        return None
+
+    def __repr__(self):
+        return f"<HttpCache '{self.directory}'>"
+
+
+def _empty_stats() -> dict:
+    return {"hits": 0, "revalidations": 0, "misses": 0, "saved_bytes": 0}
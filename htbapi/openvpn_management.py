@@ -0,0 +1,200 @@
+import os
+import socket
+import time
+from typing import Optional, List, Tuple
+
+from .exception import VpnException
+from .vpn_probe import LatencyResult, ping_latency
+
+# Directory (below the store directory) with the management sockets and logs of the started OpenVPN processes
+MANAGEMENT_DIRECTORY = "openvpn"
+DEFAULT_TIMEOUT = 2.0
+
+
+def get_management_path(store_dir: str, interface: str) -> str:
+    """Path of the management socket of the OpenVPN process running on `interface`"""
+    return os.path.join(store_dir, MANAGEMENT_DIRECTORY, f"{interface}.sock")
+
+
+class OpenVpnManagement:
+    """Client of the management interface (`--management <path> unix`) of an OpenVPN process.
+
+    OpenVPN serves one client at a time, so the connection is only held open for a few commands:
+
+        with OpenVpnManagement(path) as management:
+            bytes_in, bytes_out = management.get_byte_counts()
+    """
+    path: str
+    timeout: float
+    _socket: Optional[socket.socket]
+    _buffer: bytes
+
+    def __init__(self, path: str, timeout: float = DEFAULT_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._socket = None
+        self._buffer = b""
+
+    def __enter__(self) -> "OpenVpnManagement":
+        try:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(self.timeout)
+            self._socket.connect(self.path)
+        except OSError as e:
+            self.close()
+            raise VpnException(f"Management interface {self.path} is not reachable: {e}")
+
+        # Greeting (">INFO:OpenVPN Management Interface Version ...")
+        self._read_line()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _read_line(self) -> str:
+        while b"\n" not in self._buffer:
+            try:
+                chunk = self._socket.recv(4096)
+            except OSError as e:
+                raise VpnException(f"Management interface {self.path}: {e}")
+            if len(chunk) == 0:
+                raise VpnException(f"Management interface {self.path} closed the connection")
+            self._buffer += chunk
+
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line.decode(errors="replace").rstrip("\r")
+
+    def _command(self, command: str) -> List[str]:
+        """Sends the command and returns the lines of the answer. Answers are either a single "SUCCESS: ..." line or a
+        list of lines terminated by "END". Real-time notifications (">STATE:...", ">BYTECOUNT:...") are skipped."""
+        if self._socket is None:
+            raise VpnException("Not connected to the management interface")
+
+        try:
+            self._socket.sendall(f"{command}\n".encode())
+        except OSError as e:
+            raise VpnException(f"Management interface {self.path}: {e}")
+
+        lines = []
+        while True:
+            line = self._read_line()
+            if line.startswith(">"):
+                continue
+            elif line.startswith("ERROR:"):
+                raise VpnException(line[len("ERROR:"):].strip())
+            elif line.startswith("SUCCESS:") and len(lines) == 0:
+                return [line[len("SUCCESS:"):].strip()]
+            elif line == "END":
+                return lines
+            lines.append(line)
+
+    def get_state(self) -> Optional[str]:
+        """Current state, e.g. "CONNECTED" or "RECONNECTING" """
+        lines = self._command("state")
+        if len(lines) == 0:
+            return None
+
+        fields = lines[-1].split(",")
+        return fields[1] if len(fields) > 1 else None
+
+    def get_reconnects(self) -> int:
+        """Number of reconnects (restarts of the tunnel) in the state history"""
+        return sum(1 for x in self._command("state all") if len(x.split(",")) > 1 and x.split(",")[1] == "RECONNECTING")
+
+    def get_byte_counts(self) -> Tuple[int, int]:
+        """Received and sent bytes of the tunnel"""
+        stats = {}
+        for element in self._command("load-stats")[0].split(","):
+            key, _, value = element.partition("=")
+            stats[key.strip()] = value.strip()
+
+        return int(stats.get("bytesin", 0)), int(stats.get("bytesout", 0))
+
+    def restart(self) -> None:
+        """Reconnects the tunnel without stopping the process (SIGUSR1)"""
+        self._command("signal SIGUSR1")
+
+    def stop(self) -> None:
+        """Stops the process (SIGTERM)"""
+        self._command("signal SIGTERM")
+
+
+class VpnHealth:
+    """One sample of a running VPN connection. The rates and the latency are only known if they have been measured
+    (`collect_health()`)."""
+    state: Optional[str]
+    bytes_in: int
+    bytes_out: int
+    rx_rate: Optional[float]  # bytes/s
+    tx_rate: Optional[float]  # bytes/s
+    latency: Optional[LatencyResult]
+    reconnects: int
+
+    def __init__(self, state: Optional[str], bytes_in: int, bytes_out: int, rx_rate: Optional[float], tx_rate: Optional[float],
+                 latency: Optional[LatencyResult], reconnects: int):
+        self.state = state
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.rx_rate = rx_rate
+        self.tx_rate = tx_rate
+        self.latency = latency
+        self.reconnects = reconnects
+
+    def __repr__(self):
+        return f"<VpnHealth state={self.state} latency={self.latency}>"
+
+    def is_degraded(self, max_latency: float, previous_bytes_in: Optional[int] = None) -> bool:
+        """A latency above `max_latency` (ms), or no answer from the gateway and no data received since the previous
+        sample (`previous_bytes_in`). The gateway might just filter ICMP, so a tunnel which still receives data is not
+        degraded. Without a latency measurement, the connection is not judged."""
+        if self.latency is None:
+            return False
+        if self.latency.p50 is None:
+            return previous_bytes_in is None or self.bytes_in <= previous_bytes_in
+        return self.latency.p50 > max_latency
+
+    def to_dict(self) -> dict:
+        return {
+            "vpn_state": self.state,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "rx_rate": self.rx_rate,
+            "tx_rate": self.tx_rate,
+            "gateway_latency": None if self.latency is None or self.latency.p50 is None else round(self.latency.p50, 1),
+            "gateway_loss": None if self.latency is None else self.latency.loss,
+            "reconnects": self.reconnects,
+        }
+
+
+def read_health(path: str) -> VpnHealth:
+    """State and counters of the management interface, without measuring anything. Raises VpnException if the
+    OpenVPN process is not reachable."""
+    with OpenVpnManagement(path) as management:
+        state = management.get_state()
+        reconnects = management.get_reconnects()
+        bytes_in, bytes_out = management.get_byte_counts()
+
+    return VpnHealth(state=state, bytes_in=bytes_in, bytes_out=bytes_out, rx_rate=None, tx_rate=None, latency=None,
+                     reconnects=reconnects)
+
+
+def collect_health(path: str, gateway: Optional[str], samples: int = 3) -> VpnHealth:
+    """Samples the byte counters before and after pinging the gateway, so the throughput is measured over the time of
+    the ping. Raises VpnException if the OpenVPN process is not reachable."""
+    with OpenVpnManagement(path) as management:
+        bytes_in, bytes_out = management.get_byte_counts()
+    start = time.monotonic()
+
+    latency = ping_latency(host=gateway, samples=samples) if gateway is not None else None
+
+    health = read_health(path)
+    elapsed = max(time.monotonic() - start, 0.001)
+    health.rx_rate = max(health.bytes_in - bytes_in, 0) / elapsed
+    health.tx_rate = max(health.bytes_out - bytes_out, 0) / elapsed
+    health.latency = latency
+    return health
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+from typing import Optional
+
+from .vpn_probe import parse_remote
+
+_CERT_PATTERN = re.compile(rb"<cert>.*?</cert>", re.DOTALL)
+
+
+class OvpnCache:
+    """Downloaded OpenVPN configurations by VPN server ID and protocol (UDP/TCP).
+
+    The files contain the client certificate and key of the account, so they are written with 0600 below a directory
+    per API key (fingerprint). Files of another (rotated) API key are removed. If a downloaded file differs from the
+    stored one in the remote hostname or the certificate, the file of the other protocol is outdated as well and is
+    removed.
+    """
+    directory: str
+    enabled: bool
+    refresh: bool
+    _base_directory: str
+    _lock: threading.Lock
+
+    def __init__(self, directory: str, namespace: str):
+        assert directory is not None
+
+        self._base_directory = directory
+        self.directory = os.path.join(directory, hashlib.sha256(namespace.encode()).hexdigest()[:16])
+        self.enabled = True
+        self.refresh = False
+        self._lock = threading.Lock()
+
+    def _get_path(self, vpn_id: int, tcp: bool) -> str:
+        return os.path.join(self.directory, f"{vpn_id}_{'tcp' if tcp else 'udp'}.ovpn")
+
+    def get_path(self, vpn_id: int, tcp: bool) -> Optional[str]:
+        """Path of the stored configuration. None if it is not stored (or the cache is bypassed)."""
+        if not self.enabled or self.refresh:
+            return None
+
+        path = self._get_path(vpn_id, tcp)
+        return path if os.path.isfile(path) else None
+
+    def get(self, vpn_id: int, tcp: bool) -> Optional[bytes]:
+        path = self.get_path(vpn_id, tcp)
+        if path is None:
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, vpn_id: int, tcp: bool, data: bytes) -> Optional[str]:
+        """Stores the configuration and returns its path. Nothing is stored if the cache is disabled or the data is not
+        a configuration (e.g. an error message)."""
+        if not self.enabled or parse_remote(data.decode(errors="replace")) is None:
+            return None
+
+        with self._lock:
+            self._remove_other_namespaces()
+            path = self._get_path(vpn_id, tcp)
+            try:
+                os.makedirs(self.directory, mode=0o700, exist_ok=True)
+                chown_to_sudo_user(self.directory)
+
+                other_path = self._get_path(vpn_id, not tcp)
+                if os.path.isfile(other_path):
+                    with open(other_path, "rb") as f:
+                        if _get_identity(f.read()) != _get_identity(data):
+                            os.remove(other_path)
+
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                chown_to_sudo_user(tmp_path)
+                os.replace(tmp_path, path)
+            except OSError:
+                # E.g. written by root before. The file is used without caching it.
+                return None
+
+        return path
+
+    def validate(self, vpn_id: int, hostname: str) -> bool:
+        """Removes the configurations of the server if their remote is not `hostname` (e.g. taken from the active
+        connections). Returns False if they were outdated."""
+        valid = True
+        for tcp in (False, True):
+            data = self.get(vpn_id, tcp)
+            remote = parse_remote(data.decode(errors="replace")) if data is not None else None
+            if remote is not None and remote[0] != hostname:
+                self.invalidate(vpn_id)
+                valid = False
+
+        return valid
+
+    def invalidate(self, vpn_id: Optional[int] = None, tcp: Optional[bool] = None) -> None:
+        """Removes the configurations of the server (only the one of the protocol, if given) or, without ID, all
+        configurations"""
+        with self._lock:
+            if vpn_id is None:
+                shutil.rmtree(self.directory, ignore_errors=True)
+                return None
+
+            for protocol in (False, True) if tcp is None else (tcp,):
+                try:
+                    os.remove(self._get_path(vpn_id, protocol))
+                except FileNotFoundError:
+                    pass
+
+    def _remove_other_namespaces(self) -> None:
+        if not os.path.isdir(self._base_directory):
+            return None
+
+        for name in os.listdir(self._base_directory):
+            path = os.path.join(self._base_directory, name)
+            if path != self.directory and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def chown_to_sudo_user(path: str) -> None:
+    """`vpn start` runs as root (sudo), but the files must stay readable for the user running the other commands"""
+    if hasattr(os, "getuid") and os.getuid() == 0 and "SUDO_UID" in os.environ and "SUDO_GID" in os.environ:
+        os.chown(path, int(os.environ["SUDO_UID"]), int(os.environ["SUDO_GID"]))
+
+
+def _get_identity(data: bytes) -> tuple:
+    """Remote hostname and client certificate of a configuration"""
+    remote = parse_remote(data.decode(errors="replace"))
+    cert = _CERT_PATTERN.search(data)
+    return remote[0] if remote is not None else None, cert.group(0) if cert is not None else None
@@ -0,0 +1,164 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Mapping
+
+from .exception.errors import RequestException
+
+
+class RateLimiter:
+    """Client-side token bucket shared by all requests of a HTTP request object.
+
+    Every request takes a token. Tokens are refilled with `rate` tokens per second up to `burst` tokens. The rate is
+    learned at runtime:
+
+    - `X-RateLimit-Limit` (requests per `window` seconds) caps the rate and `X-RateLimit-Remaining` keeps the bucket in
+      sync with the server. If nothing is remaining, all requests wait until `X-RateLimit-Reset`.
+    - A 429 halves the rate and pauses all requests for `Retry-After` seconds (or an exponential backoff with jitter if
+      the header is missing). A request is given up after `max_retries` rate limited attempts.
+    - Every successful request increases the rate again, up to the learned (or initial) maximum.
+    """
+    max_retries: int
+    window: float
+    _rate: float
+    _max_rate: float
+    _min_rate: float
+    _rate_increase: float
+    _burst: float
+    _tokens: float
+    _last: float
+    _backoff_base: float
+    _backoff_max: float
+    _lock: threading.Lock
+
+    def __init__(self,
+                 rate: float = 10.0,
+                 burst: int = 10,
+                 max_retries: int = 5,
+                 window: float = 60.0,
+                 min_rate: float = 0.2,
+                 rate_increase: float = 0.1,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 60.0):
+        assert rate > 0 and burst >= 1
+
+        self.max_retries = max_retries
+        self.window = window
+        self._rate = rate
+        self._max_rate = rate
+        self._min_rate = min(min_rate, rate)
+        self._rate_increase = rate_increase
+        self._burst = float(burst)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Current rate in requests per second."""
+        return self._rate
+
+    def reserve(self) -> float:
+        """Takes a token and returns the number of seconds the caller has to wait before sending the request."""
+        with self._lock:
+            now = time.monotonic()
+            if now > self._last:
+                self._tokens = min(self._burst, self._tokens + (now - self._last) * self._rate)
+                self._last = now
+
+            self._tokens -= 1
+            ready_at = self._last + max(0.0, -self._tokens) / self._rate
+            return max(0.0, ready_at - now)
+
+    def acquire(self) -> None:
+        """Blocks until the next request may be sent."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _pause(self, seconds: float) -> None:
+        """Pauses all requests for the given number of seconds. Must be called with the lock held."""
+        resume_at = time.monotonic() + seconds
+        if resume_at > self._last:
+            # Exactly one request may be sent when the pause is over, the following ones are spaced by the rate
+            self._last = resume_at
+            self._tokens = 1.0
+
+    def update(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """Learns from the `X-RateLimit-*` headers of a response (that is not a 429)."""
+        limit = _parse_float(headers.get("X-RateLimit-Limit"))
+        remaining = _parse_float(headers.get("X-RateLimit-Remaining"))
+        with self._lock:
+            if limit is not None and limit > 0:
+                self._max_rate = limit / self.window
+                self._min_rate = min(self._min_rate, self._max_rate)
+                self._rate = min(self._rate, self._max_rate)
+
+            if status_code < 400:
+                self._rate = min(self._max_rate, self._rate + self._rate_increase)
+
+            if remaining is not None:
+                self._tokens = min(self._tokens, remaining)
+                if remaining <= 0:
+                    reset = _parse_reset(headers.get("X-RateLimit-Reset"))
+                    self._pause(reset if reset is not None else 1 / self._rate)
+
+    def on_rate_limited(self, headers: Mapping[str, str], attempt: int) -> None:
+        """Handles a 429 of the `attempt`-th try (starting with 0). Pauses all requests and reduces the rate.
+        Raises a RequestException if the retry budget is exhausted."""
+        if attempt >= self.max_retries:
+            raise RequestException({"message": f"Rate limit of the HTB API exceeded. Gave up after {attempt} retries.",
+                                    "status_code": 429})
+
+        retry_after = _parse_retry_after(headers.get("Retry-After"))
+        if retry_after is None:
+            retry_after = _parse_reset(headers.get("X-RateLimit-Reset"))
+
+        if retry_after is not None:
+            # A bit of jitter, so that concurrent requests do not hit the API at the same moment again
+            delay = retry_after + random.uniform(0, 0.25)
+        else:
+            backoff = min(self._backoff_max, self._backoff_base * 2 ** attempt)
+            delay = backoff / 2 + random.uniform(0, backoff / 2)
+
+        with self._lock:
+            self._rate = max(self._min_rate, self._rate / 2)
+            self._pause(delay)
+
+    def __repr__(self):
+        return f"<RateLimiter {self._rate:.2f}/s>"
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either a number of seconds or an HTTP date."""
+    seconds = _parse_float(value)
+    if seconds is not None or value is None:
+        return None if seconds is None else max(0.0, seconds)
+
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(tz=timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """X-RateLimit-Reset is either a UNIX timestamp or a number of seconds."""
+    reset = _parse_float(value)
+    if reset is None:
+        return None
+
+    if reset > 1_000_000_000:
+        reset -= time.time()
+
+    return max(0.0, reset)
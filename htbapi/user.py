@@ -32,6 +32,13 @@ class University(Team):
         return f"<University '{self.name} | {self.id}'>"
 
 
+_XP_ATTRIBUTES = {"xp_level", "xp_level_title", "xp_level_grade", "xp_level_points", "xp_points_until_next_level",
+                  "xp_streak_counter", "xp_streak_saver", "xp_streak_expiresAt", "xp_streak_completed",
+                  "xp_streak_in_danger"}
+_XP_KEYS = {"Level", "Level Title", "Level Grade", "Level Points", "Points Until Next Level", "Streak Counter",
+            "Streak Completed", "Streak Saver", "Streak Expires At", "Streak In Danger"}
+
+
 class User(client.BaseHtbApiObject):
     name: str
     account_id: str
@@ -98,23 +105,43 @@ class User(client.BaseHtbApiObject):
         self.isVip = data.get('isVip', False)
         self.university = University({}, _client) if data.get('university', None) is None else University(data['university'], _client)
 
+    def __getattr__(self, item):
+        """Load the badges and the experience data on first access.
+
+        Both need an extra request each, which is not necessary if only the profile (e.g. the ID or the name) is
+        used. Use `HTBClient.load_user_details()` for loading them for many users concurrently.
+        """
+        if item == "badges":
+            self._load_badges()
+        elif item in _XP_ATTRIBUTES:
+            self._load_experience()
+        else:
+            raise AttributeError(item)
+
+        return self.__dict__[item]
+
+    def _load_badges(self) -> None:
         data = self._client.htb_http_request.get_request(endpoint=f'user/profile/badges/{self.id}')["badges"]
         self.badges = {x["id"]: dateutil.parser.parse(x["pivot"]["created_at"] if "pivot" in x else None) for x in data}
+
+    def _load_experience(self) -> None:
         try:
             xp_data: dict = self._client.htb_http_request.get_request(endpoint=f"account/{self.account_id}", api_version='experience/v1')
         except Exception:
             xp_data = {}
-        if xp_data is not None:
-            self.xp_level = xp_data.get("level", -1)
-            self.xp_level_title = xp_data.get("levelTitle", "?")
-            self.xp_level_grade = xp_data.get("levelGrade", "?")
-            self.xp_level_points = xp_data.get("levelExperiencePoints", 0)
-            self.xp_points_until_next_level= xp_data.get("experienceUntilNextLevel", -1)
-            self.xp_streak_counter = xp_data["streakData"]["counter"] if "streakData" in xp_data else -1
-            self.xp_streak_saver = xp_data["streakData"]["streakSavers"] if "streakData" in xp_data else -1
-            self.xp_streak_expiresAt = dateutil.parser.parse(xp_data["streakData"]["expiresAt"]).replace(tzinfo=timezone.utc) if "streakData" in xp_data else None
-            self.xp_streak_completed = xp_data["streakData"]["isCompleted"] if "streakData" in xp_data else False
-            self.xp_streak_in_danger = xp_data["streakData"]["inDanger"] if "streakData" in xp_data else False
+        if xp_data is None:
+            xp_data = {}
+
+        self.xp_level = xp_data.get("level", -1)
+        self.xp_level_title = xp_data.get("levelTitle", "?")
+        self.xp_level_grade = xp_data.get("levelGrade", "?")
+        self.xp_level_points = xp_data.get("levelExperiencePoints", 0)
+        self.xp_points_until_next_level= xp_data.get("experienceUntilNextLevel", -1)
+        self.xp_streak_counter = xp_data["streakData"]["counter"] if "streakData" in xp_data else -1
+        self.xp_streak_saver = xp_data["streakData"]["streakSavers"] if "streakData" in xp_data else -1
+        self.xp_streak_expiresAt = dateutil.parser.parse(xp_data["streakData"]["expiresAt"]).replace(tzinfo=timezone.utc) if "streakData" in xp_data else None
+        self.xp_streak_completed = xp_data["streakData"]["isCompleted"] if "streakData" in xp_data else False
+        self.xp_streak_in_danger = xp_data["streakData"]["inDanger"] if "streakData" in xp_data else False
 
     def __repr__(self):
         return f"<User '{self.name} | {self.id}'>"
@@ -149,20 +176,28 @@ class User(client.BaseHtbApiObject):
             "Subscription": "VIP" if self.isVip else
                             "VIP+" if self.isDedicatedVip else
                             "Normal",
-            "Badges": self.badges,
-            "Level": self.xp_level,
-            "Level Title": self.xp_level_title,
-            "Level Grade": self.xp_level_grade,
-            "Level Points": self.xp_level_points,
-            "Points Until Next Level": self.xp_points_until_next_level,
-            "Streak Counter": self.xp_streak_counter,
-            "Streak Completed": self.xp_streak_completed,
-            "Streak Saver": self.xp_streak_saver,
-            "Streak Expires At": self.xp_streak_expiresAt,
-            "Streak In Danger": self.xp_streak_in_danger,
-            "Joined Date": self.joined_date
         }
 
+        # Badges and experience data need extra requests. Only load them if they are requested.
+        if not key_filter or "Badges" in key_filter:
+            res["Badges"] = self.badges
+
+        if not key_filter or len(_XP_KEYS.intersection(key_filter)) > 0:
+            res |= {
+                "Level": self.xp_level,
+                "Level Title": self.xp_level_title,
+                "Level Grade": self.xp_level_grade,
+                "Level Points": self.xp_level_points,
+                "Points Until Next Level": self.xp_points_until_next_level,
+                "Streak Counter": self.xp_streak_counter,
+                "Streak Completed": self.xp_streak_completed,
+                "Streak Saver": self.xp_streak_saver,
+                "Streak Expires At": self.xp_streak_expiresAt,
+                "Streak In Danger": self.xp_streak_in_danger,
+            }
+
+        res["Joined Date"] = self.joined_date
+
         if key_filter and len(key_filter) > 0:
             res = {k: res[k] for k in key_filter if k in res}
 
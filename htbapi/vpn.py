@@ -36,12 +36,8 @@ class BaseVpnServer(client.BaseHtbApiObject):
         raise VpnException(data["message"])
 
 
-    def download(self, path: Optional[str] = None, tcp: bool = False) -> str:
-        """Download the OpenVPN file to the corresponding server"""
-        if path is None:
-            fd, path = tempfile.mkstemp(suffix='.ovpn')
-            os.close(fd)
-
+    def _fetch(self, tcp: bool) -> bytes:
+        """Requests the OpenVPN file. The account is switched to this server if it is not assigned."""
         url = f'access/ovpnfile/{self.id}/0'
         if tcp:
             url += '/1'
@@ -64,12 +60,48 @@ class BaseVpnServer(client.BaseHtbApiObject):
             # Try again
             data = self._client.htb_http_request.get_request(endpoint=url, download=True)
 
-        data:bytes = cast(bytes, data)
+        return cast(bytes, data)
+
+    def download(self, path: Optional[str] = None, tcp: bool = False) -> str:
+        """Download the OpenVPN file to the corresponding server"""
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix='.ovpn')
+            os.close(fd)
+
+        ovpn_cache = self._client.ovpn_cache
+        data: Optional[bytes] = ovpn_cache.get(vpn_id=self.id, tcp=tcp) if ovpn_cache is not None else None
+        if data is not None and not self.is_assigned:
+            # The downloaded file is only usable for the assigned server, so the account is switched as without cache
+            self.switch()
+        elif data is None:
+            data = self._fetch(tcp=tcp)
+            if ovpn_cache is not None:
+                ovpn_cache.put(vpn_id=self.id, tcp=tcp, data=data)
+
         with open(path, 'wb') as f:
             f.write(data)
 
         return path
 
+    def get_ovpn_file(self, tcp: bool = False) -> str:
+        """Path of the OpenVPN file in the local cache, which is downloaded if it is not stored yet. Without a cache (or
+        if it is bypassed), the file is downloaded to a temporary file."""
+        ovpn_cache = self._client.ovpn_cache
+        path = ovpn_cache.get_path(vpn_id=self.id, tcp=tcp) if ovpn_cache is not None else None
+        if path is not None:
+            if not self.is_assigned:
+                self.switch()
+            return path
+
+        data = self._fetch(tcp=tcp)
+        path = ovpn_cache.put(vpn_id=self.id, tcp=tcp, data=data) if ovpn_cache is not None else None
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix='.ovpn')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+
+        return path
+
     # noinspection PyUnresolvedReferences
     @staticmethod
     def download_ovpn_file(vpn_id: int,
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from typing import Optional, List, Dict, Tuple, TypeVar
+
+K = TypeVar("K")
+
+# The OpenVPN servers of HTB accept TCP connections on 443 (the "TCP" variant of the .ovpn files)
+DEFAULT_PROBE_PORT = 443
+DEFAULT_SAMPLES = 5
+DEFAULT_TIMEOUT = 2.0
+# Upper bound of connections in flight, so that the probes do not queue up in the local network stack
+DEFAULT_CONCURRENCY = 64
+# Pause between two samples of the same host
+SAMPLE_INTERVAL = 0.05
+# Score of a VPN server: latency plus these penalties (in ms) per connected client and per lost sample (100 %)
+LOAD_PENALTY_MS = 0.5
+LOSS_PENALTY_MS = 100.0
+# Age after which a remembered latency counts half as much as a new measurement
+LATENCY_HALF_LIFE = 7 * 24 * 60 * 60
+# Interval of the ICMP echo requests. 0.2s is the minimum for non-root users.
+PING_INTERVAL = 0.2
+
+_PING_TIME_PATTERN = re.compile(r"time[=<]([\d.]+) ?ms")
+
+
+def parse_remote(ovpn: str) -> Optional[Tuple[str, Optional[int], Optional[str]]]:
+    """Returns the hostname, port and protocol of the first `remote` line of an OpenVPN configuration"""
+    proto = None
+    remote = None
+    for line in ovpn.splitlines():
+        words = line.split()
+        if len(words) >= 2 and words[0] == "proto":
+            proto = words[1]
+        elif len(words) >= 2 and words[0] == "remote" and remote is None:
+            port = int(words[2]) if len(words) >= 3 and words[2].isdigit() else None
+            remote = (words[1], port)
+            if len(words) >= 4:
+                proto = words[3]
+
+    if remote is None:
+        return None
+    return remote[0], remote[1], proto
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Percentile `p` (0-100) with linear interpolation. None for no values."""
+    if len(values) == 0:
+        return None
+
+    values = sorted(values)
+    rank = (len(values) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+class LatencyResult:
+    """Round-trip times (in ms) of the TCP handshakes with one host"""
+    samples: List[float]
+    sent: int
+
+    def __init__(self, samples: List[float], sent: int):
+        self.samples = samples
+        self.sent = sent
+
+    @property
+    def p50(self) -> Optional[float]:
+        return percentile(self.samples, 50)
+
+    @property
+    def p90(self) -> Optional[float]:
+        return percentile(self.samples, 90)
+
+    @property
+    def loss(self) -> float:
+        """Share of samples without an answer (0.0 - 1.0)"""
+        return 1.0 if self.sent == 0 else 1 - len(self.samples) / self.sent
+
+    def __repr__(self):
+        return f"<LatencyResult p50={self.p50} loss={self.loss:.0%}>"
+
+    def to_dict(self) -> dict:
+        return {
+            "latency": None if self.p50 is None else round(self.p50, 1),
+            "latency_p90": None if self.p90 is None else round(self.p90, 1),
+            "loss": self.loss,
+        }
+
+
+async def _probe_host(host: str, port: int, samples: int, timeout: float, semaphore: asyncio.Semaphore) -> LatencyResult:
+    loop = asyncio.get_running_loop()
+    try:
+        # The name is resolved once, so that DNS is not part of the measured time
+        address = (await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM))[0][4][0]
+    except OSError:
+        return LatencyResult(samples=[], sent=samples)
+
+    rtts = []
+    for i in range(samples):
+        if i > 0:
+            await asyncio.sleep(SAMPLE_INTERVAL)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout=timeout)
+                rtts.append((time.perf_counter() - start) * 1000)
+                writer.transport.abort()
+            except ConnectionRefusedError:
+                # The RST of the server is an answer as well
+                rtts.append((time.perf_counter() - start) * 1000)
+            except (OSError, asyncio.TimeoutError):
+                pass
+
+    return LatencyResult(samples=rtts, sent=samples)
+
+
+def probe_latencies(targets: Dict[K, Tuple[str, int]],
+                    samples: int = DEFAULT_SAMPLES,
+                    timeout: float = DEFAULT_TIMEOUT,
+                    concurrency: int = DEFAULT_CONCURRENCY) -> Dict[K, LatencyResult]:
+    """Measures the TCP handshake time to every (host, port) concurrently. All hosts are probed at the same time, so
+    the whole run takes about `samples` round-trips (or timeouts) instead of one run per host."""
+    async def probe_all() -> Dict[K, LatencyResult]:
+        semaphore = asyncio.Semaphore(concurrency)
+        keys = list(targets.keys())
+        results = await asyncio.gather(*(_probe_host(targets[k][0], targets[k][1], samples, timeout, semaphore) for k in keys))
+        return dict(zip(keys, results))
+
+    return asyncio.run(probe_all())
+
+
+def ping_latency(host: str, samples: int = 3, timeout: float = 1.0) -> Optional[LatencyResult]:
+    """Round-trip times of ICMP echo requests (`ping`). Used for hosts inside the tunnel (e.g. the gateway), which do
+    not necessarily accept TCP connections. None if `ping` is not available."""
+    if shutil.which("ping") is None:
+        return None
+
+    try:
+        p = subprocess.run(["ping", "-n", "-c", str(samples), "-i", str(PING_INTERVAL), "-W", str(max(int(timeout), 1)), host],
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.DEVNULL,
+                           timeout=samples * PING_INTERVAL + timeout + 1,
+                           text=True)
+    except (OSError, subprocess.TimeoutExpired):
+        return LatencyResult(samples=[], sent=samples)
+
+    return LatencyResult(samples=[float(x) for x in _PING_TIME_PATTERN.findall(p.stdout)], sent=samples)
+
+
+def score_vpn_server(latency: float, loss: float, current_clients: int) -> float:
+    """Lower is better. A crowded server or a lossy path costs as much as a few milliseconds of latency."""
+    return latency + LOAD_PENALTY_MS * current_clients + LOSS_PENALTY_MS * loss
+
+
+class VpnHostStore:
+    """Hostnames of the VPN servers by ID. The hostname is only part of the .ovpn file (or of an active connection),
+    and downloading the file of a server the account is not assigned to switches the account to it. Every hostname
+    seen once is stored, so that later benchmarks can probe the server without switching. The measured latencies are
+    remembered as well (`update_latency()`)."""
+    path: str
+    _lock: threading.Lock
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def get_all(self) -> Dict[int, dict]:
+        """{"hostname": ..., "port": ..., "proto": ..., "latency": ..., "measured_at": ...} by server ID"""
+        return {int(k): v for k, v in self._read().items() if k.isdigit()}
+
+    def get(self, vpn_id: int) -> Optional[dict]:
+        return self._read().get(str(vpn_id))
+
+    def update(self, vpn_id: int, hostname: str, port: Optional[int] = None, proto: Optional[str] = None) -> None:
+        with self._lock:
+            data = self._read()
+            entry = data.get(str(vpn_id), {})
+            entry["hostname"] = hostname
+            if port is not None:
+                entry["port"] = port
+            if proto is not None:
+                entry["proto"] = proto
+            data[str(vpn_id)] = entry
+            self._write(data)
+
+    def update_latency(self, vpn_id: int, latency: float) -> float:
+        """Remembers a measured latency and returns it blended with the remembered one. The remembered latency counts
+        less the older it is (half-life `LATENCY_HALF_LIFE`), so a single noisy measurement does not decide alone."""
+        with self._lock:
+            data = self._read()
+            entry = data.get(str(vpn_id), {})
+            now = time.time()
+            if entry.get("latency") is not None:
+                weight = 0.5 ** (max(now - entry.get("measured_at", 0), 0) / LATENCY_HALF_LIFE)
+                latency = (latency + entry["latency"] * weight) / (1 + weight)
+            entry["latency"] = latency
+            entry["measured_at"] = now
+            data[str(vpn_id)] = entry
+            self._write(data)
+
+        return latency
+
+    def _write(self, data: Dict[str, dict]) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
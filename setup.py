@@ -4,7 +4,7 @@ setup(
     name="htb-operator",
     version="0.0.1",  # Will be automatically set by GitHub workflow
     packages=find_packages(),
-    py_modules=["htb_operator"],
+    py_modules=["htb_operator", "htb_completion"],
     install_requires=[
         "httpx",
         "httpx[http2]",
@@ -28,6 +28,7 @@ setup(
     entry_points={
         "console_scripts": [
             "htb-operator=htb_operator:main",
+            "htb-operator-complete=htb_completion:main",
         ],
     },
     description="Command line interface for managing hack the box profile, machines and challenges",
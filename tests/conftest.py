@@ -282,6 +282,12 @@ class StubHtbHttpRequest:
         self.calls.append(("GET", key, {"endpoint": endpoint, "download": download, "custom_url": custom_url, "api_version": api_version}))
         return self._pop_response(self.get_routes, key)
 
+    def download(self, path: str, endpoint: str | None = None, custom_url: str | None = None, api_version: str | None = None, expected_sha256: str | None = None, resume: bool = True, segments: int = 1) -> str:
+        # Use the default implementation (based on get_request) of the real base class
+        from htbapi.htb_http_request import BaseHtbHttpRequest
+
+        return BaseHtbHttpRequest.download(self, path=path, endpoint=endpoint, custom_url=custom_url, api_version=api_version, expected_sha256=expected_sha256)
+
     def post_request(self, endpoint: str, json: Any = None, api_version: str = "v4") -> Any:
         self.calls.append(("POST", endpoint, {"json": json, "api_version": api_version}))
         return self._pop_response(self.post_routes, endpoint)
@@ -297,10 +303,8 @@ def reset_client_caches() -> None:
     try:
         import htbapi.client as client_mod  # type: ignore
         client_mod._user_cache = {}
-        client_mod._vpn_server_cache = {}
         yield
         client_mod._user_cache = {}
-        client_mod._vpn_server_cache = {}
     except Exception:
         # Module/dependency not available — allow tests that don't need it to run.
         yield
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+
+from htbapi.async_client import AsyncHTBClient
+from htbapi.exception.errors import RequestException
+from htbapi.htb_http_request import AsyncHtbHttpRequest
+
+
+def make_async_request(responses: dict, state: dict) -> AsyncHtbHttpRequest:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        state["running"] = state.get("running", 0) + 1
+        state["max_running"] = max(state.get("max_running", 0), state["running"])
+        await asyncio.sleep(0.05)
+        state["running"] -= 1
+        status_code, body = responses[request.url.path]
+        return httpx.Response(status_code, json=body) if not isinstance(body, bytes) else httpx.Response(status_code, content=body)
+
+    req = AsyncHtbHttpRequest(app_token="token", api_base="https://labs.example/api/", user_agent="test")
+    req._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return req
+
+
+def test_async_request_get_post_and_download(tmp_path) -> None:
+    state = {}
+    req = make_async_request({"/api/v4/season/list": (200, {"data": []}),
+                              "/api/v4/machine/own": (200, {"message": "ok"}),
+                              "/api/v4/access/ovpnfile/1/0": (200, b"OVPN")}, state)
+
+    async def run():
+        get_result = await req.get_request(endpoint="season/list")
+        post_result = await req.post_request(endpoint="machine/own", json={"flag": "x"})
+        file_hash = await req.download(path=str(tmp_path / "vpn.ovpn"), endpoint="access/ovpnfile/1/0")
+        await req.aclose()
+        return get_result, post_result, file_hash
+
+    get_result, post_result, file_hash = asyncio.run(run())
+
+    assert get_result == {"data": []}
+    assert post_result == {"message": "ok"}
+    assert (tmp_path / "vpn.ovpn").read_bytes() == b"OVPN"
+    assert file_hash == hashlib.sha256(b"OVPN").hexdigest()
+    assert [x.name for x in tmp_path.iterdir()] == ["vpn.ovpn"]
+
+
+def test_async_request_raises_request_exception() -> None:
+    req = make_async_request({"/api/v4/machine/profile/1": (404, {"message": "Machine not found"})}, {})
+
+    with pytest.raises(RequestException, match="Machine not found"):
+        asyncio.run(req.get_request(endpoint="machine/profile/1"))
+
+
+def test_async_client_runs_get_methods_concurrently() -> None:
+    state = {}
+    req = make_async_request({"/api/v4/season/list": (200, {"data": [{"id": 1,
+                                                                              "name": "Season 1",
+                                                                              "start_date": "2026-01-01T00:00:00Z",
+                                                                              "state": "active",
+                                                                              "is_visible": True,
+                                                                              "active": True}]}),
+                              "/api/v4/prolabs": (200, {"data": {"labs": []}})}, state)
+
+    async def run():
+        async with AsyncHTBClient(htb_http_request=req) as client:
+            return await asyncio.gather(client.get_season_list(), client.get_prolabs())
+
+    seasons, prolabs = asyncio.run(run())
+
+    assert [s.id for s in seasons] == [1]
+    assert prolabs == []
+    assert state["max_running"] == 2
+
+
+def test_sync_fallback_shares_the_rate_limiter() -> None:
+    from htbapi.async_client import _LoopBridgeHttpRequest
+
+    req = make_async_request({}, {})
+    bridge = _LoopBridgeHttpRequest(req)
+
+    assert bridge._get_sync_request()._rate_limiter is req._rate_limiter
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import hashlib
+import os
+
+import httpx
+
+from htbapi.blob_store import BlobStore
+from htbapi.htb_http_request import HtbHtbHttpRequest
+
+
+def make_request(handler, blob_store: BlobStore) -> HtbHtbHttpRequest:
+    req = HtbHtbHttpRequest(app_token="token", api_base="https://labs.example/api/", user_agent="test", blob_store=blob_store)
+    req._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return req
+
+
+def test_repeated_download_is_served_from_blob_store(tmp_path) -> None:
+    data = b"challenge archive"
+    requests = []
+    store = BlobStore(directory=str(tmp_path / "blobs"))
+    req = make_request(lambda request: requests.append(request) or httpx.Response(200, content=data), store)
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+
+    req.download(path=str(tmp_path / "a" / "challenge.zip"), endpoint="challenge/download/1", expected_sha256=sha256)
+    file_hash = req.download(path=str(tmp_path / "b" / "challenge.zip"), endpoint="challenge/download/1", expected_sha256=sha256)
+
+    assert file_hash == sha256
+    assert len(requests) == 1
+    assert (tmp_path / "b" / "challenge.zip").read_bytes() == data
+    assert os.path.samefile(tmp_path / "b" / "challenge.zip", tmp_path / "blobs" / sha256[:2] / sha256)
+
+
+def test_blob_store_ignores_changed_blob(tmp_path) -> None:
+    store = BlobStore(directory=str(tmp_path / "blobs"))
+    (tmp_path / "file").write_bytes(b"original")
+    sha256 = hashlib.sha256(b"original").hexdigest()
+    store.put(str(tmp_path / "file"), sha256)
+
+    # Changed through the hardlink
+    with open(tmp_path / "file", "r+b") as f:
+        f.write(b"modified")
+
+    assert not store.get(sha256, str(tmp_path / "copy"))
+    assert not store.contains(sha256)
+
+
+def test_blob_store_evicts_least_recently_used(tmp_path) -> None:
+    store = BlobStore(directory=str(tmp_path / "blobs"), max_size=30)
+    hashes = {}
+    for i, name in enumerate(["old", "used", "new"]):
+        data = name.encode() * 4
+        (tmp_path / name).write_bytes(data)
+        hashes[name] = hashlib.sha256(data).hexdigest()
+        store.put(str(tmp_path / name), hashes[name])
+        os.utime(tmp_path / "blobs" / hashes[name][:2] / hashes[name], (1000 + i, 1000 + i))
+        if name == "used":
+            # Reading "old" makes "used" the least recently used file
+            assert store.get(hashes["old"], str(tmp_path / "old_copy"))
+
+    assert store.contains(hashes["old"])
+    assert not store.contains(hashes["used"])
+    assert store.contains(hashes["new"])
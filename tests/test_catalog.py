@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import pytest
+
+from htbapi.catalog import Catalog
+from htbapi.client import HTBClient
+from htbapi.exception.errors import RequestException
+
+
+def challenge(challenge_id: int, name: str, category_id: int, solved: bool, todo: bool, difficulty: str = "Easy") -> dict:
+    return {"id": challenge_id,
+            "name": name,
+            "retired": False,
+            "difficulty": difficulty,
+            "solves": 1,
+            "release_date": f"2024-01-0{challenge_id}",
+            "challenge_category_id": category_id,
+            "rating": 4.0,
+            "avg_difficulty": 2,
+            "authUserSolve": solved,
+            "isTodo": todo}
+
+
+def machine(machine_id: int, os: str = "Linux", retired: bool = True) -> dict:
+    return {"id": machine_id,
+            "name": f"Box-{machine_id}",
+            "releaseDate": f"2024-01-{machine_id:02d}",
+            "release": f"2024-01-{machine_id:02d}",
+            "os": os,
+            "retired": retired,
+            "difficultyText": "Easy"}
+
+
+@pytest.fixture
+def catalog(tmp_path) -> Catalog:
+    return Catalog(path=str(tmp_path / "catalog.sqlite"))
+
+
+def add_challenge_lists(stub_http) -> None:
+    stub_http.add_get("challenge/list", {"challenges": [challenge(1, "Spookifier", 1, True, False),
+                                                        challenge(2, "Spooky Pass", 2, False, True, "Hard"),
+                                                        challenge(3, "Other", 2, False, True)]})
+    stub_http.add_get("challenges?state=unreleased&sort_type=asc", {"data": []})
+    stub_http.add_get("challenge/list/retired", {"challenges": [dict(challenge(4, "Old Spook", 2, False, True), retired=True)]})
+
+
+def test_challenge_list_and_search_are_answered_locally(stub_http, catalog) -> None:
+    client = HTBClient(htb_http_request=stub_http, catalog=catalog)
+    add_challenge_lists(stub_http)
+
+    unsolved_todo = client.get_challenge_list(retired=False, unsolved=True, filter_todo=True, filter_category_list=[2])
+    hard = client.get_challenge_list(retired=False, filter_difficulty="hard")
+    found = client.search_challenges(name="spook", unsolved=True)
+
+    assert [x.id for x in unsolved_todo] == [2, 3]
+    assert [x.id for x in hard] == [2]
+    assert sorted(x.id for x in found) == [2, 4]
+    # Synchronized once, everything else is filtered locally
+    assert len(stub_http.endpoints_for("GET")) == 3
+
+
+def test_machine_sync_is_incremental(stub_http, catalog) -> None:
+    client = HTBClient(htb_http_request=stub_http, catalog=catalog)
+    catalog.store(kind="machine", entries=[machine(x) for x in (1, 2, 3)], full=True)
+    catalog.ttl = 0
+    stub_http.add_get("machines?per_page=100&sort_type=desc&page=1", {"data": [machine(5), machine(4)], "meta": {"last_page": 3}})
+    stub_http.add_get("machines?per_page=100&sort_type=desc&page=2", {"data": [machine(3), machine(2)], "meta": {"last_page": 3}})
+    stub_http.add_get("machines?per_page=100&state=active&page=1", {"data": [machine(6, os="Windows", retired=False)], "meta": {"last_page": 1}})
+
+    windows = client.get_machine_list(state="", os_filter=["windows"])
+    catalog.ttl = 3600
+    all_machines = client.get_machine_list(state="", limit=3)
+
+    assert [x.id for x in windows] == [6]
+    assert [x.id for x in all_machines] == [6, 5, 4]
+    # The third page is not requested, because the second one contains only known machines
+    assert "machines?per_page=100&sort_type=desc&page=3" not in stub_http.endpoints_for("GET")
+
+
+def test_stale_catalog_is_used_when_api_is_unreachable(stub_http, catalog) -> None:
+    client = HTBClient(htb_http_request=stub_http, catalog=catalog)
+    add_challenge_lists(stub_http)
+    client.sync_catalog(kinds=["challenge"])
+    catalog.invalidate()
+    stub_http.add_get("challenge/list", RequestException({"message": "offline", "status_code": None}))
+
+    result = client.get_challenge_list(retired=True)
+
+    assert [x.id for x in result] == [4]
+    assert catalog.needs_full_sync("challenge")
+
+
+def test_retired_challenges_are_taken_from_the_endpoint(stub_http, catalog) -> None:
+    client = HTBClient(htb_http_request=stub_http, catalog=catalog)
+    add_challenge_lists(stub_http)
+    # Neither the default of the fixture nor a missing field decides, only the endpoint
+    stub_http.get_routes["challenge/list/retired"] = [{"challenges": [challenge(4, "Old Spook", 2, False, True),
+                                                                      {k: v for k, v in challenge(5, "Old", 1, False, False).items() if k != "retired"}]}]
+
+    retired = client.get_challenge_list(retired=True)
+    active = client.get_challenge_list(retired=False)
+
+    assert [x.id for x in retired] == [4, 5]
+    assert [x.id for x in active] == [1, 2, 3]
+
+
+def test_corrupt_catalog_falls_back_to_api(stub_http, tmp_path) -> None:
+    path = tmp_path / "catalog.sqlite"
+    path.write_bytes(b"not a database" * 100)
+    catalog = Catalog(path=str(path))
+    client = HTBClient(htb_http_request=stub_http, catalog=catalog)
+    add_challenge_lists(stub_http)
+
+    result = client.get_challenge_list(retired=True)
+
+    assert [x.id for x in result] == [4]
+    assert not catalog.enabled
+    assert catalog.suggest_names(kind="challenge", name="Spook") == []
+
+
+def test_names_are_resolved_and_suggested_locally(stub_http, catalog) -> None:
+    client = HTBClient(htb_http_request=stub_http, catalog=catalog)
+    add_challenge_lists(stub_http)
+    client.sync_catalog(kinds=["challenge"])
+
+    assert catalog.resolve_name(kind="challenge", name="spooky pass") == 2
+    assert catalog.resolve_name(kind="challenge", name="spooky") is None
+    # Prefix matches first, then typos by trigram similarity
+    assert catalog.suggest_names(kind="challenge", name="Spook") == ["Spookifier", "Spooky Pass", "Old Spook"]
+    assert catalog.suggest_names(kind="challenge", name="Spookfier")[0] == "Spookifier"
+    assert catalog.suggest_names(kind="challenge", name="xyz") == []
+
+
+def test_get_machine_uses_catalog_id_and_suggests_on_unknown_name(stub_http, catalog) -> None:
+    client = HTBClient(htb_http_request=stub_http, catalog=catalog)
+    catalog.store(kind="machine", entries=[dict(machine(1), name="Lame"), dict(machine(2), name="Legacy")], full=True)
+    stub_http.add_get("machine/profile/1", {"info": dict(machine(1), name="Lame")})
+    stub_http.add_get("machine/profile/Lamee", RequestException({"message": "Machine not found", "status_code": 404}))
+
+    machine_info = client.get_machine("lame")
+    with pytest.raises(RequestException) as e:
+        client.get_machine("Lamee")
+
+    assert machine_info.id == 1
+    assert e.value.args[0]["message"] == 'No machine found with name "Lamee". Did you mean: Lame?'
+
+
+def test_get_user_by_name_skips_search_once_resolved(stub_http, catalog) -> None:
+    import htbapi.client as client_module
+
+    profile = {"id": 7, "account_id": 7, "name": "m4cz", "joined_date": "2024-01-01T00:00:00Z", "points": 1,
+               "rank": "Hacker", "rank_id": 5, "rank_requirement": 0, "public": True}
+    client = HTBClient(htb_http_request=stub_http, catalog=catalog)
+    stub_http.add_get('search/fetch?query="m4cz"', {"users": [{"id": 7, "value": "m4cz"}]})
+    stub_http.add_get_sequence("user/profile/basic/7", [{"profile": profile}, {"profile": profile}])
+
+    client.get_user(username="m4cz")
+    client_module._user_cache = {}
+    user = client.get_user(username="M4CZ")
+
+    assert user.id == 7
+    assert stub_http.endpoints_for("GET").count('search/fetch?query="m4cz"') == 1
+    assert catalog.suggest_names(kind="user", name="m4c") == ["m4cz"]
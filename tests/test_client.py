@@ -4,6 +4,7 @@ from typing import Dict, List
 
 import pytest
 
+from htbapi.catalog import Catalog
 from htbapi.exception.errors import RequestException, NoPwnBoxActiveException
 from htbapi.prolab import ProLabProgres
 from htbapi.sherlock import SherlockCategory
@@ -211,7 +212,7 @@ def vpn_data() -> Dict:
     }
 
 
-def test_get_user_by_id_fetches_profile_badges_and_ranking(client, stub_http) -> None:
+def test_get_user_by_id_fetches_profile_and_badges_lazily(client, stub_http) -> None:
     user_id = 42
     stub_http.add_get(f"user/profile/basic/{user_id}", {"profile": sample_user_profile(user_id)})
     stub_http.add_get(f"user/profile/badges/{user_id}", {"badges": sample_badges()})
@@ -219,14 +220,29 @@ def test_get_user_by_id_fetches_profile_badges_and_ranking(client, stub_http) ->
     user = client.get_user(user_id=user_id)
 
     assert user.id == user_id
+    assert stub_http.endpoints_for("GET") == [f"user/profile/basic/{user_id}"]
     assert 7 in user.badges
-    endpoints = stub_http.endpoints_for("GET")
-    assert endpoints[:2] == [
+    assert 7 in user.badges
+    assert stub_http.endpoints_for("GET") == [
         f"user/profile/basic/{user_id}",
         f"user/profile/badges/{user_id}",
     ]
 
 
+def test_user_experience_is_loaded_once_and_to_dict_skips_unneeded_requests(client, stub_http) -> None:
+    stub_http.add_get("user/profile/basic/3", {"profile": sample_user_profile(3)})
+    user = client.get_user(user_id=3)
+    stub_http.add_get(f"account/{user.account_id}", {"level": 12, "levelTitle": "Hacker"})
+
+    assert user.to_dict(key_filter=["ID", "Name"]) == {"ID": 3, "Name": user.name}
+    assert len(stub_http.calls) == 1
+
+    client.load_user_details(users=[user], badges=False)
+    assert user.to_dict(key_filter=["Level", "Level Title"]) == {"Level": 12, "Level Title": "Hacker"}
+    assert user.xp_streak_counter == -1
+    assert stub_http.endpoints_for("GET")[1:] == [f"account/{user.account_id}"]
+
+
 def test_get_user_cache_hit_skips_http_calls(client, stub_http) -> None:
     user_id = 1
     stub_http.add_get(f"user/profile/basic/{user_id}", {"profile": sample_user_profile(user_id)})
@@ -370,9 +386,7 @@ def test_get_sherlocks_paginates_and_applies_filters(client, stub_http) -> None:
     assert stub_http.endpoints_for("GET") == [endpoint_page1, endpoint_page2]
 
 
-def test_get_machine_list_paginates_and_adds_retired_flag(client, stub_http, monkeypatch) -> None:
-    monkeypatch.setattr("htbapi.client.time.sleep", lambda *_: None)
-
+def test_get_machine_list_paginates_and_adds_retired_flag(client, stub_http) -> None:
     endpoint_page1 = "machines?per_page=100&page=1&keyword=box&sort_type=asc&os[]=linux&difficulty[]=easy"
     endpoint_page2 = "machines?per_page=100&page=2&keyword=box&sort_type=asc&os[]=linux&difficulty[]=easy"
 
@@ -391,11 +405,9 @@ def test_get_machine_list_paginates_and_adds_retired_flag(client, stub_http, mon
     assert stub_http.endpoints_for("GET") == [endpoint_page1, endpoint_page2]
 
 
-def test_get_machine_list_limit_short_circuits(client, stub_http, monkeypatch) -> None:
-    monkeypatch.setattr("htbapi.client.time.sleep", lambda *_: None)
-
-    endpoint_page1 = "machines?per_page=100&page=1&keyword=box&sort_type=asc"
-    stub_http.add_get(endpoint_page1, {"data": [machine_entry(1), machine_entry(2)], "meta": {"last_page": 5}})
+def test_get_machine_list_limit_short_circuits(client, stub_http) -> None:
+    endpoint_page1 = "machines?per_page=1&page=1&keyword=box&sort_type=asc"
+    stub_http.add_get(endpoint_page1, {"data": [machine_entry(1)], "meta": {"last_page": 5}})
 
     result = client.get_machine_list(keyword="box", limit=1, sort_type="asc")
 
@@ -403,12 +415,93 @@ def test_get_machine_list_limit_short_circuits(client, stub_http, monkeypatch) -
     assert stub_http.endpoints_for("GET") == [endpoint_page1]
 
 
+def test_get_machine_list_fetches_remaining_pages_concurrently_in_order(client, stub_http) -> None:
+    for page in range(1, 5):
+        stub_http.add_get(f"machines?per_page=100&page={page}&state=retired&sort_type=desc",
+                          {"data": [machine_entry(page * 10 + 1), machine_entry(page * 10 + 2)], "meta": {"last_page": 4}})
+
+    result = client.get_machine_list(state="retired")
+
+    assert [x.id for x in result] == [11, 12, 21, 22, 31, 32, 41, 42]
+    assert stub_http.endpoints_for("GET")[0] == "machines?per_page=100&page=1&state=retired&sort_type=desc"
+    assert len(stub_http.endpoints_for("GET")) == 4
+
+
+def test_get_machine_list_limit_only_fetches_required_pages(client, stub_http) -> None:
+    stub_http.add_get("machines?per_page=100&page=1&sort_type=desc",
+                      {"data": [machine_entry(x) for x in range(100)], "meta": {"last_page": 5}})
+    stub_http.add_get("machines?per_page=100&page=2&sort_type=desc",
+                      {"data": [machine_entry(x) for x in range(100, 200)], "meta": {"last_page": 5}})
+
+    result = client.get_machine_list(limit=150)
+
+    assert [x.id for x in result] == list(range(150))
+
+
+def test_iter_machines_stops_fetching_when_consumer_stops(client, stub_http) -> None:
+    stub_http.add_get("machines?per_page=100&page=1&state=active&sort_type=desc",
+                      {"data": [machine_entry(1), machine_entry(2)], "meta": {"last_page": 3}})
+    stub_http.add_get("machines?per_page=100&page=2&state=active&sort_type=desc",
+                      {"data": [machine_entry(3), machine_entry(4)], "meta": {"last_page": 3}})
+
+    machines = client.iter_machines(state="active")
+    assert stub_http.endpoints_for("GET") == []
+
+    first_match = next(x for x in machines if x.id == 3)
+
+    assert first_match.name == "Box-3"
+    assert len(stub_http.endpoints_for("GET")) == 2
+
+
+def test_get_user_activity_returns_exactly_limit_entries(client, stub_http) -> None:
+    def activity_entry(entry_id: int) -> Dict:
+        return {"id": entry_id, "ownDate": "2026-01-01T00:00:00.000000Z", "categoryName": "machine", "type": "user",
+                "name": f"Box-{entry_id}", "points": 10}
+
+    stub_http.add_get("user/profile/activity/7?page=1&per_page=3",
+                      {"data": [activity_entry(1), activity_entry(2), activity_entry(3)], "meta": {"page": 1, "lastPage": 9}})
+
+    result = client.get_user_activity(user_id=7, limit_activity_entries=3)
+
+    assert len(result) == 3
+    assert stub_http.endpoints_for("GET") == ["user/profile/activity/7?page=1&per_page=3"]
+
+
+def test_get_unreleased_machines_resolves_each_machine_once(client, stub_http) -> None:
+    stub_http.add_get("machines?state=unreleased", {"data": [{"id": 5, "retiring": {"id": 1}},
+                                                             {"id": 6, "retiring": {"id": 1}},
+                                                             {"id": 7}]})
+    for machine_id in [5, 6, 7, 1]:
+        stub_http.add_get(f"machine/profile/{machine_id}", {"info": machine_entry(machine_id)})
+
+    result = client.get_unreleased_machines()
+
+    assert [(m.id, r.id if r is not None else None) for m, r in result] == [(5, 1), (6, 1), (7, None)]
+    assert stub_http.endpoints_for("GET").count("machine/profile/1") == 1
+
+
+def test_get_fortress_list_resolves_fortresses_in_order(client, stub_http) -> None:
+    def fortress_entry(fortress_id: int) -> Dict:
+        return {"id": fortress_id, "name": f"Fortress-{fortress_id}", "ip": "10.13.37.1", "company": {},
+                "reset_votes": 0, "description": "", "completion_message": "", "flags": []}
+
+    stub_http.add_get("fortresses", {"data": {"3": {"id": 3}, "1": {"id": 1}, "2": {"id": 2}}})
+    for fortress_id in [1, 2, 3]:
+        stub_http.add_get(f"fortress/{fortress_id}", {"data": fortress_entry(fortress_id)})
+
+    assert [x.id for x in client.get_fortress_list()] == [3, 1, 2]
+
+    stub_http.add_get("fortress/2", {"data": fortress_entry(2)})
+    assert list(client.get_fortresses([2, 2]).keys()) == [2]
+
+
 def test_get_machine_list_invalid_filters_raise(client) -> None:
     with pytest.raises(AssertionError):
         client.get_machine_list(os_filter=["mac"])
 
 
-def test_get_all_vpn_server_uses_cache_and_location_filter(client, stub_http) -> None:
+def test_get_all_vpn_server_uses_cache_and_location_filter(client, stub_http, tmp_path) -> None:
+    client.catalog = Catalog(path=str(tmp_path / "catalog.sqlite"))
     stub_http.add_get("connections/servers?product=labs", {"data": vpn_data()})
 
     first = client.get_all_vpn_server(products=["labs"], vpn_location="EU")
@@ -422,6 +515,28 @@ def test_get_all_vpn_server_uses_cache_and_location_filter(client, stub_http) ->
     assert list(second.keys()) == [2]
 
 
+def test_get_all_vpn_server_caches_forbidden_prolab_servers(client, stub_http, tmp_path) -> None:
+    client.catalog = Catalog(path=str(tmp_path / "catalog.sqlite"))
+    prolabs = [{"id": 1, "name": "Dante", "release_at": "2020-01-01"}, {"id": 2, "name": "Offshore", "release_at": "2020-01-01"}]
+    client.catalog.store(kind="prolab", entries=prolabs, full=True)
+    stub_http.add_get("connections/servers/prolab/1", {"data": vpn_data()})
+    stub_http.add_get("connections/servers/prolab/2", RequestException({"message": "Forbidden", "status_code": 403}))
+    stub_http.add_get("connections/servers?product=labs", {"data": vpn_data()})
+
+    servers = client.get_all_vpn_server(products=["labs", "prolab"])
+    assert servers[3].product == "prolab | Dante"
+
+    # The assigned server changes on a switch, the access to a Pro Lab does not
+    client.catalog.invalidate()
+    stub_http.add_get("prolabs", {"data": {"labs": prolabs}})
+    stub_http.add_get("connections/servers/prolab/1", {"data": vpn_data()})
+    stub_http.add_get("connections/servers?product=labs", {"data": vpn_data()})
+    client.get_all_vpn_server(products=["labs", "prolab"])
+
+    assert stub_http.endpoints_for("GET").count("connections/servers/prolab/2") == 1
+    assert stub_http.endpoints_for("GET").count("connections/servers/prolab/1") == 2
+
+
 def test_prolab_progress_parses_milestone_legacy_key(client) -> None:
     progress_data = {
         "ownership": 12.5,
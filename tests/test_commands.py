@@ -225,6 +225,20 @@ def test_config_command_toggles_verify_ssl() -> None:
     assert cli.save_count == 1
 
 
+def test_config_command_prints_cache_stats() -> None:
+    class HttpCacheStub:
+        def get_stats(self) -> dict:
+            return {"hits": 2, "revalidations": 1, "misses": 1, "saved_bytes": 0}
+
+    cli = CLIStub()
+    cli.http_cache = HttpCacheStub()
+    args = argparse.Namespace(no_verify_ssl=False, verify_ssl=False, cache_stats=True)
+    ConfigCommand(htb_cli=cli, args=args).execute()
+
+    assert any("75.0% served from cache" in msg for msg in cli.logger.infos)
+    assert cli.save_count == 0
+
+
 def test_proxy_command_clear_and_set() -> None:
     cli = CLIStub()
     cli.config["Proxy"] = {"http": "http://old"}
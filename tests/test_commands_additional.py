@@ -1,13 +1,20 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import importlib
+import io
+import os
 import sys
+import threading
+import time
 import types
 from pathlib import Path
 from datetime import datetime, timezone
 from types import SimpleNamespace
 
+import pytest
+
 # Prevent executing command/__init__.py (side effects) by registering a dummy
 # package with a correct __path__ and importing submodules via importlib.
 if "command" not in sys.modules:
@@ -21,6 +28,7 @@ prolabs_mod = importlib.import_module("command.prolabs")
 pwnbox_mod = importlib.import_module("command.pwnbox")
 season_mod = importlib.import_module("command.season")
 sherlock_mod = importlib.import_module("command.sherlock")
+challenge_mod = importlib.import_module("command.challenge")
 
 BadgeCommand = badge_mod.BadgeCommand
 CertificateCommand = certificate_mod.CertificateCommand
@@ -28,6 +36,7 @@ ProlabsCommand = prolabs_mod.ProlabsCommand
 PwnBoxCommand = pwnbox_mod.PwnBoxCommand
 SeasonCommand = season_mod.SeasonCommand
 SherlockCommand = sherlock_mod.SherlockCommand
+ChallengeCommand = challenge_mod.ChallengeCommand
 
 # Load Request-/PwnBox exceptions without executing htbapi/__init__.py
 try:
@@ -571,3 +580,333 @@ def test_pwnbox_execute_unknown_command_logs_error() -> None:
     PwnBoxCommand(htb_cli=cli, args=argparse.Namespace(pwnbox="unknown")).execute()
 
     assert any("unknown command" in msg.lower() for msg in cli.logger.errors)
+
+
+class BulkChallengeStub:
+    def __init__(self, challenge_id: int, name: str, content: bytes, fail: bool = False) -> None:
+        self.id = challenge_id
+        self.name = name
+        self.downloadable = True
+        self.download_sha256 = hashlib.sha256(content).hexdigest()
+        self.content = content
+        self.fail = fail
+        self.downloaded = False
+
+    def get_download_path(self, path: str) -> str:
+        return str(Path(path) / f"{self.name}.zip")
+
+    def download(self, path: str) -> str:
+        if self.fail:
+            raise RequestException(f"Could not download file for challenge {self.name}")
+        self.downloaded = True
+        Path(path).mkdir(parents=True, exist_ok=True)
+        Path(self.get_download_path(path)).write_bytes(self.content)
+        return self.get_download_path(path)
+
+
+def test_challenge_bulk_download_skips_present_files_and_reports_failures(tmp_path) -> None:
+    present = BulkChallengeStub(1, "Present", b"present")
+    missing = BulkChallengeStub(2, "Missing", b"missing")
+    broken = BulkChallengeStub(3, "Broken", b"broken", fail=True)
+    (tmp_path / "Present").mkdir()
+    (tmp_path / "Present" / "Present.zip").write_bytes(b"present")
+    list_calls = []
+
+    client = SimpleNamespace(
+        get_challenge_categories_list=lambda: [SimpleNamespace(id=1, name="Web")],
+        get_challenge_list=lambda **kwargs: list_calls.append(kwargs) or [SimpleNamespace(id=x.id, downloadable=True)
+                                                                          for x in (present, missing, broken)],
+        get_challenge_infos=lambda ids: {x.id: x for x in (present, missing, broken) if x.id in ids},
+    )
+    cli = CLIStub(client=client)
+    args = argparse.Namespace(challenge="bulk_download", category="Web", difficulty="Easy", todo=True,
+                              unsolved=False, solved=False, all=False, retired=False, active=False,
+                              path=str(tmp_path), unzip=False, workers=3)
+
+    ChallengeCommand(htb_cli=cli, args=args).execute()
+
+    assert list_calls == [{"retired": False, "unsolved": None, "filter_todo": True,
+                           "filter_category_list": [1], "filter_difficulty": "Easy"}]
+    assert not present.downloaded
+    assert (tmp_path / "Missing" / "Missing.zip").read_bytes() == b"missing"
+    assert "Downloaded: 1 | Skipped (already present): 1 | Failed: 1" in cli.logger.infos[-1]
+    assert "Broken" in cli.logger.errors[0]
+
+
+def test_shell_dispatches_lines_and_survives_errors(tmp_path, monkeypatch) -> None:
+    shell_mod = importlib.import_module("command.shell")
+
+    class ShellCLIStub(CLIStub):
+        package_name = "htb-operator"
+
+        def __init__(self) -> None:
+            super().__init__()
+            self.dispatched = []
+
+        def get_base_store_dir(self) -> str:
+            return str(tmp_path)
+
+        def dispatch(self, parser, args) -> None:
+            self.dispatched.append((args.command, getattr(args, "name", None), list(sys.argv[1:])))
+            if args.command == "boom":
+                raise ValueError("boom")
+
+    parser = argparse.ArgumentParser(prog="htb-operator")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("machine").add_argument("--name")
+    subparsers.add_parser("boom")
+    monkeypatch.setattr(sys, "argv", ["htb-operator", "shell"])
+
+    cli = ShellCLIStub()
+    cmd = shell_mod.ShellCommand(htb_cli=cli, args=argparse.Namespace(command="shell"))
+    cmd.parser = parser
+    for line in ['machine --name "Spooky Pass"', "htb-operator machine", "unknown", "shell", "boom", ""]:
+        cmd.run_line(line)
+
+    assert cli.dispatched == [("machine", "Spooky Pass", ["machine", "--name", "Spooky Pass"]),
+                              ("machine", None, ["machine"]),
+                              ("boom", None, ["boom"])]
+    assert sys.argv == ["htb-operator", "shell"]
+    assert cli.logger.warnings == ["\x1b[33mAlready running the shell.\x1b[0m"]
+    assert cli.logger.errors == ["\x1b[31mError: boom\x1b[0m"]
+
+
+def test_daemon_output_of_own_threads_is_not_captured() -> None:
+    daemon_mod = importlib.import_module("command.daemon")
+    original = io.StringIO()
+    router = daemon_mod._OutputRouter(original)
+    capture = io.StringIO()
+    router.capture = capture
+
+    def poller() -> None:
+        router.exclude_current_thread()
+        router.write("Polling the status failed\n")
+
+    thread = threading.Thread(target=poller)
+    thread.start()
+    thread.join()
+    router.write("Spooky 10.10.11.5\n")
+    router.capture = None
+    router.write("Daemon stopped.\n")
+
+    assert capture.getvalue() == "Spooky 10.10.11.5\n"
+    assert original.getvalue() == "Polling the status failed\nDaemon stopped.\n"
+
+
+def test_daemon_answers_queries_and_forwarded_commands(tmp_path, capsys) -> None:
+    daemon_mod = importlib.import_module("command.daemon")
+
+    class ActiveMachineStub:
+        def to_dict(self) -> dict:
+            return {"id": 1, "name": "Spooky", "ip": "10.10.11.5"}
+
+    class DaemonCLIStub(CLIStub):
+        package_name = "htb-operator"
+
+        def __init__(self) -> None:
+            super().__init__(client=SimpleNamespace(get_active_machine=lambda: ActiveMachineStub(),
+                                                    get_active_connections=lambda: []))
+            self.dispatched = []
+
+        def get_base_store_dir(self) -> str:
+            return str(tmp_path)
+
+        def dispatch(self, parser, args, interactive: bool = True) -> None:
+            self.dispatched.append((args.command, args.machine, interactive))
+            print("Spooky 10.10.11.5")
+
+    cli = DaemonCLIStub()
+    cmd = daemon_mod.DaemonCommand(htb_cli=cli, args=argparse.Namespace(command="daemon", daemon=None, poll_interval=60))
+    thread = threading.Thread(target=cmd.serve, daemon=True)
+    thread.start()
+    socket_path = tmp_path / "daemon.sock"
+    for _ in range(100):
+        if socket_path.exists() and cmd._state["updated_at"] is not None:
+            break
+        time.sleep(0.02)
+
+    try:
+        assert socket_path.stat().st_mode & 0o777 == 0o600
+        assert daemon_mod.request(str(tmp_path), {"type": "query", "name": "active_machine_ip"})["ip"] == "10.10.11.5"
+        assert "error" in daemon_mod.request(str(tmp_path), {"type": "command", "argv": ["machine", "start"]})
+        # Commands which are not read-only run in-process
+        assert not daemon_mod.forward_command(str(tmp_path), ["machine", "start", "--name", "Spooky"])
+        capsys.readouterr()
+        assert daemon_mod.forward_command(str(tmp_path), ["--debug", "machine", "status"])
+        assert capsys.readouterr().out == "Spooky 10.10.11.5\n"
+        assert cli.dispatched == [("machine", "status", False)]
+    finally:
+        assert daemon_mod.request(str(tmp_path), {"type": "stop"}) == {"status": "stopping"}
+        thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert not socket_path.exists()
+    # No daemon: the command is executed in-process
+    assert not daemon_mod.forward_command(str(tmp_path), ["machine", "status"])
+
+
+def test_vpn_benchmark_probes_known_hostnames_without_switching(tmp_path, monkeypatch) -> None:
+    vpn_mod = importlib.import_module("command.vpn")
+    from htbapi.vpn_probe import LatencyResult
+
+    class VpnServerStub:
+        def __init__(self, vpn_id: int, assigned: bool) -> None:
+            self.id = vpn_id
+            self.name = f"EU {vpn_id}"
+            self.is_assigned = assigned
+            self.switched = False
+
+        def switch(self):
+            self.switched = True
+            return self
+
+        def download(self) -> str:
+            path = tmp_path / f"{self.id}.ovpn"
+            path.write_text(f"client\nproto udp\nremote edge-{self.id}.hackthebox.eu 1337\n")
+            return str(path)
+
+        def to_dict(self) -> dict:
+            return {"id": self.id, "name": self.name, "product": "labs", "location": "EU", "current_clients": 3}
+
+    servers = {1: VpnServerStub(1, assigned=True), 2: VpnServerStub(2, assigned=False), 3: VpnServerStub(3, assigned=False)}
+    client = SimpleNamespace(get_accessible_vpn_server=lambda: {1: servers[1]},
+                             get_all_vpn_server=lambda products, vpn_location: servers,
+                             get_active_connections=lambda: [])
+    cli = CLIStub(client=client)
+    cli.get_base_store_dir = lambda: str(tmp_path)
+    vpn_mod.VpnHostStore(path=str(tmp_path / "cache" / "vpn_hosts.json")).update(vpn_id=2, hostname="edge-2.hackthebox.eu")
+
+    probed = {}
+
+    def probe_latencies(targets, samples):
+        probed.update(targets)
+        return {k: LatencyResult(samples=[ms], sent=1) for k, ms in zip(targets.keys(), [80.0, 20.0])}
+
+    monkeypatch.setattr(vpn_mod, "probe_latencies", probe_latencies)
+    args = argparse.Namespace(command="vpn", vpn="benchmark", starting_point=False, endgames=False, fortresses=False,
+                              release_arena=False, prolabs=False, labs=False, only_accessible=False, location=None,
+                              samples=None, port=None, resolve_hostnames=False)
+    vpn_mod.VpnCommand(htb_cli=cli, args=args).execute()
+
+    assert probed == {2: ("edge-2.hackthebox.eu", 443), 1: ("edge-1.hackthebox.eu", 443)}
+    assert not any(x.switched for x in servers.values())
+    assert "Skipping 1 VPN server(s)" in cli.logger.warnings[0]
+    assert len(cli.console.printed) == 1
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="The VPN feature is not supported on Windows")
+def test_vpn_start_downloads_a_rejected_stored_file_again(tmp_path, monkeypatch) -> None:
+    vpn_mod = importlib.import_module("command.vpn")
+    from htbapi.ovpn_cache import OvpnCache
+
+    # OpenVPN retries forever if the server rejects the certificate
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "openvpn").write_text('#!/bin/sh\n'
+                                     'if grep -q REVOKED "$2"; then echo "TLS Error: TLS handshake failed"; exec sleep 30; fi\n'
+                                     'echo "Initialization Sequence Completed"\n')
+    (bin_dir / "openvpn").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    ovpn_cache = OvpnCache(directory=str(tmp_path / "ovpn"), namespace="api-key")
+    ovpn_cache.put(vpn_id=1, tcp=False, data=b"client\nremote edge-1.hackthebox.eu 1337\n<cert>REVOKED</cert>\n")
+    downloads = []
+
+    def get_ovpn_file(tcp: bool) -> str:
+        path = ovpn_cache.get_path(vpn_id=1, tcp=tcp)
+        if path is None:
+            downloads.append(tcp)
+            path = ovpn_cache.put(vpn_id=1, tcp=tcp, data=b"client\nremote edge-1.hackthebox.eu 1337\n<cert>NEW</cert>\n")
+        return path
+
+    server = SimpleNamespace(id=1, name="EU 1", get_ovpn_file=get_ovpn_file)
+    client = SimpleNamespace(get_accessible_vpn_server=lambda: {1: server}, get_active_connections=lambda: [], ovpn_cache=ovpn_cache)
+    cli = CLIStub(client=client)
+    cli.get_base_store_dir = lambda: str(tmp_path)
+    cmd = vpn_mod.VpnCommand(htb_cli=cli, args=argparse.Namespace(command="vpn", vpn="status", id=1, tcp=False, interface="tun_test"))
+
+    cmd.start_vpn()
+
+    assert downloads == [False]
+    assert "rejected" in cli.logger.warnings[0]
+    assert any('OpenVPN started for server "EU 1"' in x for x in cli.logger.infos)
+
+
+def test_vpn_status_reads_counters_without_measuring(tmp_path, monkeypatch) -> None:
+    vpn_mod = importlib.import_module("command.vpn")
+    from htbapi.openvpn_management import VpnHealth
+
+    connection = SimpleNamespace(server_id=1, connection_ipv4="10.10.14.5", to_dict=lambda: {"server_id": 1})
+    client = SimpleNamespace(get_accessible_vpn_server=lambda: {1: SimpleNamespace(current_clients=7)},
+                             get_active_connections=lambda: [connection])
+    cli = CLIStub(client=client)
+    cli.get_base_store_dir = lambda: str(tmp_path)
+    (tmp_path / "openvpn").mkdir()
+    (tmp_path / "openvpn" / "tun_htb.sock").touch()
+
+    def collect_health(path, gateway):
+        raise AssertionError("vpn status must not measure")
+
+    tables = []
+    monkeypatch.setattr(vpn_mod, "collect_health", collect_health)
+    monkeypatch.setattr(vpn_mod, "read_health", lambda path: VpnHealth(state="CONNECTED", bytes_in=3 * 1024 * 1024, bytes_out=1024 * 1024,
+                                                                        rx_rate=None, tx_rate=None, latency=None, reconnects=1))
+    monkeypatch.setattr(vpn_mod, "create_table_active_vpn_connections", lambda vpn_connections: tables.append(vpn_connections))
+    monkeypatch.setattr(vpn_mod.VpnCommand, "get_interface_for_ip", lambda self, ip_address: "tun_htb")
+
+    cmd = vpn_mod.VpnCommand(htb_cli=cli, args=argparse.Namespace(command="vpn", vpn="status"))
+    cmd.execute()
+    assert tables[0][0]["vpn_state"] == "CONNECTED"
+    assert tables[0][0]["gateway_latency"] is None and tables[0][0]["rx_rate"] is None
+
+    # The last sample of a running "vpn monitor" is shown
+    cmd._write_sample(interface="tun_htb", health=VpnHealth(state="CONNECTED", bytes_in=0, bytes_out=0, rx_rate=2048.0, tx_rate=512.0,
+                                                            latency=None, reconnects=1), interval=10)
+    cmd.execute()
+    assert tables[1][0]["rx_rate"] == 2048.0
+    assert tables[1][0]["bytes_in"] == 3 * 1024 * 1024
+
+
+def test_vpn_auto_switches_only_above_threshold(tmp_path, monkeypatch) -> None:
+    vpn_mod = importlib.import_module("command.vpn")
+    from htbapi.vpn_probe import LatencyResult
+
+    def server(vpn_id: int, assigned: bool, clients: int, full: bool = False) -> SimpleNamespace:
+        return SimpleNamespace(id=vpn_id, name=f"EU {vpn_id}", is_assigned=assigned, full=full, current_clients=clients,
+                               to_dict=lambda: {"id": vpn_id, "name": f"EU {vpn_id}", "product": "labs", "location": "EU",
+                                                "current_clients": clients, "is_assigned": assigned})
+
+    servers = {1: server(1, assigned=True, clients=10), 2: server(2, assigned=False, clients=10), 3: server(3, assigned=False, clients=0, full=True)}
+    client = SimpleNamespace(get_accessible_vpn_server=lambda: {},
+                             get_all_vpn_server=lambda products, vpn_location: servers,
+                             get_active_connections=lambda: [])
+    host_store = vpn_mod.VpnHostStore(path=str(tmp_path / "cache" / "vpn_hosts.json"))
+    for vpn_id in servers.keys():
+        host_store.update(vpn_id=vpn_id, hostname=f"edge-{vpn_id}.hackthebox.eu")
+
+    latencies = {1: 120.0, 2: 30.0}
+    probed = []
+    monkeypatch.setattr(vpn_mod, "probe_latencies",
+                        lambda targets, samples: probed.append(set(targets.keys())) or {k: LatencyResult(samples=[latencies[k]], sent=1) for k in targets})
+    switched = []
+    monkeypatch.setattr(vpn_mod.VpnServerInfo, "switch_vpn_server",
+                        staticmethod(lambda vpn_id, _client: switched.append(vpn_id) or SimpleNamespace(name=f"EU {vpn_id}", current_clients=10)))
+
+    def run_auto() -> None:
+        cli = CLIStub(client=client)
+        cli.get_base_store_dir = lambda: str(tmp_path)
+        args = argparse.Namespace(command="vpn", vpn="auto", product="labs", location=None, threshold=None, samples=None,
+                                  port=None, start=False, tcp=False)
+        vpn_mod.VpnCommand(htb_cli=cli, args=args).execute()
+
+    run_auto()
+    # Full servers are no candidates
+    assert probed == [{1, 2}]
+    assert switched == [2]
+
+    # The remembered latency is blended in: 20ms gain in this run only counts partly
+    servers[1].is_assigned, servers[2].is_assigned = False, True
+    latencies.update({1: 10.0, 2: 30.0})
+    run_auto()
+    assert switched == [2]
+    assert host_store.get(1)["latency"] == pytest.approx(65.0, abs=0.1)
@@ -142,3 +142,72 @@ def test_info_command_activity_only(monkeypatch) -> None:
     cmd.execute()
 
     assert cli.console.printed == [sentinel]
+
+
+def test_info_command_fetches_progress_concurrently_and_logs_timings(monkeypatch) -> None:
+    import threading
+    import time
+
+    class DebugLoggerStub(LoggerStub):
+        def __init__(self) -> None:
+            super().__init__()
+            self.debugs = []
+
+        def debug(self, msg: str) -> None:
+            self.debugs.append(msg)
+
+    class FanOutClientStub(InfoClientStub):
+        def __init__(self) -> None:
+            super().__init__()
+            self.running = 0
+            self.max_running = 0
+            self.lock = threading.Lock()
+
+        def _progress(self) -> list:
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.05)
+            with self.lock:
+                self.running -= 1
+            return []
+
+        def get_user_activity(self, user_id: int, limit_activity_entries=None):
+            assert limit_activity_entries == 20
+            return self._progress() + ["activity"]
+
+        def get_fortress_progress_profile_summary(self, user_id: int):
+            return self._progress()
+
+        def get_prolab_progress_profile_summary(self, user_id: int):
+            return self._progress()
+
+        def get_sherlock_progress_profile_summary(self, user_id: int):
+            return self._progress()
+
+        def get_machine_progress_profile_summary(self, user_id: int):
+            return self._progress()
+
+        def get_challenge_progress_profile_summary(self, user_id: int):
+            return self._progress()
+
+        def load_user_details(self, users, badges=True, experience=True):
+            assert users == [self.user] and not badges
+            self._progress()
+
+    cli = CLIStub()
+    cli.logger = DebugLoggerStub()
+    cli.client = FanOutClientStub()
+    args = argparse.Namespace(activity=False, username=None, debug=True)
+
+    for name in ["create_profile_panel", "create_ranking_panel", "create_level_panel", "create_misc_panel"]:
+        monkeypatch.setattr(info_mod, name, lambda **_: "panel")
+    monkeypatch.setattr(info_mod, "create_advanced_labs_panel", lambda **_: "panel")
+    monkeypatch.setattr(info_mod, "create_activity_panel", lambda activity_list: activity_list)
+
+    InfoCommand(htb_cli=cli, args=args).execute()
+
+    assert cli.client.max_running == 7
+    assert cli.console.printed[-1] == ["activity"]
+    assert len(cli.logger.debugs) == 1
+    assert "challenges=" in cli.logger.debugs[0]
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import htb_completion
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="htb-operator")
+    parser.add_argument("--debug", action="store_true")
+    subparsers = parser.add_subparsers(dest="command")
+    machine_sub = subparsers.add_parser("machine").add_subparsers(dest="machine")
+    machine_start = machine_sub.add_parser("start")
+    machine_start.add_argument("--name", type=str)
+    machine_start.add_argument("--id", type=int)
+    machine_start.add_argument("--start-vpn", action="store_true")
+    machine_sub.add_parser("stop")
+    challenge_download = subparsers.add_parser("challenge").add_subparsers(dest="challenge").add_parser("download")
+    challenge_download.add_argument("--name", type=str)
+    challenge_download.add_argument("-d", "--path", type=str)
+    return parser
+
+
+def write_test_index(index_dir: Path) -> None:
+    htb_completion.write_index(str(index_dir),
+                               tree=htb_completion.parser_to_tree(build_parser()),
+                               names={"machine": [(1, "Lame"), (2, "Legacy"), (3, "Blue")],
+                                      "challenge": [(10, "Spooky Pass"), (11, "Spookifier")]})
+
+
+def test_commands_and_options_are_completed(tmp_path) -> None:
+    write_test_index(tmp_path)
+
+    assert htb_completion.complete(["htb-operator", "ma"], str(tmp_path)) == ["machine"]
+    assert htb_completion.complete(["htb-operator", "machine", ""], str(tmp_path)) == ["start", "stop"]
+    assert htb_completion.complete(["htb-operator", "machine", "start", "--s"], str(tmp_path)) == ["--start-vpn"]
+
+
+def test_names_and_ids_are_completed_from_index(tmp_path) -> None:
+    write_test_index(tmp_path)
+
+    assert htb_completion.complete(["htb-operator", "machine", "start", "--name", "l"], str(tmp_path)) == ["Lame", "Legacy"]
+    assert htb_completion.complete(["htb-operator", "machine", "start", "--id", "2"], str(tmp_path)) == ["2"]
+    assert htb_completion.complete(["htb-operator", "machine", "start", "--id", "2"], str(tmp_path), shell="fish") == ["2\tLegacy"]
+    # Names with spaces are escaped for bash. Without a prefix match, names containing the word are offered.
+    assert htb_completion.complete(["htb-operator", "challenge", "download", "--name", "spook"], str(tmp_path)) == ["Spookifier", "Spooky\\ Pass"]
+    assert htb_completion.complete(["htb-operator", "challenge", "download", "--name", "pass"], str(tmp_path), shell="zsh") == ["Spooky Pass"]
+    # Other values (e.g. a path) are completed by the shell
+    assert htb_completion.complete(["htb-operator", "challenge", "download", "--path", ""], str(tmp_path)) == []
+
+
+def test_missing_or_outdated_index(tmp_path) -> None:
+    assert htb_completion.complete(["htb-operator", ""], str(tmp_path)) == []
+    assert htb_completion.is_stale(str(tmp_path), ttl=3600)
+
+    htb_completion.write_index(str(tmp_path), names={kind: [(1, "x")] for kind in htb_completion.KINDS})
+    assert not htb_completion.is_stale(str(tmp_path), ttl=3600)
+    old = os.path.getmtime(tmp_path / "vpn.txt") - 7200
+    os.utime(tmp_path / "vpn.txt", (old, old))
+    assert htb_completion.is_stale(str(tmp_path), ttl=3600)
+
+
+def test_completion_does_not_import_api_client(tmp_path) -> None:
+    write_test_index(tmp_path / "cache" / "completion")
+    code = ("import sys, htb_completion; htb_completion.main(['--shell', 'bash', '--', 'htb-operator', 'machine', 'start', '--name', 'B']); "
+            "print(sorted(x for x in ('httpx', 'htbapi', 'rich') if x in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code],
+                            cwd=str(Path(__file__).resolve().parents[1]),
+                            env=dict(os.environ, HTB_TERMINAL_STORE_DIR=str(tmp_path)),
+                            capture_output=True, text=True, check=True)
+
+    assert result.stdout.splitlines() == ["Blue", "[]"]
@@ -204,6 +204,31 @@ def test_create_table_active_vpn_connections_contains_values() -> None:
     assert "tun0" in text
 
 
+def test_create_table_active_vpn_connections_shows_health() -> None:
+    row = {
+        "type": "VIP",
+        "name": "EU-1",
+        "server_id": 5,
+        "server_hostname": "host.htb",
+        "server_port": 1337,
+        "server_name": "EU #1",
+        "connection_through_pwnbox": False,
+        "connection_ipv4": "10.10.14.5",
+        "connection_ipv6": "::1",
+        "interface": "tun0",
+        "current_clients": 42,
+        "gateway_latency": 23.4,
+        "gateway_loss": 0.0,
+        "rx_rate": 2048.0,
+        "tx_rate": 512.0,
+        "reconnects": 2,
+    }
+    table = table_mod.create_table_active_vpn_connections([row])
+    text = _render_text(table)
+    assert "23.4ms" in text
+    assert "2.0 / 0.5 KB/s" in text
+
+
 def test_create_benchmark_table_renders_hostname_and_title() -> None:
     data = [
         {
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import importlib
+import sys
+import types
+import zipfile
+from pathlib import Path
+
+# Prevent executing command/__init__.py (side effects) by registering a dummy package
+if "command" not in sys.modules:
+    pkg = types.ModuleType("command")
+    pkg.__path__ = [str(Path(__file__).resolve().parents[1] / "command")]
+    sys.modules["command"] = pkg
+
+extractor_mod = importlib.import_module("command.extractor")
+ArchiveExtractor = extractor_mod.ArchiveExtractor
+
+
+def make_zip(path: Path, files: dict) -> None:
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("challenge/", "")
+        for name, data in files.items():
+            archive.writestr(name, data)
+
+
+def test_extractor_writes_small_and_large_files(tmp_path) -> None:
+    files = {f"challenge/logs/{i}.txt": f"line {i}".encode() for i in range(50)}
+    files["challenge/disk.img"] = b"\x00\x01" * 100_000
+    make_zip(tmp_path / "challenge.zip", files)
+
+    result = ArchiveExtractor(max_workers=3, small_file_size=1024).extract(path=str(tmp_path / "challenge.zip"),
+                                                                           target_dir=str(tmp_path / "out"))
+
+    for name, data in files.items():
+        assert (tmp_path / "out" / name).read_bytes() == data
+    assert result.files == 51
+    assert result.bytes == sum(len(x) for x in files.values())
+    assert result.skipped == 0
+    assert result.throughput > 0
+
+
+def test_extractor_skips_entries_outside_target_dir(tmp_path) -> None:
+    make_zip(tmp_path / "evil.zip", {"../evil.txt": b"evil", "challenge/ok.txt": b"ok"})
+
+    result = ArchiveExtractor().extract(path=str(tmp_path / "evil.zip"), target_dir=str(tmp_path / "out"))
+
+    assert (tmp_path / "out" / "challenge" / "ok.txt").read_bytes() == b"ok"
+    assert not (tmp_path / "evil.txt").exists()
+    assert result.files == 1
+    assert result.skipped == 1
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import stat
+
+import httpx
+import pytest
+
+from htbapi.exception.errors import HashMismatchException, RequestException
+from htbapi.htb_http_request import HtbHtbHttpRequest, _write_file
+
+
+def make_request(handler) -> HtbHtbHttpRequest:
+    req = HtbHtbHttpRequest(app_token="token", api_base="https://labs.example/api/", user_agent="test")
+    req._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return req
+
+
+def test_download_streams_to_file_and_returns_sha256(tmp_path) -> None:
+    chunks = [b"A" * 65536, b"B" * 65536, b"C"]
+    req = make_request(lambda request: httpx.Response(200, stream=httpx.ByteStream(b"".join(chunks))))
+
+    file_hash = req.download(path=str(tmp_path / "challenge.zip"), endpoint="challenge/download/1")
+
+    assert (tmp_path / "challenge.zip").read_bytes() == b"".join(chunks)
+    assert file_hash == hashlib.sha256(b"".join(chunks)).hexdigest()
+    assert [x.name for x in tmp_path.iterdir()] == ["challenge.zip"]
+
+
+def test_written_files_keep_default_permissions(tmp_path) -> None:
+    umask = os.umask(0o022)
+    os.umask(umask)
+
+    _write_file(path=str(tmp_path / "challenge.zip"), chunks=[b"DATA"])
+
+    assert stat.S_IMODE(os.stat(tmp_path / "challenge.zip").st_mode) == 0o666 & ~umask
+
+
+def test_download_hash_mismatch_keeps_existing_file(tmp_path) -> None:
+    (tmp_path / "writeup.pdf").write_bytes(b"OLD")
+    req = make_request(lambda request: httpx.Response(200, content=b"NEW"))
+
+    with pytest.raises(HashMismatchException):
+        req.download(path=str(tmp_path / "writeup.pdf"), custom_url="https://example.invalid/writeup", expected_sha256="deadbeef")
+
+    assert (tmp_path / "writeup.pdf").read_bytes() == b"OLD"
+    assert [x.name for x in tmp_path.iterdir()] == ["writeup.pdf"]
+
+
+def test_download_error_raises_request_exception(tmp_path) -> None:
+    req = make_request(lambda request: httpx.Response(404, json={"message": "Not Found"}))
+
+    with pytest.raises(RequestException, match="Not Found"):
+        req.download(path=str(tmp_path / "challenge.zip"), endpoint="challenge/download/1")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+class FlakyStream(httpx.SyncByteStream):
+    """Yields the data and drops the connection after `fail_after` bytes."""
+
+    def __init__(self, data: bytes, fail_after: int | None = None) -> None:
+        self.data = data
+        self.fail_after = fail_after
+
+    def __iter__(self):
+        if self.fail_after is None:
+            yield self.data
+            return
+        yield self.data[:self.fail_after]
+        raise httpx.ReadError("connection reset")
+
+
+def make_range_handler(data: bytes, requests: list, fail_after: int | None = None, etag: str = '"v1"'):
+    """Serves `data` with support for Range requests. The first full response drops after `fail_after` bytes."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        range_header = request.headers.get("Range")
+        if range_header is None or request.headers.get("If-Range", etag) != etag:
+            stream = FlakyStream(data, fail_after if len(requests) == 1 else None)
+            return httpx.Response(200, headers={"ETag": etag, "Accept-Ranges": "bytes"}, stream=stream)
+
+        start, _, end = range_header.removeprefix("bytes=").partition("-")
+        end = int(end) if end else len(data) - 1
+        return httpx.Response(206,
+                              headers={"ETag": etag, "Content-Range": f"bytes {start}-{end}/{len(data)}"},
+                              content=data[int(start):end + 1])
+
+    return handler
+
+
+def test_download_resumes_interrupted_transfer_with_range(tmp_path) -> None:
+    data = bytes(range(256)) * 100
+    requests = []
+    req = make_request(make_range_handler(data, requests, fail_after=1000))
+
+    file_hash = req.download(path=str(tmp_path / "challenge.zip"),
+                             endpoint="challenge/download/1",
+                             expected_sha256=hashlib.sha256(data).hexdigest())
+
+    assert (tmp_path / "challenge.zip").read_bytes() == data
+    assert file_hash == hashlib.sha256(data).hexdigest()
+    assert requests[1].headers["Range"] == "bytes=1000-"
+    assert requests[1].headers["If-Range"] == '"v1"'
+    assert [x.name for x in tmp_path.iterdir()] == ["challenge.zip"]
+
+
+def test_download_resumes_partial_file_of_previous_run(tmp_path) -> None:
+    data = b"0123456789" * 10
+    url = "https://labs.example/api/v4/challenge/download/1"
+    (tmp_path / "challenge.zip.part").write_bytes(data[:40])
+    (tmp_path / "challenge.zip.part.json").write_text(
+        f'{{"url": "{url}", "validator": "\\"v1\\"", "size": null, "ranges": [[0, null, 40]]}}')
+    requests = []
+    req = make_request(make_range_handler(data, requests))
+
+    file_hash = req.download(path=str(tmp_path / "challenge.zip"), endpoint="challenge/download/1")
+
+    assert (tmp_path / "challenge.zip").read_bytes() == data
+    assert file_hash == hashlib.sha256(data).hexdigest()
+    assert [r.headers["Range"] for r in requests] == ["bytes=40-"]
+
+
+def test_download_restarts_when_file_changed(tmp_path) -> None:
+    data = b"new content" * 10
+    url = "https://labs.example/api/v4/challenge/download/1"
+    (tmp_path / "challenge.zip.part").write_bytes(b"old")
+    (tmp_path / "challenge.zip.part.json").write_text(
+        f'{{"url": "{url}", "validator": "\\"v0\\"", "size": null, "ranges": [[0, null, 3]]}}')
+    requests = []
+    req = make_request(make_range_handler(data, requests))
+
+    req.download(path=str(tmp_path / "challenge.zip"), endpoint="challenge/download/1")
+
+    # If-Range does not match, so the server sends the whole (new) file
+    assert (tmp_path / "challenge.zip").read_bytes() == data
+    assert len(requests) == 1
+
+
+def test_download_fetches_segments_concurrently(tmp_path) -> None:
+    data = bytes(range(256)) * 40
+    requests = []
+    req = make_request(make_range_handler(data, requests))
+
+    file_hash = req.download(path=str(tmp_path / "challenge.zip"), endpoint="challenge/download/1", segments=4)
+
+    assert (tmp_path / "challenge.zip").read_bytes() == data
+    assert file_hash == hashlib.sha256(data).hexdigest()
+    assert requests[0].headers["Range"] == "bytes=0-0"
+    assert sorted(r.headers["Range"] for r in requests[1:]) == ["bytes=0-2559", "bytes=2560-5119",
+                                                                 "bytes=5120-7679", "bytes=7680-10239"]
+    assert [x.name for x in tmp_path.iterdir()] == ["challenge.zip"]
+
+
+def test_download_segments_fall_back_without_range_support(tmp_path) -> None:
+    data = b"no ranges" * 10
+    req = make_request(lambda request: httpx.Response(200, content=data))
+
+    file_hash = req.download(path=str(tmp_path / "challenge.zip"), endpoint="challenge/download/1", segments=4)
+
+    assert (tmp_path / "challenge.zip").read_bytes() == data
+    assert file_hash == hashlib.sha256(data).hexdigest()
+
+
+def test_download_restarts_once_sequentially_if_segments_are_not_served_as_ranges(tmp_path) -> None:
+    data = b"proxy" * 100
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("Range") == "bytes=0-0":
+            return httpx.Response(206, content=data[:1], headers={"Content-Range": f"bytes 0-0/{len(data)}"})
+        return httpx.Response(200, content=data)
+
+    req = make_request(handler)
+    file_hash = req.download(path=str(tmp_path / "challenge.zip"), endpoint="challenge/download/1", segments=4)
+
+    assert (tmp_path / "challenge.zip").read_bytes() == data
+    assert file_hash == hashlib.sha256(data).hexdigest()
+    assert [r.headers.get("Range") for r in requests].count("bytes=0-0") == 1
+    assert "Range" not in requests[-1].headers
+    assert len(requests) <= 1 + 4 + 1
+
+
+def test_client_with_proxy_is_built_once_with_headers(monkeypatch) -> None:
+    built = []
+    original_build_client = HtbHtbHttpRequest._build_client
+
+    def build_client(self):
+        built.append(dict(self._http_headers))
+        return original_build_client(self)
+
+    monkeypatch.setattr(HtbHtbHttpRequest, "_build_client", build_client)
+    req = HtbHtbHttpRequest(app_token="token", api_base="https://labs.example/api/", user_agent="test",
+                            proxy={"http": "http://127.0.0.1:8080", "https": "http://127.0.0.1:8080"}, verify_ssl=False)
+
+    assert len(built) == 1
+    assert built[0]["Authorization"] == "Bearer token"
+    assert req._client.headers["Authorization"] == "Bearer token"
+    assert req._proxies["https"] == "http://127.0.0.1:8080"
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+import httpx
+
+from htbapi.htb_http_request import HtbHtbHttpRequest
+from htbapi.http_cache import HttpCache
+
+
+def make_request(cache: HttpCache, responses: dict, calls: list) -> HtbHtbHttpRequest:
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append((request.method, request.url.path))
+        response = responses[request.url.path]
+        return response(request) if callable(response) else httpx.Response(200, json=response)
+
+    req = HtbHtbHttpRequest(app_token="token", api_base="https://labs.example/api/", user_agent="test", cache=cache)
+    req._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return req
+
+
+def test_http_cache_serves_catalog_from_disk(tmp_path) -> None:
+    calls = []
+    cache = HttpCache(directory=str(tmp_path), namespace="token")
+    req = make_request(cache, {"/api/v4/challenge/list": {"challenges": [{"id": 1}]}}, calls)
+
+    assert req.get_request("challenge/list") == {"challenges": [{"id": 1}]}
+    # A new request object (i.e. a new CLI process) reuses the persisted response
+    req = make_request(HttpCache(directory=str(tmp_path), namespace="token"), {}, calls)
+    assert req.get_request("challenge/list") == {"challenges": [{"id": 1}]}
+    assert calls == [("GET", "/api/v4/challenge/list")]
+
+
+def test_http_cache_skips_user_state_endpoints(tmp_path) -> None:
+    calls = []
+    cache = HttpCache(directory=str(tmp_path), namespace="token")
+    req = make_request(cache, {"/api/v4/machine/active": {"info": None}}, calls)
+
+    req.get_request("machine/active")
+    req.get_request("machine/active")
+
+    assert len(calls) == 2
+    assert not any(files for _, _, files in os.walk(tmp_path))
+
+
+def test_http_cache_refresh_and_disabled(tmp_path) -> None:
+    calls = []
+    cache = HttpCache(directory=str(tmp_path), namespace="token")
+    req = make_request(cache, {"/api/v4/season/list": {"data": []}}, calls)
+    req.get_request("season/list")
+
+    cache.refresh = True
+    req.get_request("season/list")
+    cache.refresh = False
+    cache.enabled = False
+    req.get_request("season/list")
+    cache.enabled = True
+    req.get_request("season/list")
+
+    assert len(calls) == 3
+
+
+def test_http_cache_expires_and_is_separated_by_namespace(tmp_path, monkeypatch) -> None:
+    cache = HttpCache(directory=str(tmp_path), namespace="token", ttl_rules=[(r"^badges$", 10)])
+    cache.put(endpoint="badges", url="https://labs.example/api/v4/badges", body={"badges": []})
+
+    assert cache.get(endpoint="badges", url="https://labs.example/api/v4/badges") == {"badges": []}
+    assert HttpCache(directory=str(tmp_path), namespace="other").get(endpoint="badges",
+                                                                     url="https://labs.example/api/v4/badges") is None
+
+    now = time.time()
+    monkeypatch.setattr("htbapi.http_cache.time.time", lambda: now + 11)
+    assert cache.get(endpoint="badges", url="https://labs.example/api/v4/badges") is None
+
+
+def test_http_cache_post_clears_namespace(tmp_path) -> None:
+    calls = []
+    cache = HttpCache(directory=str(tmp_path), namespace="token")
+    req = make_request(cache, {"/api/v4/badges": {"badges": []},
+                               "/api/v4/machine/own": {"message": "ok"}}, calls)
+    req.get_request("badges")
+    req.post_request("machine/own", json={"flag": "x"})
+    req.get_request("badges")
+
+    assert calls.count(("GET", "/api/v4/badges")) == 2
+
+
+def test_http_cache_evicts_least_recently_used(tmp_path) -> None:
+    cache = HttpCache(directory=str(tmp_path), namespace="token", max_size=600)
+    for i in range(3):
+        cache.put(endpoint="badges", url=f"https://labs.example/api/v4/badges?{i}", body={"data": "x" * 200})
+        path = cache._get_path(f"https://labs.example/api/v4/badges?{i}")
+        if os.path.exists(path):
+            os.utime(path, (i, i))
+
+    assert cache.get(endpoint="badges", url="https://labs.example/api/v4/badges?0") is None
+    assert cache.get(endpoint="badges", url="https://labs.example/api/v4/badges?2") is not None
+
+
+def test_http_cache_revalidates_stale_entry_with_etag(tmp_path, monkeypatch) -> None:
+    calls = []
+    seen_headers = []
+
+    def challenges(request: httpx.Request) -> httpx.Response:
+        seen_headers.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"challenges": [{"id": 1}]}, headers={"ETag": '"v1"'})
+
+    cache = HttpCache(directory=str(tmp_path), namespace="token")
+    req = make_request(cache, {"/api/v4/challenge/list/retired": challenges}, calls)
+    assert req.get_request("challenge/list/retired") == {"challenges": [{"id": 1}]}
+
+    now = time.time()
+    monkeypatch.setattr("htbapi.http_cache.time.time", lambda: now + 2 * 60 * 60)
+    assert req.get_request("challenge/list/retired") == {"challenges": [{"id": 1}]}
+    # The 304 renewed the TTL, so the third call is a fresh hit
+    assert req.get_request("challenge/list/retired") == {"challenges": [{"id": 1}]}
+
+    assert seen_headers == [None, '"v1"']
+    assert cache.get_stats()["misses"] == 1
+    assert cache.get_stats()["revalidations"] == 1
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_http_cache_revalidates_with_last_modified(tmp_path) -> None:
+    cache = HttpCache(directory=str(tmp_path), namespace="token")
+    url = "https://labs.example/api/v4/badges"
+    cache.put(endpoint="badges", url=url, body={"badges": []}, last_modified="Wed, 21 Oct 2026 07:28:00 GMT")
+
+    assert cache.get_validators(endpoint="badges", url=url) == {"If-Modified-Since": "Wed, 21 Oct 2026 07:28:00 GMT"}
+    assert cache.get_validators(endpoint="machine/active", url=url) == {}
+    assert cache.revalidate(endpoint="badges", url=url) == {"badges": []}
+    cache.clear()
+    assert cache.revalidate(endpoint="badges", url=url) is None
+    # Statistics survive clearing the entries
+    assert cache.get_stats()["revalidations"] == 1
+
+
+def test_http_cache_stats_are_counted_in_memory_and_written_on_close(tmp_path) -> None:
+    cache = HttpCache(directory=str(tmp_path), namespace="token")
+    url = "https://labs.example/api/v4/badges"
+    cache.put(endpoint="badges", url=url, body={"badges": []})
+
+    threads = [threading.Thread(target=lambda: [cache.get(endpoint="badges", url=url) for _ in range(50)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not os.path.exists(tmp_path / "stats.json")
+    assert cache.get_stats()["hits"] == 200
+
+    cache.close()
+    cache.close()
+    other = HttpCache(directory=str(tmp_path), namespace="token")
+    assert other.get_stats()["hits"] == 200
+    assert other.get_stats()["misses"] == 1
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import httpx
+import pytest
+
+from htbapi.exception.errors import RequestException
+from htbapi.htb_http_request import HtbHtbHttpRequest
+from htbapi.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake_clock = FakeClock()
+    monkeypatch.setattr("htbapi.rate_limiter.time.monotonic", fake_clock.monotonic)
+    monkeypatch.setattr("htbapi.rate_limiter.time.sleep", fake_clock.sleep)
+    monkeypatch.setattr("htbapi.rate_limiter.random.uniform", lambda a, b: 0.0)
+    return fake_clock
+
+
+def make_request(responses: list, limiter: RateLimiter) -> HtbHtbHttpRequest:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return responses.pop(0)
+
+    req = HtbHtbHttpRequest(app_token="token", api_base="https://labs.example/api/", user_agent="test", rate_limiter=limiter)
+    req._client = httpx.Client(transport=httpx.MockTransport(handler))
+    return req
+
+
+def test_rate_limiter_allows_burst_then_spaces_requests(clock) -> None:
+    limiter = RateLimiter(rate=2, burst=2)
+
+    delays = [limiter.reserve() for _ in range(4)]
+
+    assert delays == [0.0, 0.0, 0.5, 1.0]
+
+
+def test_rate_limiter_learns_rate_from_headers(clock) -> None:
+    limiter = RateLimiter(rate=10, burst=5)
+
+    limiter.update(200, {"X-RateLimit-Limit": "60", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "3"})
+
+    assert limiter.rate == 1.0
+    assert limiter.reserve() == pytest.approx(3.0)
+    assert limiter.reserve() == pytest.approx(4.0)
+
+
+def test_rate_limited_request_honors_retry_after(clock) -> None:
+    limiter = RateLimiter(rate=10, burst=10)
+    req = make_request([httpx.Response(429, headers={"Retry-After": "7"}),
+                        httpx.Response(200, json={"data": []})], limiter)
+
+    assert req.get_request("season/list") == {"data": []}
+    assert clock.sleeps == [7.0]
+    assert limiter.rate == pytest.approx(5.1)
+
+
+def test_rate_limited_request_backs_off_exponentially_and_gives_up(clock) -> None:
+    limiter = RateLimiter(rate=10, burst=10, max_retries=3)
+    req = make_request([httpx.Response(429) for _ in range(4)], limiter)
+
+    with pytest.raises(RequestException, match="Rate limit"):
+        req.post_request("machine/own", json={"flag": "x"})
+
+    # Equal jitter: half of the backoff plus up to the other half (patched to 0)
+    assert clock.sleeps == [0.5, 1.0, 2.0]
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+# Dependencies only needed by single commands. They must not be imported before the command is dispatched.
+HEAVY_MODULES = ("paramiko", "psutil", "python_hosts", "libarchive", "tqdm", "requests", "PIL", "bs4",
+                 "command.machine", "command.challenge", "command.vpn", "console.cli_panel", "console.cli_table")
+# Budget of the import time of the CLI as a multiple of the import time of the API client (htbapi, mostly httpx) in the
+# same run, so that it does not depend on the speed of the machine. It is about 2 at the moment.
+IMPORT_TIME_BUDGET = 3.0
+
+
+def run_python(code: str, tmp_path) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=str(ROOT),
+                          env=dict(os.environ, HTB_TERMINAL_STORE_DIR=str(tmp_path)),
+                          capture_output=True, text=True)
+
+
+def imported_modules(importtime_output: str) -> dict[str, int]:
+    """Module -> cumulative import time in microseconds, parsed from the output of `python -X importtime`"""
+    modules = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative.strip())
+    return modules
+
+
+def test_startup_imports_only_the_dispatched_command(tmp_path) -> None:
+    code = ("import sys, types, htb_operator; "
+            "parser = htb_operator.create_arg_parser(types.SimpleNamespace(package_name='htb-operator')); "
+            "args = parser.parse_args(['machine', 'list']); "
+            f"print(','.join(x for x in {HEAVY_MODULES!r} if x in sys.modules)); "
+            "print(args.func.load().__name__); "
+            "print('command.machine' in sys.modules)")
+    result = run_python(code, tmp_path)
+    if result.returncode != 0 and "ModuleNotFoundError" in result.stderr:
+        pytest.skip(f"Dependencies of the CLI are not installed: {result.stderr.splitlines()[-1]}")
+
+    modules = imported_modules(result.stderr)
+    ratio = modules["htb_operator"] / modules["htbapi"]
+    print(f"Import time of htb_operator: {modules['htb_operator'] / 1000:.1f} ms ({ratio:.1f}x htbapi)")
+    assert ratio <= IMPORT_TIME_BUDGET, f"Import of htb_operator takes {ratio:.1f}x the import of htbapi (budget: {IMPORT_TIME_BUDGET}x)"
+
+    # Nothing heavy is imported for parsing the arguments, the command module only when it is dispatched
+    assert result.stdout.splitlines() == ["", "MachineCommand", "True"]
@@ -1,9 +1,16 @@
 from __future__ import annotations
 
+import os
+import socket
+import threading
+
 import pytest
 
 from htbapi.exception.errors import CannotSwitchWithActive, RequestException
 from htbapi.vpn import VpnServerInfo, BaseVpnServer
+from htbapi.openvpn_management import OpenVpnManagement, collect_health
+from htbapi.exception.errors import VpnException
+from htbapi.vpn_probe import parse_remote, percentile, probe_latencies, VpnHostStore, LatencyResult
 
 
 def vpn_server_data(server_id: int = 10, assigned: bool = False) -> dict:
@@ -74,3 +81,163 @@ def test_vpn_download_ovpn_file_static_helper(client, stub_http, tmp_path) -> No
 
     assert (tmp_path / "x.ovpn").read_bytes() == b"DATA"
     assert output_path.endswith("x.ovpn")
+
+
+def test_parse_remote_and_percentile() -> None:
+    ovpn = "client\ndev tun\nproto udp\nremote edge-eu-free-1.hackthebox.eu 1337\nresolv-retry infinite\n"
+    assert parse_remote(ovpn) == ("edge-eu-free-1.hackthebox.eu", 1337, "udp")
+    assert parse_remote("client\nremote edge-us-vip-2.hackthebox.eu 443 tcp\n") == ("edge-us-vip-2.hackthebox.eu", 443, "tcp")
+    assert parse_remote("client\n") is None
+
+    assert percentile([], 50) is None
+    assert percentile([30.0, 10.0, 20.0], 50) == 20.0
+    assert percentile([10.0, 20.0], 90) == pytest.approx(19.0)
+
+
+def test_probe_latencies_measures_all_hosts_concurrently() -> None:
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(16)
+    open_port = listener.getsockname()[1]
+    # A closed port answers with RST, which is a round-trip as well
+    closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    closed.bind(("127.0.0.1", 0))
+    closed_port = closed.getsockname()[1]
+    closed.close()
+
+    try:
+        results = probe_latencies(targets={1: ("127.0.0.1", open_port),
+                                           2: ("127.0.0.1", closed_port),
+                                           3: ("unknown-host.invalid", 443)},
+                                  samples=3, timeout=1.0)
+    finally:
+        listener.close()
+
+    assert len(results[1].samples) == 3 and results[1].loss == 0.0
+    assert len(results[2].samples) == 3
+    assert results[3].samples == [] and results[3].loss == 1.0
+    assert results[3].to_dict() == {"latency": None, "latency_p90": None, "loss": 1.0}
+
+
+def test_vpn_host_store_keeps_learned_hostnames(tmp_path) -> None:
+    store = VpnHostStore(path=str(tmp_path / "cache" / "vpn_hosts.json"))
+    assert store.get_all() == {}
+
+    store.update(vpn_id=5, hostname="edge-eu-free-1.hackthebox.eu", port=1337, proto="udp")
+    store.update(vpn_id=5, hostname="edge-eu-free-1.hackthebox.eu")
+    assert VpnHostStore(path=store.path).get_all() == {5: {"hostname": "edge-eu-free-1.hackthebox.eu", "port": 1337, "proto": "udp"}}
+
+
+def serve_management(path: str, bytes_in: list[int]) -> threading.Thread:
+    """Fake OpenVPN management interface answering like OpenVPN 2.6, one client at a time"""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    answers = {
+        "state": "1700000100,CONNECTED,SUCCESS,10.10.14.5,1.2.3.4,1337,,\r\nEND\r\n",
+        "state all": "1700000000,CONNECTED,SUCCESS,10.10.14.5,1.2.3.4,1337,,\r\n"
+                     "1700000050,RECONNECTING,ping-restart,,,,,\r\n"
+                     "1700000100,CONNECTED,SUCCESS,10.10.14.5,1.2.3.4,1337,,\r\nEND\r\n",
+        "signal SIGUSR1": "SUCCESS: signal SIGUSR1 thrown\r\n",
+    }
+
+    def run():
+        for _ in range(len(bytes_in) + 1):
+            conn, _ = server.accept()
+            f = conn.makefile("rwb")
+            f.write(b">INFO:OpenVPN Management Interface Version 5 -- type 'help' for more info\r\n")
+            f.flush()
+            for command in f:
+                command = command.decode().strip()
+                if command == "load-stats":
+                    answer = f"SUCCESS: nclients=0,bytesin={bytes_in.pop(0)},bytesout=1000\r\n"
+                else:
+                    # Real-time notifications may come before the answer
+                    answer = ">BYTECOUNT:1,2\r\n" + answers.get(command, f"ERROR: unknown command [{command}]\r\n")
+                f.write(answer.encode())
+                f.flush()
+            conn.close()
+        server.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_collect_health_through_the_management_interface(tmp_path) -> None:
+    path = str(tmp_path / "tun_htb.sock")
+    thread = serve_management(path, bytes_in=[10_000, 30_000])
+
+    health = collect_health(path=path, gateway=None)
+    assert health.state == "CONNECTED"
+    assert health.reconnects == 1
+    assert (health.bytes_in, health.bytes_out) == (30_000, 1000)
+    assert health.rx_rate > 0 and health.tx_rate == 0
+    # Without a latency measurement the connection is not judged
+    assert not health.is_degraded(max_latency=300)
+    # No answer from the gateway: degraded only if no data has been received since the previous sample
+    health.latency = LatencyResult(samples=[], sent=3)
+    assert not health.is_degraded(max_latency=300, previous_bytes_in=10_000)
+    assert health.is_degraded(max_latency=300, previous_bytes_in=30_000)
+    health.latency = LatencyResult(samples=[350.0], sent=1)
+    assert health.is_degraded(max_latency=300, previous_bytes_in=10_000)
+
+    with OpenVpnManagement(path) as management:
+        management.restart()
+        with pytest.raises(VpnException):
+            management.stop()
+    thread.join(timeout=2)
+
+    with pytest.raises(VpnException):
+        with OpenVpnManagement(str(tmp_path / "missing.sock")):
+            pass
+
+
+def ovpn(hostname: str, cert: str = "CERT") -> bytes:
+    return f"client\nproto udp\nremote {hostname} 1337\n<cert>\n{cert}\n</cert>\n".encode()
+
+
+def test_vpn_ovpn_file_is_cached_per_server_and_protocol(client, stub_http, tmp_path) -> None:
+    from htbapi.ovpn_cache import OvpnCache
+
+    client.ovpn_cache = OvpnCache(directory=str(tmp_path / "ovpn"), namespace="api-key")
+    vpn = VpnServerInfo(_client=client, data=vpn_server_data(assigned=True))
+    stub_http.add_get(f"access/ovpnfile/{vpn.id}/0", ovpn("edge-eu-1.hackthebox.eu"))
+    stub_http.add_get(f"access/ovpnfile/{vpn.id}/0/1", ovpn("edge-eu-1.hackthebox.eu"))
+
+    path = vpn.get_ovpn_file()
+    assert vpn.get_ovpn_file() == path
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    vpn.download(path=str(tmp_path / "copy.ovpn"))
+    assert (tmp_path / "copy.ovpn").read_bytes() == ovpn("edge-eu-1.hackthebox.eu")
+    assert vpn.get_ovpn_file(tcp=True) != path
+    assert stub_http.endpoints_for("GET").count(f"access/ovpnfile/{vpn.id}/0") == 1
+
+    # The server moved to another host
+    assert not client.ovpn_cache.validate(vpn_id=vpn.id, hostname="edge-eu-2.hackthebox.eu")
+    assert client.ovpn_cache.get_path(vpn_id=vpn.id, tcp=False) is None
+
+    # A new certificate invalidates the file of the other protocol as well
+    client.ovpn_cache.put(vpn_id=vpn.id, tcp=False, data=ovpn("edge-eu-1.hackthebox.eu"))
+    client.ovpn_cache.put(vpn_id=vpn.id, tcp=True, data=ovpn("edge-eu-1.hackthebox.eu", cert="NEW"))
+    assert client.ovpn_cache.get_path(vpn_id=vpn.id, tcp=False) is None
+
+    # Another API key does not see (and removes) the files of the old one
+    rotated = OvpnCache(directory=str(tmp_path / "ovpn"), namespace="new-api-key")
+    assert rotated.get_path(vpn_id=vpn.id, tcp=True) is None
+    rotated.put(vpn_id=vpn.id, tcp=False, data=ovpn("edge-eu-1.hackthebox.eu"))
+    assert os.listdir(tmp_path / "ovpn") == [os.path.basename(rotated.directory)]
+
+
+def test_vpn_download_switches_even_if_the_file_is_cached(client, stub_http, tmp_path) -> None:
+    from htbapi.ovpn_cache import OvpnCache
+
+    client.ovpn_cache = OvpnCache(directory=str(tmp_path / "ovpn"), namespace="api-key")
+    client.ovpn_cache.put(vpn_id=10, tcp=False, data=ovpn("edge-eu-1.hackthebox.eu"))
+    stub_http.add_post("connections/servers/switch/10", switch_response())
+
+    path = VpnServerInfo.download_ovpn_file(vpn_id=10, _client=client, path=str(tmp_path / "lab.ovpn"))
+
+    assert open(path, "rb").read() == ovpn("edge-eu-1.hackthebox.eu")
+    assert stub_http.endpoints_for("POST") == ["connections/servers/switch/10"]
+    assert stub_http.endpoints_for("GET") == []